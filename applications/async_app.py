@@ -0,0 +1,179 @@
+"""
+Async Read Paths
+asyncio versions of the HRPayrollApp and ProjectManagementApp read methods,
+running independent queries concurrently on the async connection pool
+"""
+from async_database import fetchall, fetchone
+from hr_payroll_app import HRPayrollApp, EMPLOYEE_INFO_QUERY, SALARY_HISTORY_QUERY
+from project_management_app import (
+    ProjectManagementApp, PROJECT_INFO_QUERY, PROJECT_MILESTONES_QUERY,
+    PROJECT_STATISTICS_QUERY, EMPLOYEE_PRODUCTIVITY_QUERY
+)
+import asyncio
+
+
+class AsyncProjectManagementApp:
+    """Asynchronous read paths of ProjectManagementApp
+
+    Queries and row shaping are shared with ProjectManagementApp, so both
+    return the same results.
+    """
+
+    def __init__(self):
+        self._queries = ProjectManagementApp()
+
+    async def get_project_info(self, project_number):
+        """Get detailed project information"""
+        try:
+            result = await fetchone(PROJECT_INFO_QUERY, (project_number,))
+            return self._queries._project_info_from_row(result)
+        except Exception as e:
+            print(f"✗ Error getting project info: {e}")
+            return None
+
+    async def list_all_projects(self, include_completed=True, limit=None, after=None,
+                                department_id=None, status=None):
+        """List projects (see ProjectManagementApp.list_all_projects)"""
+        try:
+            query, params = self._queries._project_list_query(
+                include_completed, limit, after, department_id, status)
+        except ValueError as e:
+            print(f"✗ {e}")
+            return []
+        try:
+            return await fetchall(query, params)
+        except Exception as e:
+            print(f"✗ Error listing projects: {e}")
+            return []
+
+    async def get_project_team(self, project_number, current_only=True):
+        """Get list of employees assigned to a project"""
+        try:
+            return await fetchall(*self._queries._project_team_query(project_number, current_only))
+        except Exception as e:
+            print(f"✗ Error getting project team: {e}")
+            return []
+
+    async def get_employee_projects(self, employee_number, current_only=True):
+        """Get list of projects an employee is/was assigned to"""
+        try:
+            return await fetchall(
+                *self._queries._employee_projects_query(employee_number, current_only))
+        except Exception as e:
+            print(f"✗ Error getting employee projects: {e}")
+            return []
+
+    async def get_project_milestones(self, project_number):
+        """Get all milestones for a project"""
+        try:
+            return await fetchall(PROJECT_MILESTONES_QUERY, (project_number,))
+        except Exception as e:
+            print(f"✗ Error getting project milestones: {e}")
+            return []
+
+    async def get_project_statistics(self, project_number):
+        """Get comprehensive statistics for a project"""
+        try:
+            result = await fetchone(PROJECT_STATISTICS_QUERY, (project_number,))
+            return self._queries._project_statistics_from_row(result)
+        except Exception as e:
+            print(f"✗ Error getting project statistics: {e}")
+            return None
+
+    async def get_department_projects_summary(self, department_id=None, from_summary=False):
+        """Get summary of projects, optionally for one department"""
+        try:
+            return await fetchall(*self._queries._department_projects_summary_query(
+                department_id, from_summary))
+        except Exception as e:
+            print(f"✗ Error getting department projects summary: {e}")
+            return []
+
+    async def get_employee_productivity_report(self):
+        """Get productivity report for all employees"""
+        try:
+            return await fetchall(EMPLOYEE_PRODUCTIVITY_QUERY)
+        except Exception as e:
+            print(f"✗ Error getting employee productivity report: {e}")
+            return []
+
+    async def get_project_dashboard(self, project_number):
+        """Statistics, current team and milestones of a project, fetched concurrently
+
+        Returns None if the project does not exist.
+        """
+        statistics, team, milestones = await asyncio.gather(
+            self.get_project_statistics(project_number),
+            self.get_project_team(project_number),
+            self.get_project_milestones(project_number)
+        )
+        if statistics is None:
+            return None
+        return {'statistics': statistics, 'team': team, 'milestones': milestones}
+
+
+class AsyncHRPayrollApp:
+    """Asynchronous read paths of HRPayrollApp
+
+    Queries and row shaping are shared with HRPayrollApp, so both return
+    the same results.
+    """
+
+    def __init__(self):
+        self._queries = HRPayrollApp()
+        self.projects = AsyncProjectManagementApp()
+
+    async def get_employee_info(self, employee_number):
+        """Get detailed employee information"""
+        try:
+            result = await fetchone(EMPLOYEE_INFO_QUERY, (employee_number,))
+            return self._queries._employee_info_from_row(result)
+        except Exception as e:
+            print(f"✗ Error getting employee info: {e}")
+            return None
+
+    async def list_all_employees(self, limit=None, after=None, department_id=None,
+                                 employment_type=None):
+        """List employees with current information (see HRPayrollApp.list_all_employees)"""
+        try:
+            return await fetchall(*self._queries._employee_list_query(
+                after, limit, department_id, employment_type))
+        except Exception as e:
+            print(f"✗ Error listing employees: {e}")
+            return []
+
+    async def get_employee_salary_history(self, employee_number):
+        """Get complete salary history for an employee"""
+        try:
+            return await fetchall(SALARY_HISTORY_QUERY, (employee_number,))
+        except Exception as e:
+            print(f"✗ Error getting salary history: {e}")
+            return []
+
+    async def get_employee_payroll_history(self, employee_number, year=None):
+        """Get payroll history for a specific employee"""
+        try:
+            return await fetchall(*self._queries._payroll_history_query(employee_number, year))
+        except Exception as e:
+            print(f"✗ Error getting payroll history: {e}")
+            return []
+
+    async def get_employee_dashboard(self, employee_number, year=None):
+        """Employee details, salary history, payroll and current projects, fetched concurrently
+
+        Returns None if the employee does not exist.
+        """
+        info, salary_history, payroll_history, projects = await asyncio.gather(
+            self.get_employee_info(employee_number),
+            self.get_employee_salary_history(employee_number),
+            self.get_employee_payroll_history(employee_number, year),
+            self.projects.get_employee_projects(employee_number)
+        )
+        if info is None:
+            return None
+        return {
+            'info': info,
+            'salary_history': salary_history,
+            'payroll_history': payroll_history,
+            'projects': projects
+        }
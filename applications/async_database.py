@@ -0,0 +1,236 @@
+"""
+Async Database Access
+asyncio connection pool for the read paths, built on psycopg2's
+asynchronous connections so no extra driver is needed
+"""
+import psycopg2
+from psycopg2 import extensions, pool
+from database_config import DB_CONFIG, POOL_CONFIG, PoolTimeout
+import asyncio
+import os
+import time
+import query_metrics
+
+# Async pool parameters; sizes default to the sync pool's DB_POOL_* settings
+ASYNC_POOL_CONFIG = {
+    'minconn': int(os.getenv('DB_ASYNC_POOL_MIN', POOL_CONFIG['minconn'])),
+    'maxconn': int(os.getenv('DB_ASYNC_POOL_MAX', POOL_CONFIG['maxconn'])),
+    'timeout': float(os.getenv('DB_ASYNC_POOL_TIMEOUT', POOL_CONFIG['timeout']))
+}
+
+# Async connection pool, bound to the event loop that opened it
+async_pool = None
+
+
+async def wait_ready(connection):
+    """Wait on the event loop until an asynchronous connection finishes its operation
+
+    Raises the psycopg2 error of a failed connect or statement.
+    """
+    loop = asyncio.get_running_loop()
+    fileno = connection.fileno()
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            return
+        if state == extensions.POLL_READ:
+            add, remove = loop.add_reader, loop.remove_reader
+        elif state == extensions.POLL_WRITE:
+            add, remove = loop.add_writer, loop.remove_writer
+        else:
+            raise psycopg2.OperationalError(f"unexpected poll state: {state}")
+        ready = loop.create_future()
+        add(fileno, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            remove(fileno)
+
+
+class AsyncConnectionPool:
+    """asyncio pool of psycopg2 asynchronous connections
+
+    Must be created inside a coroutine; it serves the running event loop only.
+
+    Coroutines wait up to `timeout` seconds when all `maxconn` connections
+    are checked out. Asynchronous connections always autocommit, so the pool
+    opens them read-only: it serves the read paths only, one round trip per
+    statement.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=30.0, **kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.closed = False
+        self.loop = asyncio.get_running_loop()
+        self._kwargs = kwargs
+        self._idle = []
+        self._in_use = set()
+        self._slots = asyncio.Semaphore(maxconn)
+        self._metrics = {
+            'connections_opened': 0,
+            'checkouts': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0
+        }
+
+    async def open(self):
+        """Open `minconn` connections ahead of the first checkouts"""
+        connections = [await self.getconn() for _ in range(self.minconn)]
+        for connection in connections:
+            self.putconn(connection)
+        return self
+
+    async def _connect(self):
+        """Open a new read-only asynchronous connection"""
+        connection = psycopg2.connect(
+            async_=True, options='-c default_transaction_read_only=on', **self._kwargs)
+        try:
+            await wait_ready(connection)
+        except BaseException:
+            connection.close()
+            raise
+        self._metrics['connections_opened'] += 1
+        return connection
+
+    async def getconn(self, timeout=None):
+        """Check out a connection, waiting up to `timeout` seconds for one to free up"""
+        if self.closed:
+            raise pool.PoolError("connection pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._metrics['timeouts'] += 1
+            raise PoolTimeout(
+                f"no connection available within {timeout:.1f}s ({self.maxconn} in use)")
+
+        try:
+            connection = None
+            while self._idle and connection is None:
+                connection = self._idle.pop()
+                if connection.closed:
+                    connection = None
+            if connection is None:
+                connection = await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._in_use.add(connection)
+        wait_time = time.monotonic() - started
+        self._metrics['checkouts'] += 1
+        self._metrics['wait_time_total'] += wait_time
+        self._metrics['wait_time_max'] = max(self._metrics['wait_time_max'], wait_time)
+        query_metrics.record_checkout(connection, wait_time)
+        return connection
+
+    def putconn(self, connection, close=False):
+        """Return a connection, closing it if broken or left mid-statement"""
+        self._in_use.discard(connection)
+        query_metrics.record_release(connection)
+        if close or self.closed or connection.closed or connection.isexecuting():
+            connection.close()
+        else:
+            self._idle.append(connection)
+        self._slots.release()
+
+    def closeall(self):
+        """Close every connection and refuse further checkouts"""
+        self.closed = True
+        for connection in self._idle + list(self._in_use):
+            connection.close()
+        self._idle.clear()
+        self._in_use.clear()
+
+    def stats(self):
+        """Snapshot of pool occupancy and wait timings in seconds"""
+        metrics = dict(self._metrics)
+        metrics.update({
+            'minconn': self.minconn,
+            'maxconn': self.maxconn,
+            'in_use': len(self._in_use),
+            'idle': len(self._idle),
+            'wait_time_avg': (metrics['wait_time_total'] / metrics['checkouts']
+                              if metrics['checkouts'] else 0.0)
+        })
+        return metrics
+
+
+async def initialize_async_pool(**overrides):
+    """Open the async connection pool on the running event loop
+
+    Sizes and timeout come from ASYNC_POOL_CONFIG (DB_ASYNC_POOL_*
+    environment variables); keyword arguments override them.
+    """
+    global async_pool
+    try:
+        # Published before opening so concurrent first callers share it
+        async_pool = AsyncConnectionPool(
+            **{**ASYNC_POOL_CONFIG, **overrides},
+            **DB_CONFIG
+        )
+        await async_pool.open()
+        print("✓ Async database connection pool created successfully")
+    except Exception as e:
+        print(f"✗ Error creating async connection pool: {e}")
+        raise
+    return async_pool
+
+
+async def ensure_async_pool(**overrides):
+    """Open the async pool on first use, replacing one left by a finished event loop"""
+    loop = asyncio.get_running_loop()
+    if async_pool is not None and not async_pool.closed and async_pool.loop is loop:
+        return async_pool
+    if async_pool is not None:
+        async_pool.closeall()
+    return await initialize_async_pool(**overrides)
+
+
+def close_async_pool():
+    """Close all connections in the async pool"""
+    global async_pool
+    if async_pool:
+        async_pool.closeall()
+        async_pool = None
+        print("✓ Async database connection pool closed")
+
+
+def get_async_pool_stats():
+    """Get async pool metrics, or None if the pool is not open"""
+    if async_pool is None:
+        return None
+    return async_pool.stats()
+
+
+async def _fetch(query, params, fetch):
+    """Run one statement on a pooled connection and return fetch(cursor)"""
+    active_pool = await ensure_async_pool()
+    connection = await active_pool.getconn()
+    try:
+        cursor = connection.cursor()
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        await wait_ready(connection)
+        if query_metrics.ENABLED:
+            latency = time.perf_counter() - started
+            query_metrics.record_statement(
+                query_metrics.calling_method(), query, len(params or ()), latency,
+                max(cursor.rowcount, 0), query_metrics.checkout_wait(connection))
+        return fetch(cursor)
+    finally:
+        active_pool.putconn(connection)
+
+
+async def fetchall(query, params=None):
+    """Run a read-only statement on the async pool and return all rows"""
+    return await _fetch(query, params, lambda cursor: cursor.fetchall())
+
+
+async def fetchone(query, params=None):
+    """Run a read-only statement on the async pool and return the first row"""
+    return await _fetch(query, params, lambda cursor: cursor.fetchone())
@@ -0,0 +1,1246 @@
+"""
+Benchmarks for CS631 Company Database Applications
+Measures application performance against the configured database
+"""
+from database_config import (
+    initialize_connection_pool, close_connection_pool, get_db_connection, get_db_cursor,
+    get_read_cursor
+)
+from async_app import AsyncHRPayrollApp, AsyncProjectManagementApp
+from async_database import ensure_async_pool, close_async_pool
+from compensation_cache import compensation_cache
+from hr_payroll_app import HRPayrollApp
+from payroll_kernel import calculate_pay_columns, from_cents
+from project_cache import project_cache
+from project_management_app import ProjectManagementApp
+from psycopg2 import extensions
+from query_metrics import InstrumentedCursor
+from contextlib import contextmanager, redirect_stdout
+from datetime import date, timedelta
+from decimal import Decimal
+from threading import Thread
+import argparse
+import asyncio
+import http.client
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import hr_payroll_app
+import project_management_app
+
+# Pay period reserved for benchmark runs; its payroll is deleted before and after each run
+BENCH_PERIOD_START = date(2099, 1, 1)
+BENCH_PERIOD_END = date(2099, 1, 31)
+
+
+def print_section_header(title):
+    """Print formatted section header"""
+    print("\n" + "="*70)
+    print(f"  {title}")
+    print("="*70 + "\n")
+
+
+def worker_counts(max_workers):
+    """Worker counts to measure: powers of two up to max_workers, plus max_workers"""
+    counts = []
+    workers = 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def reset_benchmark_payroll():
+    """Delete payroll written for the benchmark pay period"""
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM PayrollHistory
+            WHERE pay_period_start = %s AND pay_period_end = %s
+        """, (BENCH_PERIOD_START, BENCH_PERIOD_END))
+        cursor.execute("""
+            DELETE FROM PayrollRun
+            WHERE pay_period_start = %s AND pay_period_end = %s
+        """, (BENCH_PERIOD_START, BENCH_PERIOD_END))
+
+
+class RoundTripCounter:
+    """Shared count of client/server round trips made by counting connections"""
+    count = 0
+
+
+class CountingCursor(InstrumentedCursor):
+    """Cursor that counts each statement plus the implicit BEGIN psycopg2 sends"""
+
+    def execute(self, query, vars=None):
+        connection = self.connection
+        if (not connection.autocommit
+                and connection.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE):
+            RoundTripCounter.count += 1
+        RoundTripCounter.count += 1
+        return super().execute(query, vars)
+
+
+class CountingConnection(extensions.connection):
+    """Connection that counts COMMIT/ROLLBACK round trips and uses CountingCursor"""
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', CountingCursor)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        if self.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            RoundTripCounter.count += 1
+        return super().commit()
+
+    def rollback(self):
+        if self.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            RoundTripCounter.count += 1
+        return super().rollback()
+
+
+@contextmanager
+def legacy_read_cursor(snapshot=False):
+    """Read cursor as it behaved before transaction modes: BEGIN ... COMMIT"""
+    with get_db_cursor() as cursor:
+        yield cursor
+
+
+def count_round_trips(func):
+    """Run func and return the number of round trips it made"""
+    RoundTripCounter.count = 0
+    func()
+    return RoundTripCounter.count
+
+
+def bench_round_trips(args):
+    """Count round trips per read call with legacy and read-only cursors"""
+    print_section_header("ROUND TRIPS PER CALL")
+    hr_app = HRPayrollApp()
+    pm_app = ProjectManagementApp()
+
+    with get_read_cursor() as cursor:
+        cursor.execute("SELECT MIN(employee_number) FROM Employee")
+        employee_number = cursor.fetchone()[0]
+        cursor.execute("SELECT MIN(project_number) FROM Project")
+        project_number = cursor.fetchone()[0]
+
+    calls = [
+        ('get_employee_info', lambda: hr_app.get_employee_info(employee_number)),
+        ('list_all_employees', hr_app.list_all_employees),
+        ('get_employee_salary_history', lambda: hr_app.get_employee_salary_history(employee_number)),
+        ('employee_360', lambda: hr_app.employee_360(employee_number)),
+        ('employee_360 (50 employees)',
+         lambda: hr_app.employee_360(list(range(employee_number, employee_number + 50)))),
+        ('department_payroll_summary', hr_app.department_payroll_summary),
+        ('get_project_info', lambda: pm_app.get_project_info(project_number)),
+        ('list_all_projects', pm_app.list_all_projects),
+        ('get_project_team', lambda: pm_app.get_project_team(project_number)),
+        ('get_project_statistics', lambda: pm_app.get_project_statistics(project_number)),
+        ('get_employee_productivity_report', pm_app.get_employee_productivity_report),
+    ]
+
+    modules = (hr_payroll_app, project_management_app)
+    results = []
+    for name, func in calls:
+        for module in modules:
+            module.get_read_cursor = legacy_read_cursor
+        before = count_round_trips(func)
+        for module in modules:
+            module.get_read_cursor = get_read_cursor
+        after = count_round_trips(func)
+        results.append((name, before, after))
+
+    print(f"{'Call':<36} {'Before':<10} {'After':<10}")
+    print("-"*70)
+    for name, before, after in results:
+        print(f"{name:<36} {before:<10} {after:<10}")
+    print("-"*70)
+    print(f"{'TOTAL':<36} {sum(r[1] for r in results):<10} {sum(r[2] for r in results):<10}\n")
+
+
+def bench_payroll_parallel(args):
+    """Measure how a parallel payroll run scales from 1 to N workers"""
+    print_section_header(f"PARALLEL PAYROLL SCALING (shard by {args.shard_by})")
+    hr_app = HRPayrollApp()
+    results = []
+
+    try:
+        for workers in worker_counts(args.workers):
+            reset_benchmark_payroll()
+            summary = hr_app.process_payroll_parallel(
+                BENCH_PERIOD_START, BENCH_PERIOD_END, workers=workers,
+                shard_by=args.shard_by, chunk_size=args.chunk_size)
+            if summary is None:
+                return
+            results.append((workers, summary['employees_paid'], summary['elapsed_seconds']))
+    finally:
+        reset_benchmark_payroll()
+
+    baseline = results[0][2]
+    print("\n" + "-"*70)
+    print(f"{'Workers':<10} {'Employees':<12} {'Seconds':<12} {'Employees/s':<14} {'Speedup':<10}")
+    print("-"*70)
+    for workers, employees, seconds in results:
+        print(f"{workers:<10} {employees:<12} {seconds:<12.3f} {employees / seconds:<14,.0f} {baseline / seconds:<10.2f}")
+    print("-"*70 + "\n")
+
+
+def sync_employee_dashboard(hr_app, pm_app, employee_number):
+    """Sync equivalent of AsyncHRPayrollApp.get_employee_dashboard: one query after another"""
+    return (hr_app.get_employee_info(employee_number),
+            hr_app.get_employee_salary_history(employee_number),
+            hr_app.get_employee_payroll_history(employee_number),
+            pm_app.get_employee_projects(employee_number))
+
+
+def sync_project_dashboard(pm_app, project_number):
+    """Sync equivalent of AsyncProjectManagementApp.get_project_dashboard"""
+    return (pm_app.get_project_statistics(project_number),
+            pm_app.get_project_team(project_number),
+            pm_app.get_project_milestones(project_number))
+
+
+def latency_summary(latencies):
+    """(mean, p50, p99) of a list of latencies, in milliseconds"""
+    latencies = sorted(latencies)
+    return (sum(latencies) / len(latencies) * 1000,
+            latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000)
+
+
+def bench_async_reads(args):
+    """Compare sync (sequential) and async (concurrent) dashboard read latency"""
+    print_section_header("ASYNC VS SYNC READ LATENCY")
+    hr_app = HRPayrollApp()
+    pm_app = ProjectManagementApp()
+    async_hr_app = AsyncHRPayrollApp()
+    async_pm_app = AsyncProjectManagementApp()
+
+    with get_read_cursor() as cursor:
+        cursor.execute("SELECT employee_number FROM Employee ORDER BY employee_number LIMIT %s",
+                       (args.fan_out,))
+        employees = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT project_number FROM Project ORDER BY project_number LIMIT %s",
+                       (args.fan_out,))
+        projects = [row[0] for row in cursor.fetchall()]
+
+    cases = [
+        ('employee dashboard',
+         lambda: sync_employee_dashboard(hr_app, pm_app, employees[0]),
+         lambda: async_hr_app.get_employee_dashboard(employees[0])),
+        ('project dashboard',
+         lambda: sync_project_dashboard(pm_app, projects[0]),
+         lambda: async_pm_app.get_project_dashboard(projects[0])),
+        (f"{len(employees)} employee dashboards",
+         lambda: [sync_employee_dashboard(hr_app, pm_app, e) for e in employees],
+         lambda: asyncio.gather(*[async_hr_app.get_employee_dashboard(e) for e in employees])),
+        (f"{len(projects)} project dashboards",
+         lambda: [sync_project_dashboard(pm_app, p) for p in projects],
+         lambda: asyncio.gather(*[async_pm_app.get_project_dashboard(p) for p in projects])),
+    ]
+
+    async def measure_async(make_call):
+        latencies = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            await make_call()
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    async def run_async_cases():
+        await ensure_async_pool()
+        results = []
+        for _, _, make_call in cases:
+            # Warm up so every case runs on already-open connections
+            await make_call()
+            results.append(await measure_async(make_call))
+        return results
+
+    sync_results = []
+    for _, call, _ in cases:
+        call()
+        latencies = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - started)
+        sync_results.append(latencies)
+    try:
+        async_results = asyncio.run(run_async_cases())
+    finally:
+        close_async_pool()
+
+    print(f"{'Call':<28} {'Path':<7} {'Mean ms':<10} {'p50 ms':<10} {'p99 ms':<10} {'Speedup':<8}")
+    print("-"*75)
+    for (name, _, _), sync_latencies, async_latencies in zip(cases, sync_results, async_results):
+        sync_mean, sync_p50, sync_p99 = latency_summary(sync_latencies)
+        async_mean, async_p50, async_p99 = latency_summary(async_latencies)
+        print(f"{name:<28} {'sync':<7} {sync_mean:<10.2f} {sync_p50:<10.2f} {sync_p99:<10.2f}")
+        print(f"{'':<28} {'async':<7} {async_mean:<10.2f} {async_p50:<10.2f} {async_p99:<10.2f} "
+              f"{sync_mean / async_mean:<8.2f}")
+    print("-"*75 + "\n")
+
+
+def bench_compensation_cache(args):
+    """Compare current-compensation lookups served from the database and from the cache"""
+    print_section_header("COMPENSATION CACHE")
+    hr_app = HRPayrollApp()
+
+    with get_read_cursor() as cursor:
+        cursor.execute("SELECT employee_number FROM Employee ORDER BY employee_number LIMIT %s",
+                       (args.employees,))
+        employees = [row[0] for row in cursor.fetchall()]
+
+    def timed(func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
+
+    def lookups():
+        for employee_number in employees:
+            hr_app.get_current_compensation(employee_number)
+
+    def employee_info():
+        for employee_number in employees:
+            hr_app.get_employee_info(employee_number)
+
+    results = []
+    for name, func in (('get_current_compensation', lookups),
+                       ('get_employee_info', employee_info)):
+        compensation_cache.invalidate()
+        cold = timed(func)
+        warm = timed(func)
+        results.append((name, cold, warm))
+
+    compensation_cache.invalidate()
+    bulk_load = timed(hr_app.load_compensation_cache)
+    compensation_cache.reset_stats()
+    bulk_hits = timed(lambda: hr_app.get_current_compensations(employees))
+    stats = hr_app.get_compensation_cache_stats()
+
+    print(f"\n{'Lookup (' + str(len(employees)) + ' employees)':<32} {'Cold ms':<12} {'Warm ms':<12} {'Speedup':<8}")
+    print("-"*70)
+    for name, cold, warm in results:
+        print(f"{name:<32} {cold * 1000:<12.1f} {warm * 1000:<12.1f} {cold / warm:<8.1f}")
+    print("-"*70)
+    print(f"Bulk load of {stats['size']} employees: {bulk_load * 1000:.1f} ms, "
+          f"then one batched lookup: {bulk_hits * 1000:.2f} ms "
+          f"({stats['hits']} hits, {stats['misses']} misses)\n")
+
+
+# Year filters as written before PayrollHistory was partitioned
+LEGACY_PAYROLL_HISTORY_QUERY = """
+    SELECT payroll_id, pay_period_start, pay_period_end, gross_pay, federal_tax,
+           state_tax, other_tax, net_pay, payment_date
+    FROM payroll_unpartitioned
+    WHERE employee_number = %s AND EXTRACT(YEAR FROM pay_period_start) = %s
+    ORDER BY pay_period_start DESC
+"""
+
+LEGACY_TAX_SUMMARY_QUERY = """
+    SELECT SUM(gross_pay), SUM(federal_tax), SUM(state_tax), SUM(other_tax),
+           SUM(net_pay), COUNT(*)
+    FROM payroll_unpartitioned
+    WHERE employee_number = %s AND EXTRACT(YEAR FROM pay_period_start) = %s
+"""
+
+LEGACY_YEAR_TOTALS_QUERY = """
+    SELECT SUM(gross_pay), SUM(net_pay), COUNT(*)
+    FROM payroll_unpartitioned
+    WHERE EXTRACT(YEAR FROM pay_period_start) = %s
+"""
+
+YEAR_TOTALS_QUERY = """
+    SELECT SUM(gross_pay), SUM(net_pay), COUNT(*)
+    FROM PayrollHistory
+    WHERE pay_period_start >= %s AND pay_period_start < %s
+"""
+
+
+def bench_payroll_years(args):
+    """Compare year-filtered payroll queries before and after partitioning
+
+    "Before" is an unpartitioned copy of PayrollHistory with the original
+    indexes, queried with EXTRACT(YEAR ...); "after" is the partitioned
+    table queried with the date ranges HRPayrollApp now uses. Both run on
+    the same connection.
+    """
+    print_section_header("PAYROLL YEAR QUERIES: BEFORE/AFTER PARTITIONING")
+    hr_app = HRPayrollApp()
+
+    with get_db_cursor(commit=False) as cursor:
+        cursor.execute("SELECT MIN(pay_period_start), MAX(pay_period_start), COUNT(*) FROM PayrollHistory")
+        first, last, rows = cursor.fetchone()
+        if not rows:
+            print("No payroll found; generate data first, e.g.:")
+            print("  python generate_sample_data.py --employees 5000 --months 120\n")
+            return
+        # The last complete year, so the sample touches a full partition
+        year = last.year - 1 if last.year > first.year else last.year
+        year_start, year_end = hr_app._year_range(year)
+        cursor.execute("""
+            SELECT DISTINCT employee_number FROM PayrollHistory
+            WHERE pay_period_start >= %s AND pay_period_start < %s
+            ORDER BY employee_number LIMIT %s
+        """, (year_start, year_end, args.employees))
+        employees = [row[0] for row in cursor.fetchall()]
+        print(f"{rows:,} payroll rows from {first} to {last}; querying {year} "
+              f"for {len(employees)} employees\n")
+
+        # A regular (not temporary) table so both sides use shared buffers;
+        # it is rolled back with the transaction at the end of the block
+        cursor.execute("CREATE TABLE payroll_unpartitioned AS SELECT * FROM PayrollHistory")
+        cursor.execute("ALTER TABLE payroll_unpartitioned ADD PRIMARY KEY (payroll_id)")
+        cursor.execute("CREATE INDEX ON payroll_unpartitioned (employee_number)")
+        cursor.execute("CREATE INDEX ON payroll_unpartitioned (pay_period_start, pay_period_end)")
+        cursor.execute("""
+            CREATE UNIQUE INDEX ON payroll_unpartitioned
+            (employee_number, pay_period_start, pay_period_end)
+        """)
+        cursor.execute("ANALYZE payroll_unpartitioned")
+
+        history_query = hr_app._payroll_history_query(0, year)[0]
+        cases = [
+            ('get_employee_payroll_history',
+             LEGACY_PAYROLL_HISTORY_QUERY, lambda e: (e, year),
+             history_query, lambda e: (e, year_start, year_end), employees),
+            ('get_yearly_tax_summary',
+             LEGACY_TAX_SUMMARY_QUERY, lambda e: (e, year),
+             hr_payroll_app.YEARLY_TAX_SUMMARY_QUERY, lambda e: (e, year_start, year_end),
+             employees),
+            ('year totals (all employees)',
+             LEGACY_YEAR_TOTALS_QUERY, lambda _: (year,),
+             YEAR_TOTALS_QUERY, lambda _: (year_start, year_end), [None] * args.repeat),
+        ]
+
+        def run(query, make_params, keys):
+            results = []
+            started = time.perf_counter()
+            for key in keys:
+                cursor.execute(query, make_params(key))
+                results.append(cursor.fetchall())
+            return time.perf_counter() - started, results
+
+        def plan(query, params):
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+            root = cursor.fetchone()[0][0]
+            buffers = root['Plan'].get('Shared Hit Blocks', 0) + root['Plan'].get('Shared Read Blocks', 0)
+            partitions = str(root).count("'Relation Name': 'payrollhistory_")
+            return buffers, partitions
+
+        results = []
+        for name, before_query, before_params, after_query, after_params, keys in cases:
+            run(before_query, before_params, keys[:10])
+            run(after_query, after_params, keys[:10])
+            before_time, before_rows = run(before_query, before_params, keys)
+            after_time, after_rows = run(after_query, after_params, keys)
+            if before_rows != after_rows:
+                print(f"✗ {name}: results differ before and after")
+            before_buffers, _ = plan(before_query, before_params(keys[0]))
+            after_buffers, partitions = plan(after_query, after_params(keys[0]))
+            results.append((name, len(keys), before_time, after_time,
+                            before_buffers, after_buffers, partitions))
+
+    print(f"{'Query':<30} {'Calls':<7} {'Before ms':<11} {'After ms':<10} {'Speedup':<8} "
+          f"{'Buffers':<15} {'Partitions':<10}")
+    print("-"*95)
+    for name, calls, before, after, before_buffers, after_buffers, partitions in results:
+        print(f"{name:<30} {calls:<7} {before * 1000:<11.1f} {after * 1000:<10.1f} "
+              f"{before / after:<8.2f} {f'{before_buffers} -> {after_buffers}':<15} {partitions:<10}")
+    print("-"*95)
+    print("Buffers: shared blocks touched by one call; Partitions: PayrollHistory partitions scanned\n")
+
+
+def bench_w2_year_end(args):
+    """Compare per-employee W-2 summaries with the bulk year-end export
+
+    Also stores the year's YearEndTaxSummary rows, which the stored-summary
+    cases read back.
+    """
+    print_section_header("W-2 YEAR-END STATEMENTS")
+    hr_app = HRPayrollApp()
+
+    with get_read_cursor() as cursor:
+        cursor.execute("SELECT MIN(pay_period_start), MAX(pay_period_start) FROM PayrollHistory")
+        first, last = cursor.fetchone()
+        if first is None:
+            print("No payroll found; generate data first, e.g.:")
+            print("  python generate_sample_data.py --employees 5000 --months 24\n")
+            return
+        year = args.year or (last.year - 1 if last.year > first.year else last.year)
+        cursor.execute("""
+            SELECT DISTINCT employee_number FROM PayrollHistory
+            WHERE pay_period_start >= %s AND pay_period_start < %s
+            ORDER BY employee_number
+        """, hr_app._year_range(year))
+        employees = [row[0] for row in cursor.fetchall()]
+
+    def per_employee(from_summary):
+        def run():
+            total_gross = Decimal('0')
+            for employee_number in employees:
+                summary = hr_app.get_yearly_tax_summary(employee_number, year, from_summary)
+                total_gross += summary['total_gross']
+            return total_gross
+        return run
+
+    def export(**options):
+        return lambda: hr_app.export_w2_statements(
+            year, io.StringIO(), args.format, **options)['total_gross']
+
+    def export_parallel():
+        with tempfile.TemporaryDirectory() as output_dir:
+            return hr_app.export_w2_statements_parallel(
+                year, output_dir, args.format, workers=args.workers)['total_gross']
+
+    cases = [
+        ('get_yearly_tax_summary per employee', per_employee(False)),
+        ('export_w2_statements', export()),
+        (f'export_w2_statements_parallel ({args.workers})', export_parallel),
+        ('export_w2_statements(store=True)', export(store=True)),
+        ('export_w2_statements(from_summary)', export(from_summary=True)),
+        ('get_yearly_tax_summary(from_summary)', per_employee(True)),
+    ]
+
+    print(f"Tax year {year}: {len(employees)} employees with payroll, format {args.format}\n")
+    results = []
+    for name, func in cases:
+        started = time.perf_counter()
+        total_gross = func()
+        results.append((name, time.perf_counter() - started, total_gross))
+
+    baseline = results[0][1]
+    print(f"{'Method':<42} {'ms':<10} {'Statements/s':<14} {'Speedup':<8}")
+    print("-"*78)
+    for name, elapsed, total_gross in results:
+        print(f"{name:<42} {elapsed * 1000:<10.1f} {len(employees) / elapsed:<14.0f} "
+              f"{baseline / elapsed:<8.1f}")
+        if total_gross != results[0][2]:
+            print(f"✗ {name}: total gross {total_gross} differs from {results[0][2]}")
+    print("-"*78 + "\n")
+
+
+def random_paycheck_inputs(count, seed):
+    """Random salaried and hourly inputs in cents, weighted towards half-cent ties"""
+    rng = random.Random(seed)
+    salaries, rates, hours = [], [], []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            # remainder 6 of 12 makes a month of salary end in exactly half a cent
+            salary = rng.randrange(1000000, 50000000)
+            if rng.random() < 0.3:
+                salary += 6 - salary % 12
+            salaries.append(salary)
+            rates.append(None)
+            hours.append(None)
+        else:
+            salaries.append(None)
+            rates.append(rng.randrange(1000, 20000))
+            hours.append(rng.choice([16000, rng.randrange(0, 30000), rng.randrange(0, 300) * 50]))
+    return salaries, rates, hours
+
+
+def decimal_paychecks(hr_app, salaries, rates, hours):
+    """Per-paycheck Decimal calculation, as process_payroll() does it"""
+    results = []
+    for salary, rate, hour in zip(from_cents([s or 0 for s in salaries]),
+                                  from_cents([r or 0 for r in rates]),
+                                  from_cents([h or 0 for h in hours])):
+        if salary:
+            gross_pay = hr_app.calculate_salaried_pay(salary)
+        else:
+            gross_pay = hr_app.calculate_hourly_pay(rate, hour)
+        taxes = hr_app.calculate_taxes(gross_pay)
+        results.append((gross_pay, taxes['federal_tax'], taxes['state_tax'],
+                        taxes['other_tax'], taxes['net_pay']))
+    return results
+
+
+def bench_pay_kernel(args):
+    """Check the integer-cents payroll kernel against Decimal and PostgreSQL, then time both
+
+    Equivalence runs on --cases random paychecks (about 15% of them
+    half-cent ties) plus known edge cases: the kernel must match
+    HRPayrollApp's Decimal methods exactly and produce taxes that satisfy
+    the ROUND(gross_pay * rate, 2) CHECK constraints as PostgreSQL
+    evaluates them.
+    """
+    print_section_header("PAYROLL CALCULATION KERNEL")
+    hr_app = HRPayrollApp()
+
+    salaries, rates, hours = random_paycheck_inputs(args.cases, args.seed)
+    # Edge cases: zero pay, ties at each rate, and the 15711.90 gross that
+    # broke the state tax CHECK when monthly salary was left unrounded
+    salaries += [None, 18854280, 1481406, 12]
+    rates += [1500, None, None, None]
+    hours += [0, None, None, None]
+    for gross in (1571190, 123450, 50, 10, 1):
+        salaries.append(None)
+        rates.append(gross)
+        hours.append(100)
+
+    kernel = list(zip(*(from_cents(column) for column in
+                        calculate_pay_columns(salaries, rates, hours, hr_app.TAX_RATES))))
+    expected = decimal_paychecks(hr_app, salaries, rates, hours)
+    mismatches = sum(1 for got, want in zip(kernel, expected) if got != want)
+
+    with get_read_cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*) FILTER (WHERE federal <> ROUND(gross * 0.10, 2)
+                OR state <> ROUND(gross * 0.05, 2)
+                OR other <> ROUND(gross * 0.03, 2)
+                OR net <> gross - federal - state - other)
+            FROM unnest(%s::numeric[], %s::numeric[], %s::numeric[],
+                        %s::numeric[], %s::numeric[]) AS t(gross, federal, state, other, net)
+        """, [list(column) for column in zip(*kernel)])
+        check_violations = cursor.fetchone()[0]
+
+    print(f"Equivalence on {len(kernel):,} paychecks: {mismatches} differ from the Decimal "
+          f"methods, {check_violations} would violate the PayrollHistory CHECKs")
+    if mismatches or check_violations:
+        print("✗ Kernel is not equivalent; skipping timings\n")
+        return
+
+    salaries, rates, hours = random_paycheck_inputs(args.paychecks, args.seed + 1)
+
+    def timed(func):
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    results = [
+        ('Decimal per paycheck', timed(lambda: decimal_paychecks(hr_app, salaries, rates, hours))),
+        ('kernel (cents in, cents out)', timed(
+            lambda: calculate_pay_columns(salaries, rates, hours, hr_app.TAX_RATES))),
+        # As in process_payroll_batch(): cents from SQL in, Decimals out for the INSERT
+        ('kernel + from_cents', timed(lambda: [
+            from_cents(column) for column in calculate_pay_columns(
+                salaries, rates, hours, hr_app.TAX_RATES)])),
+    ]
+
+    baseline = results[0][1]
+    print(f"\n{'Method (' + format(args.paychecks, ',') + ' paychecks)':<36} {'ms':<10} {'ns/paycheck':<13} {'Speedup':<8}")
+    print("-"*70)
+    for name, elapsed in results:
+        print(f"{name:<36} {elapsed * 1000:<10.1f} {elapsed * 1e9 / args.paychecks:<13.0f} "
+              f"{baseline / elapsed:<8.1f}")
+    print("-"*70 + "\n")
+
+
+# check_current_project as it was before it fired only on is_current changes
+LEGACY_CURRENT_PROJECT_TRIGGER = """
+    CREATE FUNCTION check_current_project_legacy()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        IF NEW.is_current = TRUE THEN
+            UPDATE EmployeeProject
+            SET is_current = FALSE
+            WHERE employee_number = NEW.employee_number
+              AND (employee_number != NEW.employee_number OR project_number != NEW.project_number)
+              AND is_current = TRUE;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER trg_check_current_project ON EmployeeProject;
+    DROP TRIGGER trg_check_current_project_update ON EmployeeProject;
+    CREATE TRIGGER trg_check_current_project
+    BEFORE INSERT OR UPDATE ON EmployeeProject
+    FOR EACH ROW
+    EXECUTE FUNCTION check_current_project_legacy();
+"""
+
+HOURS_UPDATE = """
+    UPDATE EmployeeProject SET hours_worked = hours_worked + 1
+    WHERE employee_number = %s AND project_number = %s
+"""
+
+
+def bench_project_hours(args):
+    """Throughput of project hours updates with the old and the current project trigger
+
+    Each side runs --updates single-row hours updates on current
+    assignments inside a
+    transaction that is rolled back, so no hours are changed. The "before"
+    transaction swaps the legacy trigger in, which holds an exclusive lock
+    on EmployeeProject until it rolls back.
+    """
+    print_section_header("PROJECT HOURS UPDATES: BEFORE/AFTER TRIGGER FIX")
+
+    with get_read_cursor() as cursor:
+        cursor.execute("""
+            SELECT employee_number, project_number FROM EmployeeProject
+            WHERE is_current = TRUE
+            ORDER BY employee_number, project_number
+        """)
+        assignments = cursor.fetchall()
+    if not assignments:
+        print("No current project assignments; load sample data first\n")
+        return
+    keys = [assignments[i % len(assignments)] for i in range(args.updates)]
+
+    def run(legacy):
+        with get_db_cursor(commit=False) as cursor:
+            if legacy:
+                cursor.execute(LEGACY_CURRENT_PROJECT_TRIGGER)
+            for key in keys[:200]:
+                cursor.execute(HOURS_UPDATE, key)
+            started = time.perf_counter()
+            for key in keys:
+                cursor.execute(HOURS_UPDATE, key)
+            elapsed = time.perf_counter() - started
+            cursor.execute("SELECT COUNT(*) FILTER (WHERE is_current) FROM EmployeeProject")
+            current = cursor.fetchone()[0]
+            cursor.connection.rollback()
+        return elapsed, current
+
+    # Alternate the sides and keep each one's best round, so the dead row
+    # versions every rolled-back round leaves behind do not favour either
+    best = {}
+    for _ in range(args.rounds):
+        for legacy in (True, False):
+            elapsed, current = run(legacy)
+            if legacy not in best or elapsed < best[legacy][0]:
+                best[legacy] = (elapsed, current)
+    results = [('before (every INSERT/UPDATE)', *best[True]),
+               ('after (is_current becomes TRUE)', *best[False])]
+
+    print(f"{len(assignments):,} current assignments, {len(keys):,} hours updates per side\n")
+    print(f"{'Trigger':<34} {'ms':<10} {'Updates/s':<12} {'Current after':<14}")
+    print("-"*72)
+    for name, elapsed, current in results:
+        print(f"{name:<34} {elapsed * 1000:<10.1f} {len(keys) / elapsed:<12.0f} {current:<14,}")
+    print("-"*72)
+    print(f"Speedup: {results[0][1] / results[1][1]:.2f}x\n")
+
+
+def bench_timesheets(args):
+    """Compare per-call project hours entries with batched timesheet ingest and roll-up
+
+    Both sides record entries on the current assignments and commit as the
+    application does, under the configured REPORTING_AUTO_REFRESH. Hours and
+    TimesheetEntry rows written by the benchmark are removed afterwards.
+    """
+    print_section_header("TIMESHEET INGEST")
+    pm_app = ProjectManagementApp()
+
+    with get_read_cursor() as cursor:
+        cursor.execute("""
+            SELECT employee_number, project_number, start_date, hours_worked
+            FROM EmployeeProject
+            WHERE is_current = TRUE
+            ORDER BY employee_number, project_number
+        """)
+        assignments = cursor.fetchall()
+        cursor.execute("SELECT COALESCE(MAX(entry_id), 0) FROM TimesheetEntry")
+        last_entry = cursor.fetchone()[0]
+    if not assignments:
+        print("No current project assignments; load sample data first\n")
+        return
+
+    # One 8-hour entry per assignment and day, on days after those of the
+    # per-call side, so none is a duplicate or over the daily cap
+    entries = [{
+        'employee_number': assignments[i % len(assignments)][0],
+        'project_number': assignments[i % len(assignments)][1],
+        'work_date': assignments[i % len(assignments)][2] + timedelta(days=i // len(assignments)),
+        'hours': '8',
+        'source_ref': 'benchmark'
+    } for i in range(args.calls + args.entries)]
+    single, entries = entries[:args.calls], entries[args.calls:]
+
+    single_recorded = 0
+    try:
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            for entry in single:
+                if pm_app.update_employee_project_hours(
+                        entry['employee_number'], entry['project_number'],
+                        Decimal(entry['hours']), entry['work_date'], entry['source_ref']):
+                    single_recorded += 1
+        per_call = time.perf_counter() - started
+
+        started = time.perf_counter()
+        recorded = 0
+        for offset in range(0, len(entries), args.batch_size):
+            result = pm_app.record_timesheet_entries(entries[offset:offset + args.batch_size])
+            recorded += result['recorded']
+        ingest = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rollup = pm_app.rollup_timesheet_hours()
+        rollup_time = time.perf_counter() - started
+    finally:
+        with get_db_cursor() as cursor:
+            cursor.execute("DELETE FROM TimesheetEntry WHERE entry_id > %s", (last_entry,))
+            cursor.execute("""
+                UPDATE EmployeeProject ep
+                SET hours_worked = original.hours_worked
+                FROM unnest(%s::int[], %s::int[], %s::numeric[])
+                    AS original(employee_number, project_number, hours_worked)
+                WHERE ep.employee_number = original.employee_number
+                AND ep.project_number = original.project_number
+                AND ep.hours_worked IS DISTINCT FROM original.hours_worked
+            """, ([a[0] for a in assignments], [a[1] for a in assignments],
+                  [a[3] for a in assignments]))
+
+    if (single_recorded != len(single) or recorded != len(entries) or rollup is None
+            or rollup['entries'] != single_recorded + recorded):
+        print(f"✗ Recorded {single_recorded} of {len(single)} single and {recorded} of "
+              f"{len(entries)} batched entries, rolled up {rollup}")
+    rows = [
+        ('update_employee_project_hours per call', len(single), per_call),
+        (f'record_timesheet_entries ({args.batch_size}/call)', len(entries), ingest),
+        ('  + rollup_timesheet_hours', len(entries), ingest + rollup_time),
+    ]
+    print(f"{len(assignments):,} current assignments\n")
+    print(f"{'Method':<42} {'Entries':<9} {'ms':<10} {'Entries/s':<10}")
+    print("-"*74)
+    for name, count, elapsed in rows:
+        print(f"{name:<42} {count:<9,} {elapsed * 1000:<10.1f} {count / elapsed:<10.0f}")
+    print("-"*74 + "\n")
+
+
+def bench_project_cache(args):
+    """Project dashboard roster reads served from the database and from the project cache
+
+    Times each roster read cold and warm, then a dashboard mix (a team,
+    its first member's projects and the first project list page) with an
+    hours entry and roll-up every --write-every dashboards, with the cache
+    disabled and enabled. Entries and hours added by the benchmark are
+    removed afterwards.
+    """
+    print_section_header("PROJECT CACHE")
+    pm_app = ProjectManagementApp()
+
+    with get_read_cursor() as cursor:
+        cursor.execute("""
+            SELECT ep.project_number, MIN(ep.employee_number)
+            FROM EmployeeProject ep
+            WHERE ep.is_current = TRUE
+            GROUP BY ep.project_number
+            ORDER BY ep.project_number
+            LIMIT %s
+        """, (args.projects,))
+        teams = cursor.fetchall()
+        cursor.execute("SELECT COALESCE(MAX(entry_id), 0) FROM TimesheetEntry")
+        last_entry = cursor.fetchone()[0]
+    if not teams:
+        print("No current project assignments; load sample data first\n")
+        return
+    projects = [project for project, _ in teams]
+    members = [member for _, member in teams]
+
+    def timed(func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
+
+    reads = (
+        ('get_project_team', lambda: [pm_app.get_project_team(p) for p in projects]),
+        ('get_employee_projects', lambda: [pm_app.get_employee_projects(e) for e in members]),
+        ('list_all_projects (page of 50)', lambda: [pm_app.list_all_projects(limit=50)
+                                                    for _ in projects]),
+    )
+    results = []
+    for name, func in reads:
+        project_cache.invalidate()
+        cold = timed(func)
+        warm = timed(func)
+        results.append((name, cold, warm))
+
+    rng = random.Random(631)
+    writes = {}
+
+    def dashboards():
+        for i in range(args.dashboards):
+            project, member = teams[rng.randrange(len(teams))]
+            pm_app.get_project_team(project)
+            pm_app.get_employee_projects(member)
+            pm_app.list_all_projects(limit=50)
+            if args.write_every and i % args.write_every == args.write_every - 1:
+                if pm_app.update_employee_project_hours(member, project, Decimal('0.25')):
+                    writes[member, project] = writes.get((member, project), 0) + 1
+                pm_app.rollup_timesheet_hours()
+
+    maxsize = project_cache.maxsize
+    mixed = []
+    try:
+        with redirect_stdout(io.StringIO()):
+            for name, size in (('cache disabled', 0), ('cache enabled', maxsize)):
+                project_cache.maxsize = size
+                project_cache.invalidate()
+                project_cache.reset_stats()
+                rng.seed(631)
+                mixed.append((name, timed(dashboards), project_cache.stats()))
+    finally:
+        project_cache.maxsize = maxsize
+        project_cache.invalidate()
+        with get_db_cursor() as cursor:
+            cursor.execute("DELETE FROM TimesheetEntry WHERE entry_id > %s", (last_entry,))
+            for (member, project), count in writes.items():
+                cursor.execute("""
+                    UPDATE EmployeeProject SET hours_worked = hours_worked - %s
+                    WHERE employee_number = %s AND project_number = %s
+                """, (Decimal('0.25') * count, member, project))
+
+    print(f"{'Roster read (' + str(len(projects)) + ' calls)':<36} {'Cold ms':<12} {'Warm ms':<12} {'Speedup':<8}")
+    print("-"*70)
+    for name, cold, warm in results:
+        print(f"{name:<36} {cold * 1000:<12.1f} {warm * 1000:<12.1f} {cold / warm:<8.1f}")
+    print("-"*70 + "\n")
+    print(f"{args.dashboards:,} dashboards, one hours entry and roll-up every {args.write_every}:")
+    print(f"{'Mode':<18} {'ms':<10} {'Dashboards/s':<14} {'Hit ratio':<10} {'Invalidations':<14}")
+    print("-"*70)
+    for name, elapsed, stats in mixed:
+        print(f"{name:<18} {elapsed * 1000:<10.1f} {args.dashboards / elapsed:<14,.0f} "
+              f"{stats['hit_ratio']:<10.2f} {stats['invalidations']:<14,}")
+    print("-"*70)
+    print(f"Speedup: {mixed[0][1] / mixed[1][1]:.2f}x\n")
+
+
+LIFETIME_HOURS_QUERY = """
+    SELECT COALESCE(SUM(hours_worked), 0)
+    FROM EmployeeProject
+    WHERE employee_number = %s
+    AND start_date <= %s
+    AND (end_date IS NULL OR end_date >= %s)
+"""
+
+PERIOD_HOURS_QUERY = """
+    SELECT COALESCE(SUM(hours), 0)
+    FROM TimesheetEntry
+    WHERE employee_number = %s
+    AND work_date BETWEEN %s AND %s
+"""
+
+
+def bench_hourly_payroll(args):
+    """Hours look-up for hourly payroll: per-employee queries vs the chunked payroll query
+
+    Loads --per-day timesheet entries per weekday for every hourly
+    employee on a current project, over the benchmark pay period and the
+    --months - 1 months before it, then reads the period hours the way the
+    old payroll did (one lifetime EmployeeProject query per employee), one
+    dated query per employee, and with the chunk query process_payroll_batch
+    runs. The benchmark's entries are deleted afterwards.
+    """
+    print_section_header("HOURLY PAYROLL HOURS")
+    hr_app = HRPayrollApp()
+    first_month = BENCH_PERIOD_START
+    for _ in range(args.months - 1):
+        first_month = (first_month - timedelta(days=1)).replace(day=1)
+
+    with get_read_cursor() as cursor:
+        cursor.execute("""
+            SELECT e.employee_number
+            FROM Employee e
+            JOIN EmployeeProject ep ON ep.employee_number = e.employee_number
+                AND ep.is_current = TRUE
+            WHERE e.employment_type = 'hourly'
+            ORDER BY e.employee_number
+        """)
+        hourly = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT COALESCE(MAX(entry_id), 0) FROM TimesheetEntry")
+        last_entry = cursor.fetchone()[0]
+    if not hourly:
+        print("No hourly employees on a current project; load sample data first\n")
+        return
+
+    # Roll up pending entries so the watermark can be moved past the
+    # benchmark's own, which must never reach hours_worked
+    if ProjectManagementApp().rollup_timesheet_hours() is None:
+        return
+
+    try:
+        started = time.perf_counter()
+        with get_db_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO TimesheetEntry
+                (employee_number, project_number, work_date, hours, source_ref)
+                SELECT ep.employee_number, ep.project_number, day::date,
+                       ROUND(8.0 / %s, 2), 'benchmark shift ' || shift
+                FROM EmployeeProject ep
+                JOIN Employee e ON e.employee_number = ep.employee_number
+                CROSS JOIN generate_series(%s::date, %s::date, interval '1 day') AS day
+                CROSS JOIN generate_series(1, %s) AS shift
+                WHERE ep.is_current = TRUE
+                AND e.employment_type = 'hourly'
+                AND EXTRACT(ISODOW FROM day) < 6
+            """, (args.per_day, first_month, BENCH_PERIOD_END, args.per_day))
+            loaded = cursor.rowcount
+            cursor.execute("""
+                UPDATE TimesheetRollup
+                SET last_entry_id = (SELECT MAX(entry_id) FROM TimesheetEntry)
+                WHERE last_entry_id >= %s
+                RETURNING last_entry_id
+            """, (last_entry,))
+            if cursor.fetchone() is None:
+                raise RuntimeError("timesheet entries are still pending roll-up; retry")
+        with get_db_connection() as connection:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM ANALYZE TimesheetEntry")
+        print(f"Loaded {loaded:,} entries over {args.months} months "
+              f"in {time.perf_counter() - started:.1f}s\n")
+
+        def per_employee(query, params):
+            with get_read_cursor() as cursor:
+                started = time.perf_counter()
+                hours = {}
+                for employee_number in hourly:
+                    cursor.execute(query, (employee_number, *params))
+                    hours[employee_number] = cursor.fetchone()[0]
+                return time.perf_counter() - started, len(hourly), hours
+
+        def chunked():
+            with get_read_cursor() as cursor:
+                started = time.perf_counter()
+                hours = {}
+                queries = 0
+                after_employee = None
+                while True:
+                    cursor.execute(*hr_app._payroll_chunk_query(
+                        BENCH_PERIOD_START, BENCH_PERIOD_END, after_employee, args.chunk_size))
+                    rows = cursor.fetchall()
+                    queries += 1
+                    if not rows:
+                        break
+                    hours.update((row[0], Decimal(row[5]) / 100)
+                                 for row in rows if row[2] == 'hourly')
+                    after_employee = rows[-1][0]
+                return time.perf_counter() - started, queries, hours
+
+        lifetime = per_employee(LIFETIME_HOURS_QUERY, (BENCH_PERIOD_END, BENCH_PERIOD_START))
+        period = per_employee(PERIOD_HOURS_QUERY, (BENCH_PERIOD_START, BENCH_PERIOD_END))
+        chunk = chunked()
+
+        with get_read_cursor() as cursor:
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + cursor.mogrify(
+                *hr_app._payroll_chunk_query(
+                    BENCH_PERIOD_START, BENCH_PERIOD_END, None, args.chunk_size)).decode())
+            plan = [row[0] for row in cursor.fetchall()]
+    finally:
+        with get_db_cursor() as cursor:
+            cursor.execute("DELETE FROM TimesheetEntry WHERE entry_id > %s", (last_entry,))
+
+    mismatches = sum(1 for employee_number in hourly
+                     if chunk[2].get(employee_number, 0) != period[2][employee_number])
+    if mismatches:
+        print(f"✗ {mismatches} employees with different period hours")
+    rows = [
+        ('per employee, lifetime project hours', *lifetime),
+        ('per employee, period timesheet hours', *period),
+        (f'payroll chunk query ({args.chunk_size}/chunk)', *chunk),
+    ]
+    print(f"{len(hourly):,} hourly employees on a current project, "
+          f"pay period {BENCH_PERIOD_START} to {BENCH_PERIOD_END}\n")
+    print(f"{'Method':<40} {'Queries':<9} {'ms':<10} {'Period hours':<14}")
+    print("-"*74)
+    for name, elapsed, queries, hours in rows:
+        print(f"{name:<40} {queries:<9,} {elapsed * 1000:<10.1f} {sum(hours.values()):<14,.2f}")
+    print("-"*74 + "\n")
+    print("First chunk, timesheet access:")
+    for number, line in enumerate(plan):
+        if 'timesheet' in line.lower():
+            print("\n".join("  " + step.strip() for step in plan[number:number + 3]))
+    print(plan[-1] + "\n")
+
+
+def run_http_load(port, path, concurrency, duration):
+    """Hammer GET path with keep-alive clients; return (requests, errors, latencies)"""
+    deadline = time.perf_counter() + duration
+    results = []
+
+    def client():
+        latencies = []
+        errors = 0
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        connection.close()
+        results.append((latencies, errors))
+
+    threads = [Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = sorted(l for thread_latencies, _ in results for l in thread_latencies)
+    return len(latencies), sum(errors for _, errors in results), latencies
+
+
+@contextmanager
+def gunicorn_server(workers, port, threads=1):
+    """Run wsgi:app under gunicorn with `workers` processes until the block exits"""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), WEB_THREADS=str(threads),
+               WEB_BIND=f"127.0.0.1:{port}")
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # Wait until every worker can serve a request
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', '/')
+                connection.getresponse().read()
+                connection.close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("gunicorn failed to start (is it installed?)")
+                time.sleep(0.2)
+        yield server
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+
+def bench_web_throughput(args):
+    """Measure requests per second on the list pages as gunicorn workers grow"""
+    print_section_header("WEB THROUGHPUT BY WORKER COUNT")
+    paths = ['/hr/employees', '/projects/list']
+    results = []
+
+    for workers in worker_counts(args.workers):
+        with gunicorn_server(workers, args.port, args.threads):
+            for path in paths:
+                # Warm up each worker's pool and caches before measuring
+                run_http_load(args.port, path, args.concurrency, 1)
+                requests, errors, latencies = run_http_load(
+                    args.port, path, args.concurrency, args.duration)
+                p50 = latencies[len(latencies) // 2] if latencies else 0
+                p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+                results.append((workers, path, requests / args.duration, p50, p99, errors))
+                print(f"  {workers} workers {path}: {requests / args.duration:,.0f} req/s")
+
+    print("\n" + "-"*70)
+    print(f"{'Workers':<10} {'Endpoint':<18} {'Req/s':<12} {'p50 ms':<10} {'p99 ms':<10} {'Errors':<8}")
+    print("-"*70)
+    for workers, path, rate, p50, p99, errors in results:
+        print(f"{workers:<10} {path:<18} {rate:<12,.0f} {p50 * 1000:<10.1f} {p99 * 1000:<10.1f} {errors:<8}")
+    print("-"*70 + "\n")
+
+
+def main():
+    """Parse arguments and run the selected benchmark"""
+    parser = argparse.ArgumentParser(description="CS631 Company Database benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    payroll_parallel = subparsers.add_parser(
+        'payroll-parallel', help='parallel payroll scaling from 1 to N workers')
+    payroll_parallel.add_argument('--workers', type=int, default=8)
+    payroll_parallel.add_argument('--shard-by', choices=['range', 'department'], default='range')
+    payroll_parallel.add_argument('--chunk-size', type=int, default=1000)
+    payroll_parallel.set_defaults(func=bench_payroll_parallel)
+
+    round_trips = subparsers.add_parser(
+        'round-trips', help='round trips per read call before/after read-only cursors')
+    round_trips.set_defaults(func=bench_round_trips, connection_factory=CountingConnection)
+
+    web_throughput = subparsers.add_parser(
+        'web-throughput', help='requests/s on list pages as gunicorn workers grow')
+    web_throughput.add_argument('--workers', type=int, default=8)
+    web_throughput.add_argument('--threads', type=int, default=1)
+    web_throughput.add_argument('--concurrency', type=int, default=32)
+    web_throughput.add_argument('--duration', type=float, default=10)
+    web_throughput.add_argument('--port', type=int, default=8631)
+    web_throughput.set_defaults(func=bench_web_throughput)
+
+    async_reads = subparsers.add_parser(
+        'async-reads', help='dashboard latency of the sync and async read paths')
+    async_reads.add_argument('--repeat', type=int, default=50)
+    async_reads.add_argument('--fan-out', type=int, default=20)
+    async_reads.set_defaults(func=bench_async_reads)
+
+    compensation = subparsers.add_parser(
+        'compensation-cache', help='current-compensation lookups with a cold and warm cache')
+    compensation.add_argument('--employees', type=int, default=1000)
+    compensation.set_defaults(func=bench_compensation_cache)
+
+    payroll_years = subparsers.add_parser(
+        'payroll-years', help='year-filtered payroll queries before/after partitioning')
+    payroll_years.add_argument('--employees', type=int, default=500)
+    payroll_years.add_argument('--repeat', type=int, default=20)
+    payroll_years.set_defaults(func=bench_payroll_years)
+
+    w2_year_end = subparsers.add_parser(
+        'w2-year-end', help='per-employee W-2 summaries vs the bulk year-end export')
+    w2_year_end.add_argument('--year', type=int)
+    w2_year_end.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    w2_year_end.add_argument('--workers', type=int, default=4)
+    w2_year_end.set_defaults(func=bench_w2_year_end)
+
+    pay_kernel = subparsers.add_parser(
+        'pay-kernel', help='integer-cents payroll kernel: equivalence check and timings')
+    pay_kernel.add_argument('--cases', type=int, default=200000)
+    pay_kernel.add_argument('--paychecks', type=int, default=100000)
+    pay_kernel.add_argument('--repeat', type=int, default=5)
+    pay_kernel.add_argument('--seed', type=int, default=631)
+    pay_kernel.set_defaults(func=bench_pay_kernel)
+
+    project_hours = subparsers.add_parser(
+        'project-hours', help='hours-update throughput before/after the current-project trigger fix')
+    project_hours.add_argument('--updates', type=int, default=5000)
+    project_hours.add_argument('--rounds', type=int, default=3)
+    project_hours.set_defaults(func=bench_project_hours)
+
+    timesheets = subparsers.add_parser(
+        'timesheets', help='per-call hours updates vs batched timesheet ingest and roll-up')
+    timesheets.add_argument('--calls', type=int, default=1000)
+    timesheets.add_argument('--entries', type=int, default=50000)
+    timesheets.add_argument('--batch-size', type=int, default=5000)
+    timesheets.set_defaults(func=bench_timesheets)
+
+    project_cache_parser = subparsers.add_parser(
+        'project-cache', help='project roster reads with a cold and warm project cache')
+    project_cache_parser.add_argument('--projects', type=int, default=200)
+    project_cache_parser.add_argument('--dashboards', type=int, default=5000)
+    project_cache_parser.add_argument('--write-every', type=int, default=20)
+    project_cache_parser.set_defaults(func=bench_project_cache)
+
+    hourly_payroll = subparsers.add_parser(
+        'hourly-payroll', help='per-employee hours queries vs the chunked payroll hours query')
+    hourly_payroll.add_argument('--months', type=int, default=3)
+    hourly_payroll.add_argument('--per-day', type=int, default=1)
+    hourly_payroll.add_argument('--chunk-size', type=int, default=1000)
+    hourly_payroll.set_defaults(func=bench_hourly_payroll)
+
+    args = parser.parse_args()
+
+    try:
+        pool_options = {}
+        if getattr(args, 'connection_factory', None):
+            pool_options['connection_factory'] = args.connection_factory
+        initialize_connection_pool(**pool_options)
+        args.func(args)
+    finally:
+        close_connection_pool()
+
+
+if __name__ == "__main__":
+    main()
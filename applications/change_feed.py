@@ -0,0 +1,242 @@
+"""
+Change Feed
+Background thread that LISTENs for PostgreSQL notifications and hands them
+to registered callbacks: the data_changes channel fed by the change feed
+triggers in schema.sql, and any other channel an application subscribes to
+"""
+from database_config import DB_CONFIG
+from psycopg2 import sql
+import json
+import os
+import psycopg2
+import queue
+import select
+import threading
+
+# Channel the change feed triggers notify (see notify_data_change())
+DATA_CHANGES_CHANNEL = 'data_changes'
+
+# Whether the web application starts the feed (one extra connection per process)
+ENABLED = os.getenv('CHANGE_FEED', 'true').lower() in ('1', 'true', 'yes')
+
+# Changes buffered for each queue subscriber (e.g. an event stream) before
+# it is considered too slow and sent a reset instead
+QUEUE_SIZE = int(os.getenv('CHANGE_FEED_QUEUE_SIZE', 1000))
+
+# Seconds the listener waits before reconnecting after a connection error
+RECONNECT_DELAY = 5
+
+# Change delivered when notifications may have been missed (the listener
+# reconnected, or a queue subscriber fell behind): reload everything
+RESET = {'table': None, 'op': 'RESET', 'rows': None, 'keys': None}
+
+
+def parse_change(payload):
+    """Decode a data_changes payload as {'table', 'op', 'rows', 'keys'}
+
+    keys is None when the statement changed too many rows to list them,
+    or for TRUNCATE; the whole table should then be treated as changed.
+    Returns None for a payload that is not a change.
+    """
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or 'table' not in message:
+        return None
+    return {'table': message['table'], 'op': message.get('op'),
+            'rows': message.get('rows'), 'keys': message.get('keys')}
+
+
+# ==================== SUBSCRIPTIONS ====================
+# Kept per process (and copied into forked children); callbacks run on the
+# listener thread, so they must be quick and must not block
+
+_subscribers = {}               # channel -> [callback(payload or None)]
+_subscribers_lock = threading.Lock()
+
+
+def subscribe(callback, channel=DATA_CHANGES_CHANNEL):
+    """Call callback(payload) for each notification on channel
+
+    callback(None) is called whenever the listener (re)connects, since
+    notifications sent while it was not listening are lost. Returns a
+    handle for unsubscribe(). Start the listener with ensure_change_feed().
+    """
+    with _subscribers_lock:
+        _subscribers.setdefault(channel, []).append(callback)
+    if _feed is not None and _feed.pid == os.getpid():
+        _feed.wake()
+    return channel, callback
+
+
+def unsubscribe(handle):
+    """Stop delivering notifications to a subscribe() handle"""
+    channel, callback = handle
+    with _subscribers_lock:
+        callbacks = _subscribers.get(channel, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+
+def subscribe_changes(callback, tables=None):
+    """Call callback(change) for each data change, or callback(RESET)
+
+    tables limits delivery to changes of those (lowercase) table names.
+    """
+    def deliver(payload):
+        change = RESET if payload is None else parse_change(payload)
+        if change is None:
+            return
+        if change is RESET or tables is None or change['table'] in tables:
+            callback(change)
+    return subscribe(deliver)
+
+
+class ChangeQueue:
+    """Bounded queue of data changes for one consumer, e.g. an event stream
+
+    A consumer that falls QUEUE_SIZE changes behind gets a single RESET in
+    place of everything it missed.
+    """
+
+    def __init__(self, tables=None, maxsize=QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize)
+        self._handle = subscribe_changes(self._put, tables)
+
+    def _put(self, change):
+        try:
+            self._queue.put_nowait(change)
+        except queue.Full:
+            self._drain()
+            self._queue.put_nowait(RESET)
+
+    def _drain(self):
+        """Discard the buffered changes"""
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def get(self, timeout=None):
+        """Next change, or None if none arrives within timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stop receiving changes"""
+        unsubscribe(self._handle)
+
+
+# ==================== LISTENER ====================
+
+class ChangeFeed(threading.Thread):
+    """Background thread delivering notifications to the subscribers
+
+    Holds one dedicated connection (outside the pool) that LISTENs on every
+    subscribed channel, and reconnects after connection errors.
+    """
+
+    def __init__(self, poll_interval=5.0):
+        super().__init__(name="change-feed", daemon=True)
+        self.poll_interval = poll_interval
+        self.pid = os.getpid()
+        self._stop_event = threading.Event()
+        self._wake_read, self._wake_write = os.pipe()
+
+    def wake(self):
+        """Interrupt the wait so new subscriptions are listened to at once"""
+        os.write(self._wake_write, b'x')
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                connection = None
+                try:
+                    connection = psycopg2.connect(**DB_CONFIG)
+                    connection.autocommit = True
+                    self._listen(connection, set())
+                except (psycopg2.Error, OSError) as e:
+                    print(f"✗ Change feed error: {e}")
+                    self._stop_event.wait(RECONNECT_DELAY)
+                finally:
+                    if connection is not None:
+                        connection.close()
+        finally:
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+
+    def _listen(self, connection, listening):
+        """LISTEN on the subscribed channels and dispatch until stopped"""
+        first = True
+        while not self._stop_event.is_set():
+            with _subscribers_lock:
+                channels = [channel for channel, callbacks in _subscribers.items() if callbacks]
+            with connection.cursor() as cursor:
+                for channel in channels:
+                    if channel not in listening:
+                        cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                        listening.add(channel)
+            if first:
+                # Anything sent before the LISTENs above was missed
+                for channel in channels:
+                    self._dispatch(channel, None)
+                first = False
+
+            ready = select.select([connection, self._wake_read], [], [], self.poll_interval)[0]
+            if self._wake_read in ready:
+                os.read(self._wake_read, 1024)
+            if connection in ready:
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    self._dispatch(notify.channel, notify.payload)
+
+    def _dispatch(self, channel, payload):
+        """Hand one notification to the channel's callbacks"""
+        with _subscribers_lock:
+            callbacks = list(_subscribers.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"✗ Change feed callback error: {e}")
+
+    def stop(self, timeout=None):
+        """Ask the thread to exit and wait for it"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.wake()
+            self.join(timeout)
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def ensure_change_feed():
+    """Start this process's listener on first use
+
+    Safe to call on every request: one listener runs per process, so under
+    a pre-forking server each worker starts its own after fork.
+    """
+    global _feed
+    if _feed is not None and _feed.pid == os.getpid():
+        return _feed
+    with _feed_lock:
+        if _feed is None or _feed.pid != os.getpid():
+            _feed = ChangeFeed()
+            _feed.start()
+    return _feed
+
+
+def stop_change_feed():
+    """Stop this process's listener, if one is running"""
+    global _feed
+    with _feed_lock:
+        feed, _feed = _feed, None
+    if feed is not None and feed.pid == os.getpid():
+        feed.stop(timeout=5)
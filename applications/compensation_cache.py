@@ -0,0 +1,189 @@
+"""
+Compensation Cache
+In-process LRU cache of each employee's current compensation, invalidated
+by the HR application's JobHistory writes and, across processes, from the
+change feed
+"""
+from database_config import current_scope
+from collections import OrderedDict
+import change_feed
+import os
+import threading
+import time
+
+# Employees kept in the cache before the least recently used are evicted
+CACHE_SIZE = int(os.getenv('COMPENSATION_CACHE_SIZE', 10000))
+
+# Seconds an entry is trusted; bounds staleness from writes made by other
+# processes when the change feed is not enabled (0 disables expiry)
+CACHE_TTL = float(os.getenv('COMPENSATION_CACHE_TTL', 60))
+
+
+class CompensationCache:
+    """Thread-safe LRU cache of current compensation keyed by employee_number
+
+    Values are (salary, start_date) of the employee's current JobHistory
+    row, or None for an employee with no current job. Loads record the
+    generation() they started at and are dropped by put_many() if any
+    invalidation happened meanwhile, so a slow load cannot reinsert a
+    value that a concurrent write has replaced. Employees held by an
+    uncommitted write (see hold()) are never cached.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()   # employee_number -> (value, loaded_at)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._held = {}                 # employee_number -> open writes holding it
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'evictions': 0,
+                       'expirations': 0, 'invalidations': 0, 'stale_loads': 0}
+
+    def generation(self):
+        """Invalidation counter to pass to put_many() for a load started now"""
+        with self._lock:
+            return self._generation
+
+    def get_many(self, employee_numbers):
+        """Return ({employee_number: value} for cached employees, [missing employee_numbers])"""
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for employee_number in employee_numbers:
+                entry = self._entries.get(employee_number)
+                if entry is not None and self.ttl and now - entry[1] > self.ttl:
+                    del self._entries[employee_number]
+                    self._stats['expirations'] += 1
+                    entry = None
+                if entry is None:
+                    missing.append(employee_number)
+                    continue
+                self._entries.move_to_end(employee_number)
+                found[employee_number] = entry[0]
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(missing)
+        return found, missing
+
+    def put_many(self, values, generation):
+        """Cache {employee_number: value} loaded at `generation`; False if the load went stale"""
+        now = time.monotonic()
+        with self._lock:
+            if generation != self._generation:
+                self._stats['stale_loads'] += 1
+                return False
+            for employee_number, value in values.items():
+                if employee_number in self._held:
+                    continue
+                self._entries[employee_number] = (value, now)
+                self._entries.move_to_end(employee_number)
+            self._stats['loads'] += len(values)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return True
+
+    def invalidate(self, employee_numbers=None):
+        """Drop the given employees, or every entry when employee_numbers is None"""
+        with self._lock:
+            self._generation += 1
+            if employee_numbers is None:
+                self._stats['invalidations'] += len(self._entries)
+                self._entries.clear()
+                return
+            for employee_number in employee_numbers:
+                if self._entries.pop(employee_number, None) is not None:
+                    self._stats['invalidations'] += 1
+
+    def hold(self, employee_numbers):
+        """Invalidate employees and keep them uncached until release()"""
+        with self._lock:
+            for employee_number in employee_numbers:
+                self._held[employee_number] = self._held.get(employee_number, 0) + 1
+        self.invalidate(employee_numbers)
+
+    def release(self, employee_numbers):
+        """End a hold(), invalidating again now that the write is committed or rolled back"""
+        with self._lock:
+            for employee_number in employee_numbers:
+                count = self._held.get(employee_number, 0) - 1
+                if count > 0:
+                    self._held[employee_number] = count
+                else:
+                    self._held.pop(employee_number, None)
+        self.invalidate(employee_numbers)
+
+    def stats(self):
+        """Snapshot of cache size and hit/miss/eviction counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'size': len(self._entries), 'maxsize': self.maxsize, 'ttl': self.ttl})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        """Zero the counters, keeping cached entries"""
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+# Process-wide cache shared by every HRPayrollApp instance
+compensation_cache = CompensationCache()
+
+
+def invalidate_after_write(employee_numbers):
+    """Invalidation hook called by the applications after JobHistory writes
+
+    Inside a ConnectionScope the write is not committed yet, so the
+    employees stay uncached until the scope closes: reads in between would
+    otherwise cache the old compensation, or the uncommitted new one for
+    reads made on the scope's own connection.
+    """
+    employee_numbers = list(employee_numbers)
+    scope = current_scope()
+    if scope is None:
+        compensation_cache.invalidate(employee_numbers)
+        return
+    compensation_cache.hold(employee_numbers)
+    scope.call_on_close(lambda: compensation_cache.release(employee_numbers))
+
+
+# ==================== CHANGE FEED ====================
+
+# Tables whose changes can alter an employee's current compensation
+DATA_CHANGE_TABLES = ('jobhistory', 'employee')
+
+
+def _apply_data_change(change):
+    """Invalidate the employees a committed JobHistory or Employee change touched"""
+    if change is change_feed.RESET:
+        compensation_cache.invalidate()
+        return
+    # keys is None when too many rows changed to list them, or on TRUNCATE
+    compensation_cache.invalidate(change['keys'])
+
+
+_subscribed = False
+_subscribe_lock = threading.Lock()
+
+
+def ensure_invalidation_listener():
+    """Invalidate this process's cache from every process's compensation writes
+
+    With the change feed enabled (CHANGE_FEED), committed JobHistory and
+    Employee changes drop the employees they touched, including writes made
+    outside the applications, and a feed that reconnects clears the cache.
+    Safe to call on every request; returns the listener, or None when the
+    change feed is disabled.
+    """
+    global _subscribed
+    if not change_feed.ENABLED:
+        return None
+    with _subscribe_lock:
+        if not _subscribed:
+            change_feed.subscribe_changes(_apply_data_change, DATA_CHANGE_TABLES)
+            _subscribed = True
+    return change_feed.ensure_change_feed()
@@ -3,9 +3,15 @@ Database Configuration and Connection Management
 """
 import psycopg2
 from psycopg2 import pool
+from psycopg2 import extensions
+from collections import deque
 from contextlib import contextmanager
 import os
+import threading
+import time
+import uuid
 from pathlib import Path
+import query_metrics
 
 # Load environment variables from .env file
 try:
@@ -26,15 +32,325 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 5432))
 }
 
+# Connection pool parameters
+POOL_CONFIG = {
+    'minconn': int(os.getenv('DB_POOL_MIN', 1)),
+    'maxconn': int(os.getenv('DB_POOL_MAX', 20)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+    'validation_interval': float(os.getenv('DB_POOL_VALIDATION_INTERVAL', 30))
+}
+
+# Total connections shared by all worker processes of a pre-forking server
+CONNECTION_BUDGET = int(os.getenv('DB_CONNECTION_BUDGET', POOL_CONFIG['maxconn']))
+
+# Rows fetched per round trip by server-side streaming cursors
+STREAM_ITERSIZE = int(os.getenv('DB_STREAM_ITERSIZE', 2000))
+
 # Connection pool
 connection_pool = None
 
-def initialize_connection_pool():
-    """Initialize the database connection pool"""
+# Pools inherited across fork; kept referenced but never used or closed
+# here, since their sockets belong to the parent process
+_inherited_pools = []
+_pool_lock = threading.Lock()
+
+
+class PoolTimeout(pool.PoolError):
+    """Raised when no pooled connection becomes available before the timeout"""
+
+
+class ManagedConnectionPool:
+    """Thread-safe connection pool with bounded waits, recycling and metrics
+
+    Callers block for up to `timeout` seconds when all `maxconn` connections
+    are checked out instead of failing immediately. Connections older than
+    `max_lifetime` seconds are replaced, and connections idle for longer than
+    `validation_interval` seconds are pinged before being handed out.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=30.0, max_lifetime=3600.0,
+                 validation_interval=30.0, **kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool sizes must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.validation_interval = validation_interval
+        self.closed = False
+        self.pid = os.getpid()
+        self._kwargs = kwargs
+        self._lock = threading.Condition()
+        self._idle = deque()    # (connection, created_at, returned_at)
+        self._in_use = {}       # id(connection) -> (connection, created_at, checked_out_at)
+        self._pending = 0       # slots reserved while connecting or validating
+        self._metrics = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'connections_opened': 0,
+            'connections_recycled': 0,
+            'validation_failures': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'checkout_time_total': 0.0,
+            'checkout_time_max': 0.0,
+            'returns': 0
+        }
+
+        for _ in range(minconn):
+            connection, created_at = self._connect()
+            self._idle.append((connection, created_at, created_at))
+
+    def _connect(self):
+        """Open a new database connection"""
+        connection = psycopg2.connect(**self._kwargs)
+        with self._lock:
+            self._metrics['connections_opened'] += 1
+        return connection, time.monotonic()
+
+    def _discard(self, connection):
+        """Close a connection, ignoring errors from a dead socket"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _validate(self, connection, created_at, returned_at):
+        """Return a usable connection, replacing expired or broken ones"""
+        now = time.monotonic()
+        if connection.closed or now - created_at > self.max_lifetime:
+            self._discard(connection)
+            with self._lock:
+                self._metrics['connections_recycled'] += 1
+            return self._connect()
+
+        if now - returned_at > self.validation_interval:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+            except psycopg2.Error:
+                self._discard(connection)
+                with self._lock:
+                    self._metrics['validation_failures'] += 1
+                return self._connect()
+
+        return connection, created_at
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to `timeout` seconds for one to free up"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._lock:
+            while True:
+                if self.closed:
+                    raise pool.PoolError("connection pool is closed")
+                if self._idle:
+                    # Most recently returned first, so spare connections can expire
+                    idle_entry = self._idle.pop()
+                    break
+                if len(self._in_use) + self._pending < self.maxconn:
+                    idle_entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"no connection available within {timeout:.1f}s "
+                        f"({self.maxconn} in use)")
+                self._lock.wait(remaining)
+            self._pending += 1
+
+        try:
+            if idle_entry is None:
+                connection, created_at = self._connect()
+            else:
+                connection, created_at = self._validate(*idle_entry)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            self._pending -= 1
+            checked_out_at = time.monotonic()
+            self._in_use[id(connection)] = (connection, created_at, checked_out_at)
+            wait_time = checked_out_at - started
+            self._metrics['checkouts'] += 1
+            self._metrics['wait_time_total'] += wait_time
+            self._metrics['wait_time_max'] = max(self._metrics['wait_time_max'], wait_time)
+        return connection
+
+    def putconn(self, connection, close=False):
+        """Return a connection to the pool, closing it if broken or expired"""
+        with self._lock:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                raise pool.PoolError("trying to put unkeyed connection")
+            _, created_at, checked_out_at = entry
+            now = time.monotonic()
+            checkout_time = now - checked_out_at
+            self._metrics['returns'] += 1
+            self._metrics['checkout_time_total'] += checkout_time
+            self._metrics['checkout_time_max'] = max(self._metrics['checkout_time_max'], checkout_time)
+            self._pending += 1
+
+        expired = now - created_at > self.max_lifetime
+        discard = close or self.closed or connection.closed or expired
+        if not discard:
+            status = connection.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    discard = True
+        if discard:
+            self._discard(connection)
+
+        with self._lock:
+            self._pending -= 1
+            if expired:
+                self._metrics['connections_recycled'] += 1
+            if not discard and not self.closed:
+                self._idle.append((connection, created_at, time.monotonic()))
+            self._lock.notify()
+
+    def closeall(self):
+        """Close every connection and refuse further checkouts"""
+        with self._lock:
+            self.closed = True
+            connections = [entry[0] for entry in self._idle]
+            connections += [entry[0] for entry in self._in_use.values()]
+            self._idle.clear()
+            self._in_use.clear()
+            self._lock.notify_all()
+        for connection in connections:
+            self._discard(connection)
+
+    def stats(self):
+        """Snapshot of pool occupancy and wait/checkout timings in seconds"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics.update({
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'wait_time_avg': (metrics['wait_time_total'] / metrics['checkouts']
+                                  if metrics['checkouts'] else 0.0),
+                'checkout_time_avg': (metrics['checkout_time_total'] / metrics['returns']
+                                      if metrics['returns'] else 0.0)
+            })
+        return metrics
+
+
+class ConnectionScope:
+    """One pooled connection and transaction shared by a unit of work
+
+    While a scope is active (see set_scope_lookup), every get_db_connection
+    block reuses the scope's connection instead of checking out its own,
+    and nothing is committed until close() commits or rolls back once.
+    The connection is checked out lazily on first use.
+    """
+
+    def __init__(self):
+        self.connection = None
+        self.failed = False
+        self._close_callbacks = []
+
+    def call_on_close(self, callback):
+        """Run callback() once the scope has committed or rolled back"""
+        self._close_callbacks.append(callback)
+
+    def acquire(self):
+        """Return the scope's connection, checking it out on first use"""
+        if self.connection is None:
+            if connection_pool is None:
+                raise RuntimeError(
+                    "Database connection pool not initialized. "
+                    "Call initialize_connection_pool() first."
+                )
+            started = time.perf_counter()
+            self.connection = connection_pool.getconn()
+            query_metrics.record_checkout(self.connection, time.perf_counter() - started)
+        return self.connection
+
+    def fail(self):
+        """Mark the unit of work failed and roll back so later reads can still run"""
+        self.failed = True
+        if self.connection is not None:
+            try:
+                self.connection.rollback()
+            except psycopg2.Error:
+                pass
+
+    def close(self, error=None):
+        """Commit once on success, roll back on error or earlier failure, and release"""
+        try:
+            return self._finish(error)
+        finally:
+            callbacks, self._close_callbacks = self._close_callbacks, []
+            for callback in callbacks:
+                callback()
+
+    def _finish(self, error):
+        """Commit or roll back the scope's transaction and release its connection"""
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return True
+        committed = False
+        broken = False
+        try:
+            if error is None and not self.failed:
+                connection.commit()
+                committed = True
+            else:
+                connection.rollback()
+        except psycopg2.Error as e:
+            print(f"✗ Error closing connection scope: {e}")
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                broken = True
+        finally:
+            query_metrics.record_release(connection)
+            connection_pool.putconn(connection, close=broken)
+        return committed
+
+
+# Callable returning the active ConnectionScope, or None for per-call connections
+_scope_lookup = None
+
+def set_scope_lookup(lookup):
+    """Install the function that finds the active ConnectionScope (e.g. on flask.g)"""
+    global _scope_lookup
+    _scope_lookup = lookup
+
+def current_scope():
+    """Active ConnectionScope, or None when each call uses its own connection"""
+    return _scope_lookup() if _scope_lookup else None
+
+
+def initialize_connection_pool(**overrides):
+    """Initialize the database connection pool
+
+    Pool sizes and timeouts come from POOL_CONFIG (DB_POOL_* environment
+    variables); keyword arguments override individual settings. Unless
+    DB_QUERY_METRICS is false, cursors record per-statement metrics (see
+    query_metrics).
+    """
     global connection_pool
+    if query_metrics.ENABLED:
+        overrides.setdefault('cursor_factory', query_metrics.InstrumentedCursor)
     try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,
+        connection_pool = ManagedConnectionPool(
+            **{**POOL_CONFIG, **overrides},
             **DB_CONFIG
         )
         if connection_pool:
@@ -43,50 +359,150 @@ def initialize_connection_pool():
         print(f"✗ Error creating connection pool: {e}")
         raise
 
+def ensure_connection_pool(**overrides):
+    """Open this process's pool on first use
+
+    Safe to call on every request: the pool is created once per process,
+    so under a pre-forking server each worker opens its own connections
+    after fork. A pool inherited from the parent is set aside untouched.
+    """
+    global connection_pool
+    if connection_pool is not None and connection_pool.pid == os.getpid():
+        return connection_pool
+    with _pool_lock:
+        if connection_pool is not None and connection_pool.pid != os.getpid():
+            print("⚠️  Warning: connection pool was opened before fork; opening a new one")
+            _inherited_pools.append(connection_pool)
+            connection_pool = None
+        if connection_pool is None:
+            initialize_connection_pool(**overrides)
+    return connection_pool
+
+def worker_pool_config(workers, connection_budget=None):
+    """Pool size overrides giving each of `workers` processes an equal share
+
+    The budget defaults to DB_CONNECTION_BUDGET, so the server as a whole
+    never opens more connections than that however many workers it runs.
+    """
+    budget = connection_budget or CONNECTION_BUDGET
+    workers = max(1, workers)
+    if budget < workers:
+        raise ValueError(f"connection budget {budget} is smaller than {workers} workers")
+    maxconn = budget // workers
+    return {'maxconn': maxconn, 'minconn': min(POOL_CONFIG['minconn'], maxconn)}
+
+def get_pool_stats():
+    """Get connection pool metrics, or None if the pool is not initialized"""
+    if connection_pool is None:
+        return None
+    return connection_pool.stats()
+
 @contextmanager
-def get_db_connection():
-    """Context manager for database connections"""
+def get_db_connection(commit=True, readonly=False, snapshot=False, own_transaction=False):
+    """Context manager for database connections
+
+    Read-write connections run one transaction that is committed exactly
+    once on success (or rolled back when commit=False). Read-only
+    connections use autocommit, so each statement is a single round trip
+    with no BEGIN/COMMIT; with snapshot=True they instead run one
+    BEGIN READ ONLY transaction so several queries see the same data.
+
+    Inside an active ConnectionScope the scope's connection is yielded
+    instead, and committing is left to the scope. own_transaction=True
+    bypasses the scope: chunked writers whose commits must stand whatever
+    the enclosing request does (e.g. batch payroll) check out their own
+    connection and commit as usual.
+    """
+    scope = None if own_transaction else current_scope()
+    if scope is not None:
+        connection = scope.acquire()
+        try:
+            yield connection
+        except Exception:
+            scope.fail()
+            raise
+        return
+
     if connection_pool is None:
         raise RuntimeError(
             "Database connection pool not initialized. "
             "Call initialize_connection_pool() first."
         )
+    started = time.perf_counter()
     connection = connection_pool.getconn()
+    query_metrics.record_checkout(connection, time.perf_counter() - started)
+    broken = False
     try:
+        if readonly and not snapshot:
+            connection.autocommit = True
+        elif readonly:
+            connection.readonly = True
         yield connection
-        connection.commit()
+        if connection.autocommit:
+            pass
+        elif commit and not readonly:
+            connection.commit()
+        else:
+            connection.rollback()
     except Exception as e:
         connection.rollback()
         raise e
     finally:
-        connection_pool.putconn(connection)
+        try:
+            connection.autocommit = False
+            connection.readonly = None
+        except psycopg2.Error:
+            broken = True
+        query_metrics.record_release(connection)
+        connection_pool.putconn(connection, close=broken)
 
 @contextmanager
-def get_db_cursor(commit=True):
-    """Context manager for database cursors"""
-    with get_db_connection() as connection:
+def get_db_cursor(commit=True, readonly=False, snapshot=False, own_transaction=False):
+    """Context manager for database cursors (read-write unless readonly=True)"""
+    with get_db_connection(commit, readonly, snapshot, own_transaction) as connection:
         cursor = connection.cursor()
         try:
             yield cursor
-            if commit:
-                connection.commit()
-        except Exception as e:
-            connection.rollback()
-            raise e
+        finally:
+            cursor.close()
+
+@contextmanager
+def get_read_cursor(snapshot=False):
+    """Context manager for read-only cursors
+
+    Statements run in autocommit mode; pass snapshot=True when several
+    queries must see a consistent view of the data.
+    """
+    with get_db_cursor(readonly=True, snapshot=snapshot) as cursor:
+        yield cursor
+
+@contextmanager
+def get_stream_cursor(itersize=None):
+    """Context manager for server-side (named) read-only cursors
+
+    Iterating the cursor fetches `itersize` rows per round trip inside one
+    BEGIN READ ONLY transaction, so large results are never held in memory.
+    """
+    with get_db_connection(readonly=True, snapshot=True) as connection:
+        cursor = connection.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = itersize or STREAM_ITERSIZE
+        try:
+            yield cursor
         finally:
             cursor.close()
 
 def close_connection_pool():
     """Close all connections in the pool"""
     global connection_pool
-    if connection_pool:
+    if connection_pool and connection_pool.pid == os.getpid():
         connection_pool.closeall()
+        connection_pool = None
         print("✓ Database connection pool closed")
 
 def test_connection():
     """Test database connection"""
     try:
-        with get_db_cursor() as cursor:
+        with get_read_cursor() as cursor:
             cursor.execute("SELECT version();")
             version = cursor.fetchone()
             print(f"✓ Database connection successful")
@@ -155,8 +155,9 @@ def demo_project_management():
     # 7. Update project hours
     print("7. UPDATING PROJECT HOURS")
     print("-" * 70)
-    print("Adding 40 hours for Alice Johnson on Project 1")
-    pm_app.update_employee_project_hours(1001, 1, 40)
+    print("Logging 8 hours for Alice Johnson on Project 1 today")
+    pm_app.update_employee_project_hours(1001, 1, 8)
+    pm_app.rollup_timesheet_hours()
     print()
     
     # 8. Complete a milestone
@@ -2,18 +2,21 @@
 Generate Sample Data for CS631 Company Database
 Populates the database with realistic test data
 """
-from database_config import initialize_connection_pool, close_connection_pool, get_db_cursor
-from datetime import date, timedelta
+from database_config import initialize_connection_pool, close_connection_pool, get_db_cursor, get_read_cursor
+from reporting import refresh_reporting_views
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+import argparse
 import random
+import time
 
 def clear_all_tables():
     """Clear all data from tables (for testing)"""
     try:
         with get_db_cursor() as cursor:
             tables = [
-                'EmployeeOffice', 'ProjectMilestone', 'PayrollHistory', 
-                'JobHistory', 'EmployeeProject', 'Project', 'Phone', 
+                'EmployeeOffice', 'ProjectMilestone', 'PayrollRun', 'PayrollHistory', 
+                'JobHistory', 'TimesheetEntry', 'EmployeeProject', 'Project', 'Phone', 
                 'Office', 'Building', 'Employee', 'Department', 'Division'
             ]
             for table in tables:
@@ -334,11 +337,15 @@ def generate_employee_projects():
         (10001, 4, 'Campaign Director', 220, date(2025, 1, 1), date(2025, 3, 31), False),
         (10002, 4, 'Campaign Manager', 200, date(2025, 1, 1), date(2025, 3, 31), False),
         (10003, 4, 'Content Creator', 180, date(2025, 1, 1), date(2025, 3, 31), False),
+        (10004, 4, 'Graphic Designer', 0, date(2025, 2, 3), date(2025, 3, 31), False),
         
         # Project 5: Product Line Expansion (Active)
         (4001, 5, 'Production Manager', 250, date(2023, 11, 1), None, True),
         (4002, 5, 'Supervisor', 220, date(2023, 11, 1), None, True),
         (5001, 5, 'Supply Chain Lead', 180, date(2023, 11, 1), None, True),
+        (4003, 5, 'Assembly Technician', 0, date(2025, 2, 3), None, True),
+        (4004, 5, 'Quality Inspector', 0, date(2025, 2, 3), None, True),
+        (4005, 5, 'Machine Operator', 0, date(2025, 2, 3), None, True),
         
         # Project 6: Sales CRM (Active)
         (9001, 6, 'Executive Sponsor', 80, date(2025, 1, 10), None, True),
@@ -363,6 +370,32 @@ def generate_employee_projects():
     except Exception as e:
         print(f"✗ Error generating assignments: {e}")
 
+def generate_timesheets():
+    """Generate weekday timesheets for the hourly staff and roll them up"""
+    # employee_number -> (project_number, hours per weekday)
+    timesheets = {
+        4003: (5, Decimal('8')),
+        4004: (5, Decimal('8')),
+        4005: (5, Decimal('6')),
+        10004: (4, Decimal('7.5')),
+    }
+    entries = []
+    day = date(2025, 2, 3)
+    while day <= date(2025, 3, 31):
+        if day.weekday() < 5:
+            entries.extend((employee, project, day, hours)
+                           for employee, (project, hours) in timesheets.items())
+        day += timedelta(days=1)
+    
+    try:
+        with get_db_cursor() as cursor:
+            copy_rows(cursor, 'TimesheetEntry',
+                      ('employee_number', 'project_number', 'work_date', 'hours'), entries)
+            cursor.execute("SELECT * FROM rollup_timesheet_hours()")
+            print(f"✓ Generated {len(entries)} timesheet entries")
+    except Exception as e:
+        print(f"✗ Error generating timesheets: {e}")
+
 def generate_milestones():
     """Generate project milestones"""
     milestones = [
@@ -402,8 +435,393 @@ def generate_milestones():
     except Exception as e:
         print(f"✗ Error generating milestones: {e}")
 
+# ==================== SYNTHETIC LOAD-TEST DATA ====================
+
+FIRST_NAMES = [
+    'Alice', 'Bob', 'Carol', 'David', 'Emma', 'Frank', 'Grace', 'Henry', 'Irene', 'Jack',
+    'Karen', 'Liam', 'Mia', 'Noah', 'Olivia', 'Paul', 'Quinn', 'Rachel', 'Samuel', 'Tina',
+    'Uma', 'Victor', 'Wendy', 'Xavier', 'Yara', 'Zach', 'Amy', 'Ben', 'Chloe', 'Ella'
+]
+LAST_NAMES = [
+    'Johnson', 'Smith', 'Williams', 'Brown', 'Davis', 'Miller', 'Wilson', 'Moore', 'Taylor',
+    'Anderson', 'Thomas', 'Jackson', 'White', 'Harris', 'Martin', 'Thompson', 'Garcia',
+    'Martinez', 'Robinson', 'Clark', 'Lewis', 'Lee', 'Walker', 'Hall', 'Allen', 'Young',
+    'King', 'Wright', 'Scott', 'Baker'
+]
+SALARIED_TITLES = [
+    'Software Engineer', 'QA Engineer', 'Systems Administrator', 'Financial Analyst',
+    'HR Specialist', 'Account Executive', 'Marketing Manager', 'Project Coordinator',
+    'Data Analyst', 'Operations Manager', 'Legal Assistant', 'Logistics Coordinator'
+]
+HOURLY_TITLES = [
+    'Assembly Technician', 'Quality Inspector', 'Machine Operator', 'Warehouse Associate',
+    'Support Technician', 'Graphic Designer'
+]
+PROJECT_ROLES = [
+    'Developer', 'Analyst', 'Tester', 'Designer', 'Consultant', 'Coordinator', 'Lead Engineer'
+]
+MILESTONE_NAMES = [
+    'Requirements Analysis', 'Design', 'Implementation', 'Testing & QA', 'Deployment', 'Training'
+]
+
+# Share of employees who are paid hourly
+HOURLY_SHARE = 0.2
+# Synthetic employees per department and departments per division
+EMPLOYEES_PER_DEPARTMENT = 250
+DEPARTMENTS_PER_DIVISION = 20
+# Employees sharing an office, offices per building
+EMPLOYEES_PER_OFFICE = 4
+OFFICES_PER_BUILDING = 200
+
+# Tables loaded by the synthetic generator, cleared in one TRUNCATE
+SYNTHETIC_TABLES = [
+    'EmployeeOffice', 'ProjectMilestone', 'PayrollRun', 'PayrollHistory', 'JobHistory',
+    'TimesheetEntry', 'EmployeeProject', 'ProjectStatistics', 'Project', 'Phone', 'Office', 'Building',
+    'Employee', 'Department', 'Division'
+]
+
+
+class CopyStream:
+    """File-like object that feeds generated rows to COPY ... FROM STDIN
+    
+    Rows are tuples of values written in PostgreSQL text format (None
+    becomes NULL), so a table of any size streams in constant memory.
+    """
+    
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.count = 0
+    
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = '\t'.join('\\N' if v is None else str(v) for v in row) + '\n'
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+        data = ''.join(chunks)
+        if size < 0:
+            size = len(data)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY generated rows into table and report rows per second"""
+    stream = CopyStream(rows)
+    started = time.perf_counter()
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=65536)
+    elapsed = time.perf_counter() - started
+    rate = stream.count / elapsed if elapsed > 0 else 0
+    print(f"  {table:<18} {stream.count:>12,} rows {elapsed:>9.2f}s {rate:>12,.0f} rows/s")
+    return stream.count
+
+
+def cents(amount):
+    """Format integer cents as a NUMERIC literal"""
+    return f"{amount // 100}.{amount % 100:02d}"
+
+
+def payroll_taxes(gross_cents):
+    """Taxes in cents, rounded half up like ROUND(gross * rate, 2) in the schema"""
+    federal = (gross_cents * 10 + 50) // 100
+    state = (gross_cents * 5 + 50) // 100
+    other = (gross_cents * 3 + 50) // 100
+    return federal, state, other, gross_cents - federal - state - other
+
+
+def month_periods(as_of, months):
+    """(start, end) of the `months` full calendar months before as_of"""
+    periods = []
+    end = as_of.replace(day=1) - timedelta(days=1)
+    for _ in range(months):
+        start = end.replace(day=1)
+        periods.append((start, end))
+        end = start - timedelta(days=1)
+    return periods[::-1]
+
+
+def employee_profile(seed, employee_number, departments, earliest, as_of):
+    """Deterministic profile of one synthetic employee
+    
+    Each employee has its own seeded generator, so every table can be
+    streamed independently without holding the organization in memory.
+    Returns (name, department_id, hourly, jobs) where jobs is a list of
+    (title, start_date, end_date, pay_cents) and the last job is current.
+    pay_cents is the annual salary or, for hourly employees, the rate.
+    """
+    rng = random.Random(seed * 1000003 + employee_number)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    department_id = rng.randint(1, departments)
+    hourly = rng.random() < HOURLY_SHARE
+    titles = HOURLY_TITLES if hourly else SALARIED_TITLES
+    pay = rng.randint(1500, 4500) if hourly else rng.randint(400, 1500) * 10000
+    
+    span = (as_of - earliest).days
+    first_start = earliest + timedelta(days=rng.randint(0, span - 1))
+    remaining = (as_of - first_start).days
+    promotions = rng.choice([0, 0, 1, 2])
+    offsets = sorted(rng.sample(range(90, remaining), promotions)) if remaining > 90 + promotions else []
+    starts = [first_start] + [first_start + timedelta(days=d) for d in offsets]
+    
+    jobs = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] - timedelta(days=1) if i + 1 < len(starts) else None
+        jobs.append((rng.choice(titles), start, end, pay))
+        pay = pay * rng.randint(105, 120) // 100
+    return name, department_id, hourly, jobs
+
+
+def generate_synthetic_data(employees, projects=None, months=12, seed=631, as_of=None):
+    """Generate a seeded, reproducible organization of any size with COPY
+    
+    Produces divisions, departments, employees with job histories,
+    facilities, projects with assignments and milestones, `months` of
+    completed payroll and this month's timesheets so far. The data satisfies every CHECK constraint and
+    the invariants the triggers enforce (one current job and at most one
+    current project per employee). The project statistics triggers are
+    disabled for the bulk load and the counters rebuilt set-based.
+    """
+    as_of = as_of or date.today()
+    projects = projects if projects is not None else max(1, employees // 25)
+    departments = max(1, -(-employees // EMPLOYEES_PER_DEPARTMENT))
+    divisions = max(1, -(-departments // DEPARTMENTS_PER_DIVISION))
+    offices = -(-employees // EMPLOYEES_PER_OFFICE)
+    buildings = -(-offices // OFFICES_PER_BUILDING)
+    periods = month_periods(as_of, months)
+    earliest = (periods[0][0] if periods else as_of) - timedelta(days=5 * 365)
+    rng = random.Random(seed)
+    
+    def profiles():
+        for number in range(1, employees + 1):
+            yield number, employee_profile(seed, number, departments, earliest, as_of)
+    
+    def division_of(department_id):
+        return (department_id - 1) % divisions + 1
+    
+    print(f"Generating {employees:,} employees, {projects:,} projects and "
+          f"{months} months of payroll (seed {seed}, as of {as_of})...")
+    
+    started = time.perf_counter()
+    with get_db_cursor() as cursor:
+        cursor.execute(f"TRUNCATE {', '.join(SYNTHETIC_TABLES)} RESTART IDENTITY CASCADE")
+        
+        copy_rows(cursor, 'Division', ('division_id', 'division_name'),
+                  ((d, f"Division {d:04d}") for d in range(1, divisions + 1)))
+        copy_rows(cursor, 'Department', ('department_id', 'department_name', 'budget', 'division_id'),
+                  ((d, f"Department {d:05d}", cents(rng.randint(100000, 1000000) * 100), division_of(d))
+                   for d in range(1, departments + 1)))
+        
+        copy_rows(cursor, 'Employee',
+                  ('employee_number', 'employee_name', 'title', 'employment_type',
+                   'hourly_rate', 'department_id', 'division_id'),
+                  ((number, name, jobs[-1][0], 'hourly' if hourly else 'salaried',
+                    cents(jobs[-1][3]) if hourly else None, dept, division_of(dept))
+                   for number, (name, dept, hourly, jobs) in profiles()))
+        
+        # First employee of each department and division is its head
+        cursor.execute("""
+            UPDATE Department d SET department_head_emp_id = h.head
+            FROM (SELECT department_id, MIN(employee_number) AS head
+                  FROM Employee GROUP BY department_id) h
+            WHERE d.department_id = h.department_id
+        """)
+        cursor.execute("""
+            UPDATE Division v SET division_head_emp_id = h.head
+            FROM (SELECT division_id, MIN(employee_number) AS head
+                  FROM Employee GROUP BY division_id) h
+            WHERE v.division_id = h.division_id
+        """)
+        cursor.execute("SELECT setval('division_division_id_seq', %s)", (divisions,))
+        cursor.execute("SELECT setval('department_department_id_seq', %s)", (departments,))
+        
+        copy_rows(cursor, 'JobHistory',
+                  ('employee_number', 'title', 'start_date', 'end_date', 'salary', 'is_current'),
+                  ((number, title, start, end, cents(pay), end is None)
+                   for number, (_, _, _, jobs) in profiles()
+                   for title, start, end, pay in jobs))
+        
+        copy_rows(cursor, 'Building', ('building_code', 'building_name', 'year_built_or_bought', 'cost'),
+                  ((f"B{b:05d}", f"Building {b:05d}", rng.randint(1960, min(as_of.year, date.today().year)),
+                    cents(rng.randint(1000000, 20000000) * 100))
+                   for b in range(1, buildings + 1)))
+        copy_rows(cursor, 'Office', ('office_number', 'area_sqft', 'building_code'),
+                  ((f"O{o:07d}", rng.randint(100, 400), f"B{(o - 1) // OFFICES_PER_BUILDING + 1:05d}")
+                   for o in range(1, offices + 1)))
+        copy_rows(cursor, 'Phone', ('phone_number', 'office_number', 'assigned_to_emp_id'),
+                  ((f"555-{o:07d}", f"O{o:07d}", (o - 1) * EMPLOYEES_PER_OFFICE + 1)
+                   for o in range(1, offices + 1)))
+        copy_rows(cursor, 'EmployeeOffice', ('employee_number', 'office_number', 'assignment_date'),
+                  ((e, f"O{(e - 1) // EMPLOYEES_PER_OFFICE + 1:07d}", as_of)
+                   for e in range(1, employees + 1)))
+        
+        # Projects: (project_number, start, end); managers are any employee
+        project_rows = []
+        for p in range(1, projects + 1):
+            start = earliest + timedelta(days=rng.randint(0, (as_of - earliest).days - 31))
+            end = None
+            if rng.random() < 0.35:
+                end = start + timedelta(days=rng.randint(30, max(30, (as_of - start).days)))
+                end = min(end, as_of)
+            manager = rng.randint(1, employees)
+            department = employee_profile(seed, manager, departments, earliest, as_of)[1]
+            project_rows.append((p, f"Project {p:06d}", cents(rng.randint(50000, 2000000) * 100),
+                                 start, end, manager, department))
+        copy_rows(cursor, 'Project',
+                  ('project_number', 'project_name', 'budget', 'date_started', 'date_ended',
+                   'manager_emp_id', 'department_id'),
+                  project_rows)
+        active = [row for row in project_rows if row[4] is None]
+        
+        def assignments():
+            for number in range(1, employees + 1):
+                arng = random.Random(seed * 2000003 + number)
+                chosen = set()
+                if active and arng.random() < 0.6:
+                    p, _, _, start, _, _, _ = arng.choice(active)
+                    chosen.add(p)
+                    assigned = max(start, as_of - timedelta(days=arng.randint(0, (as_of - start).days)))
+                    yield (number, p, arng.choice(PROJECT_ROLES), cents(arng.randint(0, 80000)),
+                           assigned, None, True)
+                for _ in range(arng.choice([0, 1, 1, 2]) if projects else 0):
+                    p, _, _, start, end, _, _ = project_rows[arng.randrange(projects)]
+                    if p in chosen:
+                        continue
+                    chosen.add(p)
+                    last = end or as_of
+                    assigned = start + timedelta(days=arng.randint(0, (last - start).days))
+                    finished = min(last, assigned + timedelta(days=arng.randint(30, 400)))
+                    yield (number, p, arng.choice(PROJECT_ROLES), cents(arng.randint(1000, 200000)),
+                           assigned, finished, False)
+        
+        def milestones():
+            for p, _, _, start, end, _, _ in project_rows:
+                due = start
+                for name in MILESTONE_NAMES[:rng.randint(2, len(MILESTONE_NAMES))]:
+                    due = due + timedelta(days=rng.randint(14, 90))
+                    if end is not None:
+                        completed = min(due, end)
+                        yield (p, name, f"{name} for project {p}", due, completed,
+                               'completed', 'Delivered', None)
+                    elif due <= as_of and rng.random() < 0.8:
+                        yield (p, name, f"{name} for project {p}", due, due,
+                               'completed', 'Delivered', None)
+                    else:
+                        status = 'in_progress' if due <= as_of + timedelta(days=30) else 'pending'
+                        yield (p, name, f"{name} for project {p}", due, None,
+                               status, None, 'Remaining work')
+        
+        cursor.execute("ALTER TABLE EmployeeProject DISABLE TRIGGER trg_maintain_project_team_statistics")
+        cursor.execute("ALTER TABLE ProjectMilestone DISABLE TRIGGER trg_maintain_project_milestone_statistics")
+        copy_rows(cursor, 'EmployeeProject',
+                  ('employee_number', 'project_number', 'role', 'hours_worked',
+                   'start_date', 'end_date', 'is_current'),
+                  assignments())
+        copy_rows(cursor, 'ProjectMilestone',
+                  ('project_number', 'milestone_name', 'description', 'due_date',
+                   'completion_date', 'status', 'details_done', 'details_remaining'),
+                  milestones())
+        cursor.execute("ALTER TABLE EmployeeProject ENABLE TRIGGER trg_maintain_project_team_statistics")
+        cursor.execute("ALTER TABLE ProjectMilestone ENABLE TRIGGER trg_maintain_project_milestone_statistics")
+        cursor.execute("SELECT rebuild_project_statistics()")
+        
+        # Weekday timesheets so far this month for hourly employees on a
+        # current project, ready for this month's payroll; the synthetic
+        # hours_worked already account for them, so the roll-up watermark
+        # is moved past them
+        def timesheets():
+            hourly = {number for number, (_, _, is_hourly, _) in profiles() if is_hourly}
+            month_start = as_of.replace(day=1)
+            for number, p, _, _, assigned, _, current in assignments():
+                if not current or number not in hourly:
+                    continue
+                day = max(assigned, month_start)
+                while day <= as_of:
+                    if day.isoweekday() < 6:
+                        yield (number, p, day, 6 + (number + day.day) % 5)
+                    day += timedelta(days=1)
+        
+        copy_rows(cursor, 'TimesheetEntry',
+                  ('employee_number', 'project_number', 'work_date', 'hours'),
+                  timesheets())
+        cursor.execute("""
+            UPDATE TimesheetRollup
+            SET last_entry_id = (SELECT COALESCE(MAX(entry_id), 0) FROM TimesheetEntry),
+                rolled_up_at = CURRENT_TIMESTAMP
+        """)
+        
+        def payroll():
+            for number, (_, _, hourly, jobs) in profiles():
+                prng = random.Random(seed * 3000017 + number)
+                for start, end in periods:
+                    pays = [pay for _, job_start, _, pay in jobs if job_start <= end]
+                    if not pays:
+                        continue
+                    if hourly:
+                        gross = pays[-1] * prng.randint(120, 184)
+                    else:
+                        gross = (pays[-1] + 6) // 12
+                    federal, state, other, net = payroll_taxes(gross)
+                    yield (number, start, end, cents(gross), cents(federal), cents(state),
+                           cents(other), cents(net), end)
+        
+        if periods:
+            cursor.execute("""
+                SELECT create_payroll_partition(year::int)
+                FROM generate_series(%s, %s) AS year
+            """, (periods[0][0].year, periods[-1][0].year))
+        copy_rows(cursor, 'PayrollHistory',
+                  ('employee_number', 'pay_period_start', 'pay_period_end', 'gross_pay',
+                   'federal_tax', 'state_tax', 'other_tax', 'net_pay', 'payment_date'),
+                  payroll())
+        cursor.execute("""
+            INSERT INTO PayrollRun 
+            (pay_period_start, pay_period_end, payment_date, status,
+             last_employee_number, employees_processed, completed_at)
+            SELECT pay_period_start, pay_period_end, MAX(payment_date), 'completed',
+                   MAX(employee_number), COUNT(*), CURRENT_TIMESTAMP
+            FROM PayrollHistory
+            GROUP BY pay_period_start, pay_period_end
+        """)
+    
+    with get_db_cursor() as cursor:
+        cursor.execute(f"ANALYZE {', '.join(SYNTHETIC_TABLES)}")
+    print(f"✓ Synthetic data generated in {time.perf_counter() - started:.1f}s")
+
+
+def parse_args():
+    """Parse command-line options for synthetic data generation"""
+    parser = argparse.ArgumentParser(
+        description="Generate sample data; pass --employees for a synthetic load-test dataset")
+    parser.add_argument('--employees', type=int,
+                        help='number of synthetic employees (default: the small demo dataset)')
+    parser.add_argument('--projects', type=int,
+                        help='number of synthetic projects (default: employees / 25)')
+    parser.add_argument('--months', type=int, default=12,
+                        help='months of past payroll to generate (default: 12)')
+    parser.add_argument('--seed', type=int, default=631,
+                        help='random seed; the same seed and --as-of give the same data')
+    parser.add_argument('--as-of', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help='reference date YYYY-MM-DD (default: today)')
+    args = parser.parse_args()
+    if args.employees is None and (args.projects is not None or args.as_of is not None):
+        parser.error('--projects and --as-of require --employees')
+    if args.employees is not None and args.employees < 1:
+        parser.error('--employees must be at least 1')
+    if args.months < 0 or (args.projects is not None and args.projects < 0):
+        parser.error('--months and --projects must not be negative')
+    return args
+
 def main():
     """Main function to generate all sample data"""
+    args = parse_args()
+    
     print("\n" + "="*60)
     print("CS631 Company Database - Sample Data Generation")
     print("="*60 + "\n")
@@ -411,29 +829,40 @@ def main():
     try:
         initialize_connection_pool()
         
-        print("Clearing existing data...")
-        clear_all_tables()
-        print()
-        
-        print("Generating organizational structure...")
-        generate_divisions()
-        generate_departments()
-        print()
-        
-        print("Generating employee data...")
-        generate_employees()
-        update_division_and_department_heads()
-        generate_job_history()
-        print()
-        
-        print("Generating facilities data...")
-        generate_buildings_and_offices()
-        print()
-        
-        print("Generating project data...")
-        generate_projects()
-        generate_employee_projects()
-        generate_milestones()
+        if args.employees:
+            generate_synthetic_data(args.employees, projects=args.projects, months=args.months,
+                                    seed=args.seed, as_of=args.as_of)
+            print()
+        else:
+            print("Clearing existing data...")
+            clear_all_tables()
+            print()
+            
+            print("Generating organizational structure...")
+            generate_divisions()
+            generate_departments()
+            print()
+            
+            print("Generating employee data...")
+            generate_employees()
+            update_division_and_department_heads()
+            generate_job_history()
+            print()
+            
+            print("Generating facilities data...")
+            generate_buildings_and_offices()
+            print()
+            
+            print("Generating project data...")
+            generate_projects()
+            generate_employee_projects()
+            generate_timesheets()
+            generate_milestones()
+            print()
+        
+        print("Refreshing reporting views...")
+        if refresh_reporting_views():
+            print("✓ Reporting views refreshed")
         print()
         
         print("="*60)
@@ -441,7 +870,7 @@ def main():
         print("="*60 + "\n")
         
         print("Summary:")
-        with get_db_cursor() as cursor:
+        with get_read_cursor() as cursor:
             cursor.execute("SELECT COUNT(*) FROM Division")
             print(f"  Divisions: {cursor.fetchone()[0]}")
             cursor.execute("SELECT COUNT(*) FROM Department")
@@ -456,10 +885,14 @@ def main():
             print(f"  Projects: {cursor.fetchone()[0]}")
             cursor.execute("SELECT COUNT(*) FROM EmployeeProject")
             print(f"  Employee-Project Assignments: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM TimesheetEntry")
+            print(f"  Timesheet Entries: {cursor.fetchone()[0]}")
             cursor.execute("SELECT COUNT(*) FROM ProjectMilestone")
             print(f"  Milestones: {cursor.fetchone()[0]}")
             cursor.execute("SELECT COUNT(*) FROM JobHistory")
             print(f"  Job History Records: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM PayrollHistory")
+            print(f"  Payroll Records: {cursor.fetchone()[0]}")
         print()
         
     except Exception as e:
@@ -0,0 +1,39 @@
+"""
+Gunicorn Configuration
+Runs wsgi:app with one connection pool per worker process, opened after fork
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threaded workers: each live page holds an /events stream open on a
+# thread, which would otherwise take a whole sync worker
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('WEB_THREADS', 8))
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+
+# End event streams well inside the worker timeout (the browser reconnects),
+# and turn live updates off when every request has its worker to itself
+os.environ['EVENT_STREAM_MAX_SECONDS'] = str(min(
+    int(os.getenv('EVENT_STREAM_MAX_SECONDS', timeout)), max(timeout - 15, 5)))
+if worker_class == 'sync' and threads == 1:
+    os.environ['LIVE_UPDATES'] = 'false'
+
+# The app must be imported in each worker, never in the master, so that no
+# database connection is opened before fork
+preload_app = False
+
+# create_app() splits DB_CONNECTION_BUDGET across WEB_CONCURRENCY workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+
+def worker_exit(server, worker):
+    """Stop the exiting worker's change feed and reporting refresher, then close its pool"""
+    from change_feed import stop_change_feed
+    from database_config import close_connection_pool
+    from reporting import stop_refresher
+    stop_change_feed()
+    stop_refresher()
+    close_connection_pool()
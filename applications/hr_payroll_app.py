@@ -2,10 +2,135 @@
 HR/Payroll Application
 Handles employee management, salary tracking, and payroll processing
 """
-from database_config import get_db_cursor
-from datetime import datetime, timedelta
-from decimal import Decimal
+from database_config import (
+    get_db_cursor, get_read_cursor, get_stream_cursor, initialize_connection_pool
+)
+from reporting import PAYROLL_REPORTING_VIEWS, refresh_after_write
+from compensation_cache import compensation_cache, invalidate_after_write
+from project_cache import (
+    employee_tag, publish_invalidation, invalidate_after_write as invalidate_projects_after_write
+)
+from payroll_kernel import CENT, calculate_pay_columns, from_cents
+from psycopg2.extras import execute_values
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import csv
+import io
+import json
+import multiprocessing
+import os
 import sys
+import time
+
+# Query shared by the list and streaming variants of the payroll report
+PAYROLL_REPORT_QUERY = """
+    SELECT 
+        p.payroll_id,
+        e.employee_number,
+        e.employee_name,
+        e.employment_type,
+        p.gross_pay,
+        p.federal_tax,
+        p.state_tax,
+        p.other_tax,
+        p.net_pay,
+        p.payment_date
+    FROM PayrollHistory p
+    JOIN Employee e ON p.employee_number = e.employee_number
+    WHERE p.pay_period_start = %s AND p.pay_period_end = %s
+    ORDER BY e.employee_number
+"""
+
+# Queries shared by the sync and async (async_app) read paths
+EMPLOYEE_INFO_QUERY = """
+    SELECT 
+        e.employee_number,
+        e.employee_name,
+        e.title,
+        e.employment_type,
+        e.hourly_rate,
+        jh.salary AS current_salary,
+        d.department_name,
+        div.division_name,
+        jh.start_date AS current_job_start
+    FROM Employee e
+    LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number 
+        AND jh.is_current = TRUE
+    LEFT JOIN Department d ON e.department_id = d.department_id
+    LEFT JOIN Division div ON e.division_id = div.division_id
+    WHERE e.employee_number = %s
+"""
+
+EMPLOYEE_DETAILS_QUERY = """
+    SELECT 
+        e.employee_number,
+        e.employee_name,
+        e.title,
+        e.employment_type,
+        e.hourly_rate,
+        d.department_name,
+        div.division_name
+    FROM Employee e
+    LEFT JOIN Department d ON e.department_id = d.department_id
+    LEFT JOIN Division div ON e.division_id = div.division_id
+    WHERE e.employee_number = %s
+"""
+
+SALARY_HISTORY_QUERY = """
+    SELECT 
+        job_history_id,
+        title,
+        salary,
+        start_date,
+        end_date,
+        is_current
+    FROM JobHistory
+    WHERE employee_number = %s
+    ORDER BY start_date DESC
+"""
+
+# W-2 style totals for one employee and pay period start range [start, end)
+YEARLY_TAX_SUMMARY_QUERY = """
+    SELECT 
+        SUM(gross_pay) AS total_gross,
+        SUM(federal_tax) AS total_federal,
+        SUM(state_tax) AS total_state,
+        SUM(other_tax) AS total_other,
+        SUM(net_pay) AS total_net,
+        COUNT(*) AS pay_periods
+    FROM PayrollHistory
+    WHERE employee_number = %s 
+    AND pay_period_start >= %s AND pay_period_start < %s
+"""
+
+STORED_TAX_SUMMARY_QUERY = """
+    SELECT 
+        total_gross,
+        total_federal,
+        total_state,
+        total_other,
+        total_net,
+        pay_periods
+    FROM YearEndTaxSummary
+    WHERE employee_number = %s AND tax_year = %s
+"""
+
+# Columns of a year-end (W-2) statement, in export order
+W2_COLUMNS = (
+    'tax_year', 'employee_number', 'employee_name', 'department_id',
+    'total_gross', 'total_federal', 'total_state', 'total_other', 'total_net',
+    'pay_periods'
+)
+
+# Year-end export formats and their file extensions
+W2_FORMATS = {'csv': 'csv', 'jsonl': 'jsonl'}
+
+# Columns accepted by the bulk onboarding API, in staging table order
+ONBOARDING_COLUMNS = (
+    'employee_number', 'employee_name', 'title', 'employment_type',
+    'hourly_rate', 'department_id', 'division_id', 'salary', 'start_date'
+)
 
 class HRPayrollApp:
     """HR and Payroll Management Application"""
@@ -35,7 +160,8 @@ class HRPayrollApp:
                 
                 emp_id = cursor.fetchone()[0]
                 print(f"✓ Employee {emp_id} ({name}) added successfully")
-                return emp_id
+            refresh_after_write(PAYROLL_REPORTING_VIEWS)
+            return emp_id
         except Exception as e:
             print(f"✗ Error adding employee: {e}")
             return None
@@ -54,11 +180,209 @@ class HRPayrollApp:
                 
                 job_id = cursor.fetchone()[0]
                 print(f"✓ Job history record {job_id} created for employee {employee_number}")
-                return job_id
+            invalidate_after_write([employee_number])
+            refresh_after_write(PAYROLL_REPORTING_VIEWS)
+            return job_id
         except Exception as e:
             print(f"✗ Error adding job history: {e}")
             return None
     
+    def onboard_employees(self, rows, strict=False):
+        """Bulk onboard employees with their starting job history
+        
+        rows is an iterable of dicts keyed by ONBOARDING_COLUMNS. Rows are
+        validated in Python, COPYed into a staging table and merged into
+        Employee and JobHistory in one transaction. Rows that fail
+        validation are reported and skipped; with strict=True any error
+        aborts the whole batch. For hourly employees the starting salary
+        defaults to the hourly rate, as in the add employee form.
+        
+        Returns {'imported': [employee numbers], 'errors': [(row, message)]}
+        with rows numbered from 1.
+        """
+        return self._onboard_numbered_rows(enumerate(rows, start=1), strict)
+    
+    def onboard_employees_csv(self, stream, strict=False):
+        """Bulk onboard employees from a CSV stream with a header row
+        
+        Errors are reported against the CSV line number.
+        """
+        reader = csv.DictReader(stream)
+        rows = ((reader.line_num, row) for row in reader)
+        return self._onboard_numbered_rows(rows, strict)
+    
+    def _onboard_numbered_rows(self, rows, strict):
+        """Validate, stage and merge (row_number, row) pairs"""
+        errors = []
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        seen = set()
+        staged = 0
+        
+        for row_number, row in rows:
+            try:
+                record = self._validate_onboarding_row(row)
+            except ValueError as e:
+                errors.append((row_number, str(e)))
+                continue
+            if record[0] in seen:
+                errors.append((row_number, f"duplicate employee_number {record[0]} in batch"))
+                continue
+            seen.add(record[0])
+            writer.writerow((row_number,) + record)
+            staged += 1
+        
+        if strict and errors:
+            print(f"✗ Onboarding aborted: {len(errors)} invalid row(s)")
+            return {'imported': [], 'errors': errors}
+        if not staged:
+            return {'imported': [], 'errors': errors}
+        
+        try:
+            with get_db_cursor() as cursor:
+                cursor.execute("""
+                    CREATE TEMP TABLE onboarding_stage (
+                        row_number INTEGER PRIMARY KEY,
+                        employee_number INTEGER NOT NULL,
+                        employee_name VARCHAR(200) NOT NULL,
+                        title VARCHAR(100) NOT NULL,
+                        employment_type VARCHAR(20) NOT NULL,
+                        hourly_rate DECIMAL(10, 2),
+                        department_id INTEGER,
+                        division_id INTEGER,
+                        salary DECIMAL(12, 2) NOT NULL,
+                        start_date DATE NOT NULL
+                    ) ON COMMIT DROP
+                """)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    "COPY onboarding_stage FROM STDIN WITH (FORMAT csv)", buffer)
+                
+                # Rows that conflict with existing data
+                cursor.execute("""
+                    SELECT s.row_number,
+                           CASE
+                               WHEN e.employee_number IS NOT NULL
+                                   THEN 'employee_number ' || s.employee_number || ' already exists'
+                               WHEN s.department_id IS NOT NULL AND d.department_id IS NULL
+                                   THEN 'unknown department_id ' || s.department_id
+                               ELSE 'unknown division_id ' || s.division_id
+                           END
+                    FROM onboarding_stage s
+                    LEFT JOIN Employee e ON s.employee_number = e.employee_number
+                    LEFT JOIN Department d ON s.department_id = d.department_id
+                    LEFT JOIN Division v ON s.division_id = v.division_id
+                    WHERE e.employee_number IS NOT NULL
+                       OR (s.department_id IS NOT NULL AND d.department_id IS NULL)
+                       OR (s.division_id IS NOT NULL AND v.division_id IS NULL)
+                    ORDER BY s.row_number
+                """)
+                conflicts = cursor.fetchall()
+                errors.extend(conflicts)
+                if strict and errors:
+                    raise ValueError(f"{len(errors)} invalid row(s)")
+                if conflicts:
+                    cursor.execute("""
+                        DELETE FROM onboarding_stage
+                        WHERE row_number = ANY(%s)
+                    """, ([r[0] for r in conflicts],))
+                
+                cursor.execute("""
+                    INSERT INTO Employee 
+                    (employee_number, employee_name, title, employment_type, 
+                     hourly_rate, department_id, division_id)
+                    SELECT employee_number, employee_name, title, employment_type,
+                           hourly_rate, department_id, division_id
+                    FROM onboarding_stage
+                    ORDER BY row_number
+                    RETURNING employee_number
+                """)
+                imported = [r[0] for r in cursor.fetchall()]
+                
+                cursor.execute("""
+                    INSERT INTO JobHistory 
+                    (employee_number, title, start_date, salary, is_current)
+                    SELECT employee_number, title, start_date, salary, TRUE
+                    FROM onboarding_stage
+                    ORDER BY row_number
+                """)
+            
+            errors.sort()
+            print(f"✓ Onboarded {len(imported)} employees ({len(errors)} rejected)")
+            if imported:
+                invalidate_after_write(imported)
+                refresh_after_write(PAYROLL_REPORTING_VIEWS)
+            return {'imported': imported, 'errors': errors}
+        except Exception as e:
+            print(f"✗ Error onboarding employees: {e}")
+            errors.sort()
+            return {'imported': [], 'errors': errors or [(None, str(e))]}
+    
+    def _validate_onboarding_row(self, row):
+        """Validate one onboarding row and return it as a staging tuple"""
+        def text(name, max_length, required=True):
+            value = (row.get(name) or '').strip()
+            if required and not value:
+                raise ValueError(f"{name} is required")
+            if len(value) > max_length:
+                raise ValueError(f"{name} longer than {max_length} characters")
+            return value or None
+        
+        def integer(name, required=False):
+            value = row.get(name)
+            if value is None or str(value).strip() == '':
+                if required:
+                    raise ValueError(f"{name} is required")
+                return None
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be an integer, got {value!r}")
+        
+        def amount(name):
+            value = row.get(name)
+            if value is None or str(value).strip() == '':
+                return None
+            try:
+                value = Decimal(str(value).strip())
+            except InvalidOperation:
+                raise ValueError(f"{name} must be a number, got {value!r}")
+            if not value.is_finite() or value <= 0:
+                raise ValueError(f"{name} must be greater than 0")
+            return value.quantize(Decimal('0.01'))
+        
+        employee_number = integer('employee_number', required=True)
+        if employee_number <= 0:
+            raise ValueError("employee_number must be positive")
+        employee_name = text('employee_name', 200)
+        title = text('title', 100)
+        employment_type = text('employment_type', 20).lower()
+        if employment_type not in ('salaried', 'hourly'):
+            raise ValueError(f"employment_type must be 'salaried' or 'hourly', got {employment_type!r}")
+        
+        hourly_rate = amount('hourly_rate')
+        salary = amount('salary')
+        if employment_type == 'hourly':
+            if hourly_rate is None:
+                raise ValueError("hourly_rate is required for hourly employees")
+            salary = salary or hourly_rate
+        else:
+            if hourly_rate is not None:
+                raise ValueError("hourly_rate must be empty for salaried employees")
+            if salary is None:
+                raise ValueError("salary is required for salaried employees")
+        
+        start_date = row.get('start_date')
+        if not hasattr(start_date, 'isoformat'):
+            try:
+                start_date = datetime.strptime(str(start_date or '').strip(), '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f"start_date must be YYYY-MM-DD, got {row.get('start_date')!r}")
+        
+        return (employee_number, employee_name, title, employment_type,
+                hourly_rate, integer('department_id'), integer('division_id'),
+                salary, start_date)
+    
     def update_employee_title(self, employee_number, new_title, new_salary, effective_date):
         """Update employee title and create new job history record"""
         try:
@@ -86,97 +410,143 @@ class HRPayrollApp:
                 """, (employee_number, new_title, effective_date, new_salary))
                 
                 job_id = cursor.fetchone()[0]
+                # Project teams show the title
+                publish_invalidation(cursor, [employee_tag(employee_number)])
                 print(f"✓ Employee {employee_number} promoted to {new_title}")
                 print(f"  New salary: ${new_salary:,.2f}")
-                return job_id
+            invalidate_after_write([employee_number])
+            invalidate_projects_after_write([employee_tag(employee_number)])
+            refresh_after_write(PAYROLL_REPORTING_VIEWS)
+            return job_id
         except Exception as e:
             print(f"✗ Error updating employee title: {e}")
             return None
     
     def get_employee_info(self, employee_number):
-        """Get detailed employee information"""
+        """Get detailed employee information
+
+        Current salary and job start come from the compensation cache when
+        the employee is cached, skipping the JobHistory join; otherwise the
+        joined query fills the cache.
+        """
         try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    SELECT 
-                        e.employee_number,
-                        e.employee_name,
-                        e.title,
-                        e.employment_type,
-                        e.hourly_rate,
-                        jh.salary AS current_salary,
-                        d.department_name,
-                        div.division_name,
-                        jh.start_date AS current_job_start
-                    FROM Employee e
-                    LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number 
-                        AND jh.is_current = TRUE
-                    LEFT JOIN Department d ON e.department_id = d.department_id
-                    LEFT JOIN Division div ON e.division_id = div.division_id
-                    WHERE e.employee_number = %s
-                """, (employee_number,))
+            cached, _ = compensation_cache.get_many([employee_number])
+            with get_read_cursor() as cursor:
+                if employee_number in cached:
+                    cursor.execute(EMPLOYEE_DETAILS_QUERY, (employee_number,))
+                    details = cursor.fetchone()
+                    if details is None:
+                        return None
+                    salary, start_date = cached[employee_number] or (None, None)
+                    return self._employee_info_from_row(
+                        details[:5] + (salary,) + details[5:] + (start_date,))
                 
+                generation = compensation_cache.generation()
+                cursor.execute(EMPLOYEE_INFO_QUERY, (employee_number,))
                 result = cursor.fetchone()
-                if result:
-                    return {
-                        'employee_number': result[0],
-                        'name': result[1],
-                        'title': result[2],
-                        'employment_type': result[3],
-                        'hourly_rate': result[4],
-                        'current_salary': result[5],
-                        'department': result[6],
-                        'division': result[7],
-                        'current_job_start': result[8]
-                    }
-                return None
+            if result:
+                compensation = (result[5], result[8]) if result[8] is not None else None
+                compensation_cache.put_many({employee_number: compensation}, generation)
+            return self._employee_info_from_row(result)
         except Exception as e:
             print(f"✗ Error getting employee info: {e}")
             return None
     
-    def list_all_employees(self):
-        """List all employees with current information"""
+    def _employee_info_from_row(self, result):
+        """Shape an EMPLOYEE_INFO_QUERY row as a dict (None if not found)"""
+        if result:
+            return {
+                'employee_number': result[0],
+                'name': result[1],
+                'title': result[2],
+                'employment_type': result[3],
+                'hourly_rate': result[4],
+                'current_salary': result[5],
+                'department': result[6],
+                'division': result[7],
+                'current_job_start': result[8]
+            }
+        return None
+    
+    def _employee_list_query(self, after=None, limit=None, department_id=None,
+                             employment_type=None):
+        """Build the employee listing query and its parameters
+
+        Pages are keyset-based: pass the last employee_number of the previous
+        page as `after` to continue from it using the primary key index.
+        """
+        conditions = []
+        params = []
+        if after is not None:
+            conditions.append("e.employee_number > %s")
+            params.append(after)
+        if department_id is not None:
+            conditions.append("e.department_id = %s")
+            params.append(department_id)
+        if employment_type is not None:
+            conditions.append("e.employment_type = %s")
+            params.append(employment_type)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT %s"
+            params.append(limit)
+
+        query = f"""
+            SELECT 
+                e.employee_number,
+                e.employee_name,
+                e.title,
+                e.employment_type,
+                COALESCE(jh.salary, 0) AS salary,
+                COALESCE(e.hourly_rate, 0) AS hourly_rate,
+                COALESCE(d.department_name, div.division_name, 'Unassigned') AS org_unit
+            FROM Employee e
+            LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number 
+                AND jh.is_current = TRUE
+            LEFT JOIN Department d ON e.department_id = d.department_id
+            LEFT JOIN Division div ON e.division_id = div.division_id
+            {where}
+            ORDER BY e.employee_number
+            {limit_clause}
+        """
+        return query, params
+
+    def list_all_employees(self, limit=None, after=None, department_id=None,
+                           employment_type=None):
+        """List employees with current information
+
+        With `limit`, returns one page of employees whose employee_number is
+        greater than `after`, optionally filtered by department and
+        employment type.
+        """
         try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    SELECT 
-                        e.employee_number,
-                        e.employee_name,
-                        e.title,
-                        e.employment_type,
-                        COALESCE(jh.salary, 0) AS salary,
-                        COALESCE(e.hourly_rate, 0) AS hourly_rate,
-                        COALESCE(d.department_name, div.division_name, 'Unassigned') AS org_unit
-                    FROM Employee e
-                    LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number 
-                        AND jh.is_current = TRUE
-                    LEFT JOIN Department d ON e.department_id = d.department_id
-                    LEFT JOIN Division div ON e.division_id = div.division_id
-                    ORDER BY e.employee_number
-                """)
+            with get_read_cursor() as cursor:
+                cursor.execute(*self._employee_list_query(
+                    after, limit, department_id, employment_type))
                 
                 results = cursor.fetchall()
                 return results
         except Exception as e:
             print(f"✗ Error listing employees: {e}")
             return []
+
+    def stream_all_employees(self, itersize=None, department_id=None, employment_type=None):
+        """Yield all employees with current information from a server-side cursor"""
+        try:
+            with get_stream_cursor(itersize) as cursor:
+                cursor.execute(*self._employee_list_query(
+                    department_id=department_id, employment_type=employment_type))
+                yield from cursor
+        except Exception as e:
+            print(f"✗ Error streaming employees: {e}")
     
     def get_employee_salary_history(self, employee_number):
         """Get complete salary history for an employee"""
         try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    SELECT 
-                        job_history_id,
-                        title,
-                        salary,
-                        start_date,
-                        end_date,
-                        is_current
-                    FROM JobHistory
-                    WHERE employee_number = %s
-                    ORDER BY start_date DESC
-                """, (employee_number,))
+            with get_read_cursor() as cursor:
+                cursor.execute(SALARY_HISTORY_QUERY, (employee_number,))
                 
                 results = cursor.fetchall()
                 return results
@@ -184,22 +554,106 @@ class HRPayrollApp:
             print(f"✗ Error getting salary history: {e}")
             return []
     
+    # ==================== COMPENSATION CACHE ====================
+    
+    def _current_compensation_query(self, employee_numbers=None, limit=None):
+        """Build the current salary lookup query and its parameters
+
+        Served by idx_jobhist_current_employee; employees without a current
+        job come back with NULL salary and start date.
+        """
+        where = ""
+        params = []
+        if employee_numbers is not None:
+            where = "WHERE e.employee_number = ANY(%s)"
+            params.append(list(employee_numbers))
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT %s"
+            params.append(limit)
+        query = f"""
+            SELECT 
+                e.employee_number,
+                jh.salary,
+                jh.start_date
+            FROM Employee e
+            LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number 
+                AND jh.is_current = TRUE
+            {where}
+            ORDER BY e.employee_number
+            {limit_clause}
+        """
+        return query, params
+    
+    def _load_current_compensation(self, employee_numbers=None, limit=None):
+        """Read current compensation from the database into the cache"""
+        generation = compensation_cache.generation()
+        with get_read_cursor() as cursor:
+            cursor.execute(*self._current_compensation_query(employee_numbers, limit))
+            values = {
+                emp_num: (salary, start_date) if start_date is not None else None
+                for emp_num, salary, start_date in cursor.fetchall()
+            }
+        compensation_cache.put_many(values, generation)
+        return values
+    
+    def get_current_compensations(self, employee_numbers):
+        """Current salary and job start date for several employees
+
+        Returns {employee_number: {'salary', 'start_date'} or None when the
+        employee has no current job}; unknown employees are left out. Cache
+        misses are loaded together in one query.
+        """
+        try:
+            found, missing = compensation_cache.get_many(employee_numbers)
+            if missing:
+                found.update(self._load_current_compensation(missing))
+            return {
+                emp_num: {'salary': value[0], 'start_date': value[1]} if value else None
+                for emp_num, value in found.items()
+            }
+        except Exception as e:
+            print(f"✗ Error getting current compensation: {e}")
+            return {}
+    
+    def get_current_compensation(self, employee_number):
+        """Current salary and job start date of an employee, or None"""
+        return self.get_current_compensations([employee_number]).get(employee_number)
+    
+    def load_compensation_cache(self):
+        """Bulk load current compensation for up to the cache's capacity of employees"""
+        try:
+            values = self._load_current_compensation(limit=compensation_cache.maxsize)
+            print(f"✓ Loaded current compensation for {len(values)} employees")
+            return len(values)
+        except Exception as e:
+            print(f"✗ Error loading compensation cache: {e}")
+            return 0
+    
+    def get_compensation_cache_stats(self):
+        """Compensation cache size and hit/miss counters"""
+        return compensation_cache.stats()
+    
     # ==================== PAYROLL PROCESSING ====================
     
+    # Amounts are rounded half up to the cent, like PostgreSQL's ROUND() in
+    # the PayrollHistory CHECK constraints and payroll_kernel's batch path
+    
     def calculate_salaried_pay(self, annual_salary):
         """Calculate monthly pay for salaried employee"""
         monthly_gross = annual_salary / Decimal('12')
-        return monthly_gross
+        return monthly_gross.quantize(CENT, rounding=ROUND_HALF_UP)
     
     def calculate_hourly_pay(self, hourly_rate, hours_worked):
         """Calculate pay for hourly employee"""
-        return hourly_rate * Decimal(str(hours_worked))
+        gross_pay = hourly_rate * Decimal(str(hours_worked))
+        return gross_pay.quantize(CENT, rounding=ROUND_HALF_UP)
     
     def calculate_taxes(self, gross_pay):
         """Calculate federal, state, and other taxes"""
-        federal_tax = (gross_pay * self.TAX_RATES['federal']).quantize(Decimal('0.01'))
-        state_tax = (gross_pay * self.TAX_RATES['state']).quantize(Decimal('0.01'))
-        other_tax = (gross_pay * self.TAX_RATES['other']).quantize(Decimal('0.01'))
+        federal_tax = (gross_pay * self.TAX_RATES['federal']).quantize(CENT, rounding=ROUND_HALF_UP)
+        state_tax = (gross_pay * self.TAX_RATES['state']).quantize(CENT, rounding=ROUND_HALF_UP)
+        other_tax = (gross_pay * self.TAX_RATES['other']).quantize(CENT, rounding=ROUND_HALF_UP)
         net_pay = gross_pay - federal_tax - state_tax - other_tax
         
         return {
@@ -210,49 +664,52 @@ class HRPayrollApp:
         }
     
     def process_payroll(self, pay_period_start, pay_period_end, payment_date=None):
-        """Process payroll for all employees for a given pay period"""
+        """Process payroll for all employees for a given pay period
+
+        Employees already paid for the period are skipped, so re-running a
+        period only pays those it missed.
+        """
         if payment_date is None:
             payment_date = pay_period_end + timedelta(days=3)
         
         try:
             with get_db_cursor() as cursor:
-                # Get all employees with current salary or hourly rate
+                self._ensure_payroll_partitions(cursor, pay_period_start)
+                
+                # Get all employees with current salary or hourly rate, and
+                # the timesheet hours worked within the period
                 cursor.execute("""
                     SELECT 
                         e.employee_number,
                         e.employee_name,
                         e.employment_type,
                         jh.salary,
-                        e.hourly_rate
+                        e.hourly_rate,
+                        COALESCE(t.hours, 0)
                     FROM Employee e
                     LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number 
                         AND jh.is_current = TRUE
+                    LEFT JOIN (
+                        SELECT employee_number, SUM(hours) AS hours
+                        FROM TimesheetEntry
+                        WHERE work_date BETWEEN %s AND %s
+                        GROUP BY employee_number
+                    ) t ON e.employee_number = t.employee_number
+                        AND e.employment_type = 'hourly'
                     WHERE e.employment_type = 'salaried' OR e.hourly_rate IS NOT NULL
-                """)
+                """, (pay_period_start, pay_period_end))
                 
                 employees = cursor.fetchall()
                 payroll_records = []
+                already_paid = 0
                 
                 for emp in employees:
-                    emp_num, emp_name, emp_type, salary, hourly_rate = emp
+                    emp_num, emp_name, emp_type, salary, hourly_rate, hours = emp
                     
                     # Calculate gross pay
                     if emp_type == 'salaried' and salary:
                         gross_pay = self.calculate_salaried_pay(salary)
-                    elif emp_type == 'hourly' and hourly_rate:
-                        # Get hours worked from EmployeeProject for this period
-                        cursor.execute("""
-                            SELECT COALESCE(SUM(hours_worked), 0)
-                            FROM EmployeeProject
-                            WHERE employee_number = %s 
-                            AND start_date <= %s 
-                            AND (end_date IS NULL OR end_date >= %s)
-                        """, (emp_num, pay_period_end, pay_period_start))
-                        
-                        hours = cursor.fetchone()[0]
-                        # For monthly payroll, assume standard hours if no project time
-                        if hours == 0:
-                            hours = 160  # Standard monthly hours (40 hrs/week * 4 weeks)
+                    elif emp_type == 'hourly' and hourly_rate and hours:
                         gross_pay = self.calculate_hourly_pay(hourly_rate, hours)
                     else:
                         continue
@@ -260,18 +717,23 @@ class HRPayrollApp:
                     # Calculate taxes
                     taxes = self.calculate_taxes(gross_pay)
                     
-                    # Insert payroll record
+                    # Insert payroll record, unless this period's paycheck exists
                     cursor.execute("""
                         INSERT INTO PayrollHistory 
                         (employee_number, pay_period_start, pay_period_end, 
                          gross_pay, federal_tax, state_tax, other_tax, net_pay, payment_date)
                         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (employee_number, pay_period_start, pay_period_end) DO NOTHING
                         RETURNING payroll_id
                     """, (emp_num, pay_period_start, pay_period_end, 
                           gross_pay, taxes['federal_tax'], taxes['state_tax'],
                           taxes['other_tax'], taxes['net_pay'], payment_date))
                     
-                    payroll_id = cursor.fetchone()[0]
+                    inserted = cursor.fetchone()
+                    if inserted is None:
+                        already_paid += 1
+                        continue
+                    payroll_id = inserted[0]
                     payroll_records.append({
                         'payroll_id': payroll_id,
                         'employee_number': emp_num,
@@ -281,78 +743,548 @@ class HRPayrollApp:
                     })
                 
                 print(f"✓ Payroll processed for {len(payroll_records)} employees")
+                if already_paid:
+                    print(f"  Skipped {already_paid} employees already paid for this period")
                 print(f"  Period: {pay_period_start} to {pay_period_end}")
                 print(f"  Payment Date: {payment_date}")
-                return payroll_records
+            refresh_after_write(PAYROLL_REPORTING_VIEWS)
+            return payroll_records
         except Exception as e:
             print(f"✗ Error processing payroll: {e}")
             return []
+
+    def process_payroll_batch(self, pay_period_start, pay_period_end, payment_date=None,
+                              chunk_size=1000):
+        """Process payroll for all employees using set-based queries
+
+        Hours for every hourly employee are collected in one grouped query and
+        PayrollHistory rows are written with multi-row inserts, one committed
+        chunk of employees at a time. Progress is tracked in PayrollRun, so
+        submitting the same period twice is a no-op and a failed run resumes
+        after the last committed chunk. The ledger and chunks commit on their
+        own connections even inside a ConnectionScope (such as a web request),
+        so a request that fails later does not undo paychecks already issued.
+        Returns the same records as process_payroll().
+        """
+        if payment_date is None:
+            payment_date = pay_period_end + timedelta(days=3)
+
+        run = self.start_payroll_run(pay_period_start, pay_period_end, payment_date)
+        if run is None:
+            return []
+        run_id, status, last_employee = run
+
+        # Paychecks already committed for this period by an earlier attempt
+        payroll_records = self.get_payroll_run_records(pay_period_start, pay_period_end)
+
+        if status == 'completed':
+            print(f"✓ Payroll for {pay_period_start} to {pay_period_end} already processed (run {run_id})")
+            return payroll_records
+        if last_employee is not None:
+            print(f"  Resuming payroll run {run_id} after employee {last_employee}")
+
+        try:
+            while True:
+                with get_db_cursor(own_transaction=True) as cursor:
+                    records, last_employee = self._process_payroll_chunk(
+                        cursor, run_id, pay_period_start, pay_period_end,
+                        payment_date, last_employee, chunk_size)
+                payroll_records.extend(records)
+                if last_employee is None:
+                    break
+
+            with get_db_cursor(own_transaction=True) as cursor:
+                cursor.execute("""
+                    UPDATE PayrollRun
+                    SET status = 'completed', completed_at = CURRENT_TIMESTAMP
+                    WHERE run_id = %s
+                """, (run_id,))
+
+            print(f"✓ Payroll processed for {len(payroll_records)} employees")
+            print(f"  Period: {pay_period_start} to {pay_period_end}")
+            print(f"  Payment Date: {payment_date}")
+            refresh_after_write(PAYROLL_REPORTING_VIEWS)
+            return payroll_records
+        except Exception as e:
+            print(f"✗ Error processing payroll: {e}")
+            self._fail_payroll_run(run_id)
+            return []
+
+    def _payroll_chunk_query(self, pay_period_start, pay_period_end, after_employee,
+                             chunk_size, through_employee=None, department_id=None,
+                             unassigned_only=False):
+        """Build the payroll chunk query and its parameters
+
+        Returns the next chunk_size unpaid employees after after_employee
+        with their current salary and, for hourly employees, the hours
+        they worked within the pay period (from TimesheetEntry work dates)
+        as integer cents and hundredths.
+        """
+        conditions = []
+        values = [pay_period_start, pay_period_end,
+                  after_employee if after_employee is not None else -1]
+        if through_employee is not None:
+            conditions.append("AND e.employee_number <= %s")
+            values.append(through_employee)
+        if department_id is not None:
+            conditions.append("AND e.department_id = %s")
+            values.append(department_id)
+        if unassigned_only:
+            conditions.append("AND e.department_id IS NULL")
+        values.extend([chunk_size, pay_period_start, pay_period_end])
+
+        # Employees, current salary and period hours in one pass
+        query = f"""
+            WITH chunk AS (
+                SELECT
+                    e.employee_number,
+                    e.employee_name,
+                    e.employment_type,
+                    jh.salary,
+                    e.hourly_rate
+                FROM Employee e
+                LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number
+                    AND jh.is_current = TRUE
+                WHERE (e.employment_type = 'salaried' OR e.hourly_rate IS NOT NULL)
+                AND NOT EXISTS (
+                    SELECT 1 FROM PayrollHistory p
+                    WHERE p.employee_number = e.employee_number
+                    AND p.pay_period_start = %s AND p.pay_period_end = %s
+                )
+                AND e.employee_number > %s
+                {' '.join(conditions)}
+                ORDER BY e.employee_number
+                LIMIT %s
+            )
+            SELECT
+                c.employee_number,
+                c.employee_name,
+                c.employment_type,
+                (c.salary * 100)::bigint AS salary_cents,
+                (c.hourly_rate * 100)::bigint AS rate_cents,
+                (COALESCE(h.hours, 0) * 100)::bigint AS hours_hundredths
+            FROM chunk c
+            LEFT JOIN (
+                SELECT t.employee_number, SUM(t.hours) AS hours
+                FROM TimesheetEntry t
+                JOIN chunk ON t.employee_number = chunk.employee_number
+                WHERE chunk.employment_type = 'hourly'
+                AND t.work_date BETWEEN %s AND %s
+                GROUP BY t.employee_number
+            ) h ON c.employee_number = h.employee_number
+            ORDER BY c.employee_number
+        """
+        return query, values
+
+    def _process_payroll_chunk(self, cursor, run_id, pay_period_start, pay_period_end,
+                               payment_date, after_employee, chunk_size,
+                               through_employee=None, department_id=None,
+                               unassigned_only=False, track_watermark=True):
+        """Pay the next chunk of employees and advance the run watermark
+
+        Employees already paid for the period are skipped, as are hourly
+        employees without timesheet hours in the period. A chunk can be
+        restricted to an employee number range or a department for sharded
+        runs, which update the run counters but not the shared watermark.
+        Returns the new payroll records and the last employee number in the
+        chunk, or None for the employee number once no employees remain.
+        """
+        cursor.execute(*self._payroll_chunk_query(
+            pay_period_start, pay_period_end, after_employee, chunk_size,
+            through_employee, department_id, unassigned_only))
+
+        employees = cursor.fetchall()
+        if not employees:
+            return [], None
+
+        payable = []
+        names = {}
+        for emp_num, emp_name, emp_type, salary_cents, rate_cents, hours in employees:
+            if emp_type == 'salaried' and salary_cents:
+                payable.append((emp_num, salary_cents, None, None))
+            elif emp_type == 'hourly' and rate_cents and hours:
+                payable.append((emp_num, None, rate_cents, hours))
+            else:
+                continue
+            names[emp_num] = emp_name
+
+        # Gross pay, taxes and net pay for the whole chunk in integer cents
+        employee_numbers, salary_cents, rate_cents, hours = (
+            zip(*payable) if payable else ((), (), (), ()))
+        amounts = calculate_pay_columns(salary_cents, rate_cents, hours, self.TAX_RATES)
+        rows = [
+            (emp_num, pay_period_start, pay_period_end,
+             gross_pay, federal_tax, state_tax, other_tax, net_pay, payment_date)
+            for emp_num, gross_pay, federal_tax, state_tax, other_tax, net_pay
+            in zip(employee_numbers, *(from_cents(column) for column in amounts))
+        ]
+
+        # Insert the chunk with multi-row INSERTs; paychecks that already
+        # exist for this period are skipped by the uniqueness guard
+        inserted = execute_values(cursor, """
+            INSERT INTO PayrollHistory
+            (employee_number, pay_period_start, pay_period_end,
+             gross_pay, federal_tax, state_tax, other_tax, net_pay, payment_date)
+            VALUES %s
+            ON CONFLICT (employee_number, pay_period_start, pay_period_end) DO NOTHING
+            RETURNING employee_number, payroll_id
+        """, rows, page_size=len(rows) or 1, fetch=True)
+        payroll_ids = dict(inserted)
+
+        records = [{
+            'payroll_id': payroll_ids[row[0]],
+            'employee_number': row[0],
+            'employee_name': names[row[0]],
+            'gross_pay': row[3],
+            'net_pay': row[7]
+        } for row in rows if row[0] in payroll_ids]
+
+        last_employee = employees[-1][0]
+        if track_watermark:
+            cursor.execute("""
+                UPDATE PayrollRun
+                SET last_employee_number = %s,
+                    employees_processed = employees_processed + %s
+                WHERE run_id = %s
+            """, (last_employee, len(records), run_id))
+        else:
+            cursor.execute("""
+                UPDATE PayrollRun
+                SET employees_processed = employees_processed + %s
+                WHERE run_id = %s
+            """, (len(records), run_id))
+
+        return records, last_employee
+
+    def process_payroll_parallel(self, pay_period_start, pay_period_end, payment_date=None,
+                                 workers=4, shard_by='range', chunk_size=1000):
+        """Process payroll with employee shards paid in parallel worker processes
+
+        Employees are split into contiguous employee_number ranges (one per
+        worker) or by department. Each shard runs in its own process with its
+        own connection pool and commits chunk by chunk under the same
+        PayrollRun as process_payroll_batch(), so a failed run can be retried
+        in either mode. Returns a merged run summary.
+        """
+        if payment_date is None:
+            payment_date = pay_period_end + timedelta(days=3)
+
+        run = self.start_payroll_run(pay_period_start, pay_period_end, payment_date)
+        if run is None:
+            return None
+        run_id, status, _ = run
+
+        if status == 'completed':
+            print(f"✓ Payroll for {pay_period_start} to {pay_period_end} already processed (run {run_id})")
+            return self.get_payroll_run_summary(run_id)
+
+        shards = self.plan_payroll_shards(workers, shard_by)
+        started = time.perf_counter()
+
+        try:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_payroll_worker) as executor:
+                futures = [
+                    executor.submit(_run_payroll_shard, shard, run_id, pay_period_start,
+                                    pay_period_end, payment_date, chunk_size)
+                    for shard in shards
+                ]
+                shard_results = [future.result() for future in futures]
+
+            with get_db_cursor(own_transaction=True) as cursor:
+                cursor.execute("""
+                    UPDATE PayrollRun
+                    SET status = 'completed', completed_at = CURRENT_TIMESTAMP
+                    WHERE run_id = %s
+                """, (run_id,))
+        except Exception as e:
+            print(f"✗ Error processing payroll: {e}")
+            self._fail_payroll_run(run_id)
+            return None
+
+        summary = {
+            'run_id': run_id,
+            'workers': workers,
+            'shard_by': shard_by,
+            'shards': shard_results,
+            'employees_paid': sum(r['employees_paid'] for r in shard_results),
+            'total_gross': sum((r['total_gross'] for r in shard_results), Decimal('0')),
+            'total_net': sum((r['total_net'] for r in shard_results), Decimal('0')),
+            'elapsed_seconds': time.perf_counter() - started
+        }
+
+        print(f"✓ Payroll processed for {summary['employees_paid']} employees "
+              f"across {len(shards)} shards ({workers} workers)")
+        print(f"  Period: {pay_period_start} to {pay_period_end}")
+        print(f"  Payment Date: {payment_date}")
+        refresh_after_write(PAYROLL_REPORTING_VIEWS)
+        return summary
+
+    def process_payroll_shard(self, shard, run_id, pay_period_start, pay_period_end,
+                              payment_date, chunk_size=1000):
+        """Pay one shard of a payroll run, committing chunk by chunk"""
+        after_employee = shard.get('first_employee')
+        if after_employee is not None:
+            after_employee -= 1
+
+        employees_paid = 0
+        total_gross = Decimal('0')
+        total_net = Decimal('0')
+        while True:
+            with get_db_cursor(own_transaction=True) as cursor:
+                records, after_employee = self._process_payroll_chunk(
+                    cursor, run_id, pay_period_start, pay_period_end, payment_date,
+                    after_employee, chunk_size,
+                    through_employee=shard.get('last_employee'),
+                    department_id=shard.get('department_id'),
+                    unassigned_only=shard.get('unassigned_only', False),
+                    track_watermark=False)
+            employees_paid += len(records)
+            total_gross += sum((r['gross_pay'] for r in records), Decimal('0'))
+            total_net += sum((r['net_pay'] for r in records), Decimal('0'))
+            if after_employee is None:
+                break
+
+        return {
+            'shard': shard,
+            'employees_paid': employees_paid,
+            'total_gross': total_gross,
+            'total_net': total_net
+        }
+
+    def plan_payroll_shards(self, workers, shard_by='range'):
+        """Split payable employees into shards by employee_number range or department"""
+        with get_read_cursor() as cursor:
+            if shard_by == 'department':
+                cursor.execute("""
+                    SELECT DISTINCT department_id
+                    FROM Employee
+                    WHERE department_id IS NOT NULL
+                    ORDER BY department_id
+                """)
+                shards = [{'department_id': row[0]} for row in cursor.fetchall()]
+
+                # Employees without a department form their own shard
+                shards.append({'unassigned_only': True})
+                return shards
+            elif shard_by == 'range':
+                cursor.execute("""
+                    SELECT MIN(employee_number), MAX(employee_number)
+                    FROM (
+                        SELECT
+                            employee_number,
+                            NTILE(%s) OVER (ORDER BY employee_number) AS shard
+                        FROM Employee
+                        WHERE employment_type = 'salaried' OR hourly_rate IS NOT NULL
+                    ) t
+                    GROUP BY shard
+                    ORDER BY shard
+                """, (workers,))
+                return [{'first_employee': first, 'last_employee': last}
+                        for first, last in cursor.fetchall()]
+            raise ValueError(f"Unknown shard_by value: {shard_by}")
+
+    def get_payroll_run_summary(self, run_id):
+        """Summarize the paychecks written by a payroll run"""
+        try:
+            with get_read_cursor() as cursor:
+                cursor.execute("""
+                    SELECT
+                        r.run_id,
+                        COUNT(p.payroll_id),
+                        COALESCE(SUM(p.gross_pay), 0),
+                        COALESCE(SUM(p.net_pay), 0)
+                    FROM PayrollRun r
+                    LEFT JOIN PayrollHistory p ON p.pay_period_start = r.pay_period_start
+                        AND p.pay_period_end = r.pay_period_end
+                    WHERE r.run_id = %s
+                    GROUP BY r.run_id
+                """, (run_id,))
+
+                result = cursor.fetchone()
+                if result:
+                    return {
+                        'run_id': result[0],
+                        'employees_paid': result[1],
+                        'total_gross': result[2],
+                        'total_net': result[3]
+                    }
+                return None
+        except Exception as e:
+            print(f"✗ Error getting payroll run summary: {e}")
+            return None
+
+    def _ensure_payroll_partitions(self, cursor, pay_period_start):
+        """Create the PayrollHistory partitions for a pay period's year and the next"""
+        cursor.execute("SELECT create_payroll_partition(%s), create_payroll_partition(%s)",
+                       (pay_period_start.year, pay_period_start.year + 1))
     
-    def get_payroll_report(self, pay_period_start, pay_period_end):
-        """Generate payroll report for a specific period"""
+    def create_payroll_partition(self, year):
+        """Create the PayrollHistory partition for a year
+
+        Returns True if it was created, False if it already existed (or None
+        on error). Rows for the year already in the default partition move
+        into it.
+        """
         try:
             with get_db_cursor() as cursor:
+                cursor.execute("SELECT create_payroll_partition(%s)", (year,))
+                created = cursor.fetchone()[0]
+            if created:
+                print(f"✓ Created PayrollHistory partition for {year}")
+            return created
+        except Exception as e:
+            print(f"✗ Error creating payroll partition: {e}")
+            return None
+    
+    def start_payroll_run(self, pay_period_start, pay_period_end, payment_date):
+        """Create or reopen the PayrollRun ledger entry for a pay period
+
+        Returns (run_id, status, last_employee_number); a completed run is
+        returned unchanged so callers can skip it.
+        """
+        try:
+            with get_db_cursor(own_transaction=True) as cursor:
+                self._ensure_payroll_partitions(cursor, pay_period_start)
                 cursor.execute("""
-                    SELECT 
+                    INSERT INTO PayrollRun
+                    (pay_period_start, pay_period_end, payment_date, status)
+                    VALUES (%s, %s, %s, 'running')
+                    ON CONFLICT (pay_period_start, pay_period_end) DO UPDATE
+                    SET status = CASE WHEN PayrollRun.status = 'completed'
+                                      THEN 'completed' ELSE 'running' END
+                    RETURNING run_id, status, last_employee_number
+                """, (pay_period_start, pay_period_end, payment_date))
+                return cursor.fetchone()
+        except Exception as e:
+            print(f"✗ Error starting payroll run: {e}")
+            return None
+
+    def _fail_payroll_run(self, run_id):
+        """Mark a payroll run as failed so the next attempt resumes it"""
+        try:
+            with get_db_cursor(own_transaction=True) as cursor:
+                cursor.execute("""
+                    UPDATE PayrollRun SET status = 'failed'
+                    WHERE run_id = %s AND status = 'running'
+                """, (run_id,))
+        except Exception as e:
+            print(f"✗ Error updating payroll run: {e}")
+
+    def get_payroll_run_records(self, pay_period_start, pay_period_end):
+        """Get the payroll records already written for a pay period"""
+        try:
+            with get_read_cursor() as cursor:
+                cursor.execute("""
+                    SELECT
                         p.payroll_id,
-                        e.employee_number,
+                        p.employee_number,
                         e.employee_name,
-                        e.employment_type,
                         p.gross_pay,
-                        p.federal_tax,
-                        p.state_tax,
-                        p.other_tax,
-                        p.net_pay,
-                        p.payment_date
+                        p.net_pay
                     FROM PayrollHistory p
                     JOIN Employee e ON p.employee_number = e.employee_number
                     WHERE p.pay_period_start = %s AND p.pay_period_end = %s
-                    ORDER BY e.employee_number
+                    ORDER BY p.employee_number
                 """, (pay_period_start, pay_period_end))
+
+                return [{
+                    'payroll_id': row[0],
+                    'employee_number': row[1],
+                    'employee_name': row[2],
+                    'gross_pay': row[3],
+                    'net_pay': row[4]
+                } for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"✗ Error getting payroll run records: {e}")
+            return []
+
+    def list_payroll_runs(self):
+        """List payroll runs from the ledger, most recent period first"""
+        try:
+            with get_read_cursor() as cursor:
+                cursor.execute("""
+                    SELECT
+                        run_id,
+                        pay_period_start,
+                        pay_period_end,
+                        payment_date,
+                        status,
+                        employees_processed,
+                        last_employee_number,
+                        started_at,
+                        completed_at
+                    FROM PayrollRun
+                    ORDER BY pay_period_start DESC
+                """)
+
+                results = cursor.fetchall()
+                return results
+        except Exception as e:
+            print(f"✗ Error listing payroll runs: {e}")
+            return []
+
+    def get_payroll_report(self, pay_period_start, pay_period_end):
+        """Generate payroll report for a specific period"""
+        try:
+            with get_read_cursor() as cursor:
+                cursor.execute(PAYROLL_REPORT_QUERY, (pay_period_start, pay_period_end))
                 
                 results = cursor.fetchall()
                 return results
         except Exception as e:
             print(f"✗ Error generating payroll report: {e}")
             return []
+
+    def stream_payroll_report(self, pay_period_start, pay_period_end, itersize=None):
+        """Yield the payroll report for a period from a server-side cursor"""
+        try:
+            with get_stream_cursor(itersize) as cursor:
+                cursor.execute(PAYROLL_REPORT_QUERY, (pay_period_start, pay_period_end))
+                yield from cursor
+        except Exception as e:
+            print(f"✗ Error streaming payroll report: {e}")
+    
+    def _year_range(self, year):
+        """[start, end) dates of a calendar year, for sargable pay period filters
+
+        Comparing pay_period_start with a date range (rather than
+        EXTRACT(YEAR ...)) lets PostgreSQL prune PayrollHistory partitions
+        and use its indexes.
+        """
+        year = int(year)
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    
+    def _payroll_history_query(self, employee_number, year=None):
+        """Build the employee payroll history query and its parameters"""
+        conditions = ["employee_number = %s"]
+        params = [employee_number]
+        if year:
+            conditions.append("pay_period_start >= %s AND pay_period_start < %s")
+            params += self._year_range(year)
+        query = f"""
+            SELECT 
+                payroll_id,
+                pay_period_start,
+                pay_period_end,
+                gross_pay,
+                federal_tax,
+                state_tax,
+                other_tax,
+                net_pay,
+                payment_date
+            FROM PayrollHistory
+            WHERE {' AND '.join(conditions)}
+            ORDER BY pay_period_start DESC
+        """
+        return query, params
     
     def get_employee_payroll_history(self, employee_number, year=None):
         """Get payroll history for a specific employee"""
         try:
-            with get_db_cursor() as cursor:
-                if year:
-                    cursor.execute("""
-                        SELECT 
-                            payroll_id,
-                            pay_period_start,
-                            pay_period_end,
-                            gross_pay,
-                            federal_tax,
-                            state_tax,
-                            other_tax,
-                            net_pay,
-                            payment_date
-                        FROM PayrollHistory
-                        WHERE employee_number = %s 
-                        AND EXTRACT(YEAR FROM pay_period_start) = %s
-                        ORDER BY pay_period_start DESC
-                    """, (employee_number, year))
-                else:
-                    cursor.execute("""
-                        SELECT 
-                            payroll_id,
-                            pay_period_start,
-                            pay_period_end,
-                            gross_pay,
-                            federal_tax,
-                            state_tax,
-                            other_tax,
-                            net_pay,
-                            payment_date
-                        FROM PayrollHistory
-                        WHERE employee_number = %s
-                        ORDER BY pay_period_start DESC
-                    """, (employee_number,))
+            with get_read_cursor() as cursor:
+                cursor.execute(*self._payroll_history_query(employee_number, year))
                 
                 results = cursor.fetchall()
                 return results
@@ -360,45 +1292,413 @@ class HRPayrollApp:
             print(f"✗ Error getting payroll history: {e}")
             return []
     
-    def get_yearly_tax_summary(self, employee_number, year):
-        """Generate W-2 style summary for an employee"""
+    def get_yearly_tax_summary(self, employee_number, year, from_summary=False):
+        """Generate W-2 style summary for an employee
+
+        With from_summary=True the totals are read from YearEndTaxSummary
+        (see export_w2_statements(store=True)) instead of re-aggregating
+        PayrollHistory, reflecting payroll as of the stored generation.
+        """
         try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    SELECT 
-                        SUM(gross_pay) AS total_gross,
-                        SUM(federal_tax) AS total_federal,
-                        SUM(state_tax) AS total_state,
-                        SUM(other_tax) AS total_other,
-                        SUM(net_pay) AS total_net,
-                        COUNT(*) AS pay_periods
-                    FROM PayrollHistory
-                    WHERE employee_number = %s 
-                    AND EXTRACT(YEAR FROM pay_period_start) = %s
-                """, (employee_number, year))
+            with get_read_cursor() as cursor:
+                if from_summary:
+                    cursor.execute(STORED_TAX_SUMMARY_QUERY, (employee_number, int(year)))
+                else:
+                    cursor.execute(YEARLY_TAX_SUMMARY_QUERY,
+                                   (employee_number, *self._year_range(year)))
                 
-                result = cursor.fetchone()
-                if result and result[0]:
-                    return {
-                        'total_gross': result[0],
-                        'total_federal': result[1],
-                        'total_state': result[2],
-                        'total_other': result[3],
-                        'total_net': result[4],
-                        'pay_periods': result[5]
-                    }
-                return None
+                return self._tax_summary_from_row(cursor.fetchone())
         except Exception as e:
             print(f"✗ Error generating tax summary: {e}")
             return None
     
-    # ==================== REPORTING ====================
+    def _tax_summary_from_row(self, result):
+        """Shape a yearly tax summary row as a dict (None if no pay periods)"""
+        if result and result[0]:
+            return {
+                'total_gross': result[0],
+                'total_federal': result[1],
+                'total_state': result[2],
+                'total_other': result[3],
+                'total_net': result[4],
+                'pay_periods': result[5]
+            }
+        return None
+    
+    # ==================== YEAR-END (W-2) STATEMENTS ====================
     
-    def department_payroll_summary(self, department_id=None):
-        """Get payroll summary by department"""
+    def _w2_scope(self, alias, department_id=None, unassigned_only=False):
+        """Conditions and parameters limiting year-end statements to one department"""
+        if department_id is not None:
+            return [f"{alias}.department_id = %s"], [department_id]
+        if unassigned_only:
+            return [f"{alias}.department_id IS NULL"], []
+        return [], []
+    
+    def _w2_query(self, year, department_id=None, unassigned_only=False, from_summary=False):
+        """Build the year-end statement query and its parameters
+
+        Every employee's totals come from one grouped query over the year's
+        PayrollHistory partition, or from YearEndTaxSummary with
+        from_summary=True. department_id or unassigned_only limit the
+        statements to one department, or to employees without one.
+        """
+        if from_summary:
+            conditions, params = self._w2_scope('s', department_id, unassigned_only)
+            where = " AND ".join(["s.tax_year = %s"] + conditions)
+            query = f"""
+                SELECT 
+                    s.tax_year,
+                    s.employee_number,
+                    e.employee_name,
+                    s.department_id,
+                    s.total_gross,
+                    s.total_federal,
+                    s.total_state,
+                    s.total_other,
+                    s.total_net,
+                    s.pay_periods
+                FROM YearEndTaxSummary s
+                JOIN Employee e ON s.employee_number = e.employee_number
+                WHERE {where}
+                ORDER BY s.employee_number
+            """
+            return query, [int(year)] + params
+
+        conditions, params = self._w2_scope('e', department_id, unassigned_only)
+        where = " AND ".join(
+            ["p.pay_period_start >= %s", "p.pay_period_start < %s"] + conditions)
+        query = f"""
+            SELECT 
+                %s AS tax_year,
+                e.employee_number,
+                e.employee_name,
+                e.department_id,
+                SUM(p.gross_pay) AS total_gross,
+                SUM(p.federal_tax) AS total_federal,
+                SUM(p.state_tax) AS total_state,
+                SUM(p.other_tax) AS total_other,
+                SUM(p.net_pay) AS total_net,
+                COUNT(*) AS pay_periods
+            FROM PayrollHistory p
+            JOIN Employee e ON p.employee_number = e.employee_number
+            WHERE {where}
+            GROUP BY e.employee_number
+            ORDER BY e.employee_number
+        """
+        return query, [int(year), *self._year_range(year)] + params
+    
+    def store_w2_summary(self, year, department_id=None, unassigned_only=False):
+        """Recompute the stored YearEndTaxSummary rows of a year
+
+        Replaces the rows of every employee in scope (the whole company, one
+        department, or employees without one) in a single transaction, so
+        later year-end lookups can use from_summary=True instead of scanning
+        payroll. Returns the number of statements stored, or None on error.
+        """
+        conditions, params = self._w2_scope('e', department_id, unassigned_only)
+        where = " AND ".join(["s.tax_year = %s", "s.employee_number = e.employee_number"]
+                             + conditions)
+        query, query_params = self._w2_query(year, department_id, unassigned_only)
         try:
             with get_db_cursor() as cursor:
-                if department_id:
+                cursor.execute(f"""
+                    DELETE FROM YearEndTaxSummary s
+                    USING Employee e
+                    WHERE {where}
+                """, [int(year)] + params)
+                cursor.execute(f"""
+                    INSERT INTO YearEndTaxSummary (
+                        tax_year, employee_number, department_id, total_gross,
+                        total_federal, total_state, total_other, total_net, pay_periods
+                    )
+                    SELECT tax_year, employee_number, department_id, total_gross,
+                        total_federal, total_state, total_other, total_net, pay_periods
+                    FROM ({query}) statements
+                """, query_params)
+                return cursor.rowcount
+        except Exception as e:
+            print(f"✗ Error storing year-end summary: {e}")
+            return None
+    
+    def stream_w2_statements(self, year, department_id=None, unassigned_only=False,
+                             from_summary=False, itersize=None):
+        """Yield every employee's year-end statement row (W2_COLUMNS) from a server-side cursor"""
+        try:
+            with get_stream_cursor(itersize) as cursor:
+                cursor.execute(*self._w2_query(
+                    year, department_id, unassigned_only, from_summary))
+                yield from cursor
+        except Exception as e:
+            print(f"✗ Error streaming year-end statements: {e}")
+    
+    def export_w2_statements(self, year, stream, fmt='csv', department_id=None,
+                             unassigned_only=False, store=False, from_summary=False,
+                             itersize=None):
+        """Write every employee's year-end statement to a text stream
+
+        fmt is 'csv' (with a header row) or 'jsonl' (one JSON object per
+        line, amounts as strings so cents stay exact). Rows are streamed
+        from a server-side cursor, so memory use does not grow with the
+        company. store=True first recomputes YearEndTaxSummary for the
+        scope and exports the stored rows; from_summary=True exports
+        previously stored rows without touching PayrollHistory.
+
+        Returns {'statements', 'total_gross', 'total_net'}, or None on error.
+        """
+        if fmt not in W2_FORMATS:
+            print(f"✗ Unknown year-end export format: {fmt}")
+            return None
+        if store:
+            if self.store_w2_summary(year, department_id, unassigned_only) is None:
+                return None
+            from_summary = True
+
+        summary = {'statements': 0, 'total_gross': Decimal('0'), 'total_net': Decimal('0')}
+        try:
+            with get_stream_cursor(itersize) as cursor:
+                cursor.execute(*self._w2_query(
+                    year, department_id, unassigned_only, from_summary))
+                if fmt == 'csv':
+                    writer = csv.writer(stream)
+                    writer.writerow(W2_COLUMNS)
+                for row in cursor:
+                    if fmt == 'csv':
+                        writer.writerow(row)
+                    else:
+                        stream.write(json.dumps(dict(zip(W2_COLUMNS, row)), default=str))
+                        stream.write("\n")
+                    summary['statements'] += 1
+                    summary['total_gross'] += row[4]
+                    summary['total_net'] += row[8]
+            return summary
+        except Exception as e:
+            print(f"✗ Error exporting year-end statements: {e}")
+            return None
+    
+    def export_w2_statements_parallel(self, year, output_dir, fmt='csv', workers=4,
+                                      store=False, from_summary=False):
+        """Export year-end statements with departments run in parallel worker processes
+
+        Each department (and the employees without one) is exported by its
+        own process and connection to w2_<year>_dept_<id>.<fmt> (or
+        w2_<year>_unassigned.<fmt>) in output_dir. Returns a merged summary
+        with the per-department results, or None on error.
+        """
+        if fmt not in W2_FORMATS:
+            print(f"✗ Unknown year-end export format: {fmt}")
+            return None
+
+        started = time.perf_counter()
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            shards = self.plan_payroll_shards(workers, shard_by='department')
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_payroll_worker) as executor:
+                futures = [
+                    executor.submit(_run_w2_shard, shard, year, output_dir, fmt,
+                                    store, from_summary)
+                    for shard in shards
+                ]
+                shard_results = [future.result() for future in futures]
+        except Exception as e:
+            print(f"✗ Error exporting year-end statements: {e}")
+            return None
+
+        failed = [r['shard'] for r in shard_results if r['statements'] is None]
+        if failed:
+            print(f"✗ Year-end export failed for shards: {failed}")
+            return None
+
+        summary = {
+            'tax_year': int(year),
+            'workers': workers,
+            'shards': shard_results,
+            'statements': sum(r['statements'] for r in shard_results),
+            'total_gross': sum((r['total_gross'] for r in shard_results), Decimal('0')),
+            'total_net': sum((r['total_net'] for r in shard_results), Decimal('0')),
+            'elapsed_seconds': time.perf_counter() - started
+        }
+        print(f"✓ Exported {summary['statements']} year-end statements for {year} "
+              f"across {len(shards)} departments ({workers} workers)")
+        return summary
+    
+    def export_w2_shard(self, shard, year, output_dir, fmt='csv', store=False,
+                        from_summary=False):
+        """Export one department's year-end statements to its file in output_dir"""
+        if shard.get('unassigned_only'):
+            name = f"w2_{int(year)}_unassigned.{W2_FORMATS[fmt]}"
+        else:
+            name = f"w2_{int(year)}_dept_{shard['department_id']}.{W2_FORMATS[fmt]}"
+        path = os.path.join(output_dir, name)
+        with open(path, 'w', newline='') as stream:
+            result = self.export_w2_statements(
+                year, stream, fmt,
+                department_id=shard.get('department_id'),
+                unassigned_only=shard.get('unassigned_only', False),
+                store=store, from_summary=from_summary)
+        if result is None:
+            return {'shard': shard, 'path': path, 'statements': None}
+        return {'shard': shard, 'path': path, **result}
+    
+    # ==================== EMPLOYEE PROFILE ====================
+    
+    def _employee_360_query(self, employee_numbers, year=None):
+        """Build the employee 360 query and its parameters
+
+        Each section is aggregated into a JSON array of rows per employee, so
+        any number of profiles comes back from one statement. The tax summary
+        covers `year`, or each employee's latest payroll year.
+        """
+        payroll_condition = ""
+        params = []
+        if year:
+            payroll_condition = "AND ph.pay_period_start >= %s AND ph.pay_period_start < %s"
+            params += self._year_range(year)
+        params += [year, employee_numbers]
+        query = f"""
+            SELECT 
+                e.employee_number,
+                json_build_array(
+                    e.employee_number, e.employee_name, e.title, e.employment_type,
+                    e.hourly_rate, jh.salary, d.department_name, div.division_name,
+                    jh.start_date
+                )::text AS info,
+                (
+                    SELECT COALESCE(json_agg(json_build_array(
+                        h.job_history_id, h.title, h.salary, h.start_date, h.end_date,
+                        h.is_current
+                    ) ORDER BY h.start_date DESC), '[]')
+                    FROM JobHistory h
+                    WHERE h.employee_number = e.employee_number
+                )::text AS salary_history,
+                (
+                    SELECT COALESCE(json_agg(json_build_array(
+                        ph.payroll_id, ph.pay_period_start, ph.pay_period_end, ph.gross_pay,
+                        ph.federal_tax, ph.state_tax, ph.other_tax, ph.net_pay,
+                        ph.payment_date
+                    ) ORDER BY ph.pay_period_start DESC), '[]')
+                    FROM PayrollHistory ph
+                    WHERE ph.employee_number = e.employee_number {payroll_condition}
+                )::text AS payroll_history,
+                tax.tax_year,
+                json_build_array(
+                    tax.total_gross, tax.total_federal, tax.total_state, tax.total_other,
+                    tax.total_net, tax.pay_periods
+                )::text AS tax_summary,
+                (
+                    SELECT COALESCE(json_agg(json_build_array(
+                        p.project_number, p.project_name, ep.role, ep.hours_worked,
+                        ep.start_date, ep.end_date, m.employee_name
+                    ) ORDER BY ep.start_date DESC), '[]')
+                    FROM EmployeeProject ep
+                    JOIN Project p ON ep.project_number = p.project_number
+                    JOIN Employee m ON p.manager_emp_id = m.employee_number
+                    WHERE ep.employee_number = e.employee_number AND ep.is_current = TRUE
+                )::text AS projects
+            FROM Employee e
+            LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number 
+                AND jh.is_current = TRUE
+            LEFT JOIN Department d ON e.department_id = d.department_id
+            LEFT JOIN Division div ON e.division_id = div.division_id
+            LEFT JOIN LATERAL (
+                SELECT 
+                    y.tax_year,
+                    SUM(t.gross_pay) AS total_gross,
+                    SUM(t.federal_tax) AS total_federal,
+                    SUM(t.state_tax) AS total_state,
+                    SUM(t.other_tax) AS total_other,
+                    SUM(t.net_pay) AS total_net,
+                    COUNT(t.payroll_id) AS pay_periods
+                FROM (
+                    SELECT COALESCE(%s::int, EXTRACT(YEAR FROM MAX(x.pay_period_start))::int) AS tax_year
+                    FROM PayrollHistory x
+                    WHERE x.employee_number = e.employee_number
+                ) y
+                LEFT JOIN PayrollHistory t ON t.employee_number = e.employee_number
+                    AND t.pay_period_start >= make_date(y.tax_year, 1, 1)
+                    AND t.pay_period_start < make_date(y.tax_year + 1, 1, 1)
+                GROUP BY y.tax_year
+            ) tax ON TRUE
+            WHERE e.employee_number = ANY(%s)
+        """
+        return query, params
+    
+    def _decode_json_rows(self, text, date_columns):
+        """Decode a JSON array of rows into tuples typed like psycopg2 rows
+
+        Numbers with a fraction become Decimal and the columns at the given
+        positions are parsed as dates.
+        """
+        rows = json.loads(text, parse_float=Decimal)
+        return [
+            tuple(date.fromisoformat(value) if index in date_columns and value is not None
+                  else value
+                  for index, value in enumerate(row))
+            for row in rows
+        ]
+    
+    def employee_360(self, employee_number, year=None):
+        """Full employee profile in one round trip
+
+        Returns a dict with info, salary_history, payroll_history, tax_year,
+        tax_summary and projects, each shaped like the matching single-purpose
+        method (get_employee_info, get_employee_salary_history, ...), or None
+        if the employee does not exist. Given a list of employee numbers,
+        returns {employee_number: profile} for those that exist, still with a
+        single query.
+        """
+        batch = isinstance(employee_number, (list, tuple, set, frozenset))
+        employee_numbers = list(employee_number) if batch else [employee_number]
+        try:
+            with get_read_cursor() as cursor:
+                cursor.execute(*self._employee_360_query(employee_numbers, year))
+                results = cursor.fetchall()
+            
+            profiles = {}
+            for emp_num, info, salary_history, payroll_history, tax_year, tax_summary, projects in results:
+                profiles[emp_num] = {
+                    'info': self._employee_info_from_row(
+                        self._decode_json_rows(f"[{info}]", {8})[0]),
+                    'salary_history': self._decode_json_rows(salary_history, {3, 4}),
+                    'payroll_history': self._decode_json_rows(payroll_history, {1, 2, 8}),
+                    'tax_year': tax_year,
+                    'tax_summary': self._tax_summary_from_row(
+                        self._decode_json_rows(f"[{tax_summary}]", set())[0]),
+                    'projects': self._decode_json_rows(projects, {4, 5})
+                }
+            if batch:
+                return profiles
+            return profiles.get(employee_number)
+        except Exception as e:
+            print(f"✗ Error building employee profile: {e}")
+            return {} if batch else None
+    
+    # ==================== REPORTING ====================
+    
+    def department_payroll_summary(self, department_id=None, from_summary=False):
+        """Get payroll summary by department
+
+        With from_summary=True the totals are read from the
+        mv_department_payroll_summary materialized view instead of being
+        re-aggregated, reflecting data as of its last refresh.
+        """
+        try:
+            with get_read_cursor() as cursor:
+                if from_summary:
+                    where = "WHERE department_id = %s" if department_id else ""
+                    cursor.execute(f"""
+                        SELECT 
+                            department_name,
+                            employee_count,
+                            avg_salary,
+                            total_salary
+                        FROM mv_department_payroll_summary
+                        {where}
+                        ORDER BY department_name
+                    """, (department_id,) if department_id else ())
+                elif department_id:
                     cursor.execute("""
                         SELECT 
                             d.department_name,
@@ -434,6 +1734,22 @@ class HRPayrollApp:
             return []
 
 
+def _init_payroll_worker():
+    """Open a connection pool in a payroll worker process"""
+    initialize_connection_pool()
+
+
+def _run_payroll_shard(shard, run_id, pay_period_start, pay_period_end, payment_date, chunk_size):
+    """Worker entry point for process_payroll_parallel()"""
+    return HRPayrollApp().process_payroll_shard(
+        shard, run_id, pay_period_start, pay_period_end, payment_date, chunk_size)
+
+
+def _run_w2_shard(shard, year, output_dir, fmt, store, from_summary):
+    """Worker entry point for export_w2_statements_parallel()"""
+    return HRPayrollApp().export_w2_shard(shard, year, output_dir, fmt, store, from_summary)
+
+
 def print_employee_info(emp_info):
     """Print formatted employee information"""
     if not emp_info:
@@ -0,0 +1,48 @@
+"""
+Payroll Calculation Kernel
+Column-at-a-time gross pay, tax and net pay calculation in integer cents,
+used by the batch payroll paths in place of per-paycheck Decimal arithmetic
+"""
+from decimal import Decimal
+
+# Monetary amounts are stored with two decimal places
+CENT = Decimal('0.01')
+
+
+def _round_half_up(numerator, denominator):
+    """numerator / denominator rounded half up to an integer (both non-negative)"""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def from_cents(cents):
+    """Column of integer cents as Decimal amounts with two decimal places"""
+    return [Decimal(amount).scaleb(-2) for amount in cents]
+
+
+def calculate_pay_columns(salary_cents, rate_cents, hours_hundredths, tax_rates):
+    """Gross pay, federal/state/other tax and net pay columns for a batch of paychecks
+
+    Row i is salaried (a month of the annual salary_cents[i]) when
+    salary_cents[i] is not None, otherwise hourly (rate_cents[i] times
+    hours_hundredths[i] / 100). tax_rates maps 'federal', 'state' and
+    'other' to Decimal rates. Amounts are non-negative integer cents.
+
+    Gross pay and every tax are rounded half up to the cent from the exact
+    product, which is what quantize(CENT, ROUND_HALF_UP) gives and what the
+    PayrollHistory CHECK constraints compute with ROUND(gross_pay * rate, 2).
+    Returns (gross, federal, state, other, net) lists of cents.
+    """
+    gross = [
+        _round_half_up(salary, 12) if salary is not None
+        else _round_half_up(rate * hours, 100)
+        for salary, rate, hours in zip(salary_cents, rate_cents, hours_hundredths)
+    ]
+
+    taxes = []
+    for name in ('federal', 'state', 'other'):
+        numerator, denominator = Decimal(tax_rates[name]).as_integer_ratio()
+        taxes.append([_round_half_up(amount * numerator, denominator) for amount in gross])
+    federal, state, other = taxes
+
+    net = [amount - f - s - o for amount, f, s, o in zip(gross, federal, state, other)]
+    return gross, federal, state, other, net
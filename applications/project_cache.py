@@ -0,0 +1,292 @@
+"""
+Project Cache
+In-process read-through cache of project rosters (project teams, employee
+assignments and project lists), invalidated precisely by the project
+management application's writes and, across processes, from the change
+feed or an optional LISTEN/NOTIFY channel
+"""
+from database_config import current_scope
+from collections import OrderedDict
+import change_feed
+import json
+import os
+import threading
+import time
+import uuid
+
+# Cached query results kept before the least recently used are evicted
+CACHE_SIZE = int(os.getenv('PROJECT_CACHE_SIZE', 5000))
+
+# Seconds an entry is trusted; bounds staleness from writes made by other
+# processes when neither the change feed nor the invalidation channel is
+# enabled (0 disables expiry)
+CACHE_TTL = float(os.getenv('PROJECT_CACHE_TTL', 30))
+
+# NOTIFY channel for cross-process invalidation; empty disables it
+CACHE_CHANNEL = os.getenv('PROJECT_CACHE_CHANNEL', '')
+
+# Identifies this process's own notifications, which it has already applied
+_ORIGIN = uuid.uuid4().hex
+
+
+# ==================== INVALIDATION TAGS ====================
+# Each cached result carries the tags of the rows it shows; a write
+# invalidates the tags of the rows it changed
+
+def project_list_tag():
+    """Every project list: membership, order or columns change with any Project write"""
+    return ('project-list',)
+
+def team_tag(project_number):
+    """Membership of a project's team"""
+    return ('team', project_number)
+
+def employee_projects_tag(employee_number):
+    """Membership of an employee's project list"""
+    return ('employee-projects', employee_number)
+
+def assignment_tag(employee_number, project_number):
+    """Columns of one EmployeeProject row (hours, dates, role)"""
+    return ('assignment', employee_number, project_number)
+
+def employee_tag(employee_number):
+    """An employee's details or current assignment, wherever they are a team member"""
+    return ('employee', employee_number)
+
+def project_tag(project_number):
+    """A project's details, wherever it appears in an employee's project list"""
+    return ('project', project_number)
+
+
+class ProjectCache:
+    """Thread-safe LRU cache of query results with tag-based invalidation
+
+    Values are cached under a hashable key together with a set of tags;
+    invalidate(tags) drops every entry carrying any of them. Like
+    CompensationCache, loads record the generation() they started at and
+    are dropped by put() if any invalidation happened meanwhile, and
+    entries with a tag held by an uncommitted write (see hold()) are
+    never cached.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (value, loaded_at, tags)
+        self._tagged = {}               # tag -> keys of entries carrying it
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._held = {}                 # tag -> open writes holding it
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'evictions': 0,
+                       'expirations': 0, 'invalidations': 0, 'stale_loads': 0,
+                       'notifications': 0}
+
+    def generation(self):
+        """Invalidation counter to pass to put() for a load started now"""
+        with self._lock:
+            return self._generation
+
+    def get(self, key):
+        """Return (True, value) for a cached key, or (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[1] > self.ttl:
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return True, entry[0]
+
+    def put(self, key, value, tags, generation):
+        """Cache value under key with its tags, loaded at `generation`; False if not cached"""
+        tags = frozenset(tags)
+        with self._lock:
+            if generation != self._generation:
+                self._stats['stale_loads'] += 1
+                return False
+            if any(tag in self._held for tag in tags):
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic(), tags)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            self._stats['loads'] += 1
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+        return True
+
+    def _remove(self, key):
+        """Drop an entry and its tag index references (lock held)"""
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def invalidate(self, tags=None):
+        """Drop the entries carrying any of the given tags, or every entry when tags is None"""
+        with self._lock:
+            self._generation += 1
+            if tags is None:
+                self._stats['invalidations'] += len(self._entries)
+                self._entries.clear()
+                self._tagged.clear()
+                return
+            for tag in tags:
+                for key in list(self._tagged.get(tag, ())):
+                    self._remove(key)
+                    self._stats['invalidations'] += 1
+
+    def hold(self, tags):
+        """Invalidate tags and keep entries carrying them uncached until release()"""
+        with self._lock:
+            for tag in tags:
+                self._held[tag] = self._held.get(tag, 0) + 1
+        self.invalidate(tags)
+
+    def release(self, tags):
+        """End a hold(), invalidating again now that the write is committed or rolled back"""
+        with self._lock:
+            for tag in tags:
+                count = self._held.get(tag, 0) - 1
+                if count > 0:
+                    self._held[tag] = count
+                else:
+                    self._held.pop(tag, None)
+        self.invalidate(tags)
+
+    def record_notification(self):
+        """Count an invalidation received through the change feed"""
+        with self._lock:
+            self._stats['notifications'] += 1
+
+    def stats(self):
+        """Snapshot of cache size and hit/miss/eviction counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'size': len(self._entries), 'maxsize': self.maxsize, 'ttl': self.ttl})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        """Zero the counters, keeping cached entries"""
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+
+# Process-wide cache shared by every ProjectManagementApp instance
+project_cache = ProjectCache()
+
+
+def invalidate_after_write(tags):
+    """Invalidation hook called by the applications after roster writes
+
+    Pass None to drop every entry. Inside a ConnectionScope the write is
+    not committed yet, so the tags stay uncached until the scope closes
+    (see compensation_cache.invalidate_after_write).
+    """
+    tags = list(tags) if tags is not None else None
+    scope = current_scope()
+    if scope is None or tags is None:
+        project_cache.invalidate(tags)
+        return
+    project_cache.hold(tags)
+    scope.call_on_close(lambda: project_cache.release(tags))
+
+
+def publish_invalidation(cursor, tags, channel=None):
+    """Queue a NOTIFY of the tags on the write's own transaction
+
+    PostgreSQL delivers it to the other processes' listeners only if the
+    transaction commits. Does nothing when no channel is configured.
+    """
+    channel = channel or CACHE_CHANNEL
+    if not channel:
+        return
+    payload = {'origin': _ORIGIN, 'tags': list(tags) if tags is not None else None}
+    cursor.execute("SELECT pg_notify(%s, %s)", (channel, json.dumps(payload)))
+
+
+# ==================== CROSS-PROCESS INVALIDATION ====================
+
+def data_change_tags(change):
+    """Tags of the cached results a change feed data change can affect
+
+    Returns None when every entry may be affected (too many rows to list,
+    TRUNCATE or a reset). Employee names shown as project managers are
+    never changed by the applications and are left to the TTL.
+    """
+    table, keys = change['table'], change['keys']
+    if table not in ('employeeproject', 'project', 'employee'):
+        return []
+    if keys is None:
+        return None
+    if table == 'employeeproject':
+        return [tag for employee_number, project_number in keys
+                for tag in (team_tag(project_number), employee_projects_tag(employee_number))]
+    if table == 'project':
+        return [project_list_tag()] + [project_tag(project_number) for project_number in keys]
+    return [employee_tag(employee_number) for employee_number in keys]
+
+
+def _apply_data_change(change):
+    """Invalidate the entries a committed data change can affect"""
+    tags = None if change is change_feed.RESET else data_change_tags(change)
+    if tags == []:
+        return
+    project_cache.invalidate(tags)
+    project_cache.record_notification()
+
+
+def _apply_notification(payload):
+    """Invalidate the tags of one PROJECT_CACHE_CHANNEL notification from another process"""
+    if payload is None:
+        project_cache.invalidate()
+        return
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+    if message.get('origin') == _ORIGIN:
+        return
+    tags = message.get('tags')
+    project_cache.invalidate([tuple(tag) for tag in tags] if tags is not None else None)
+    project_cache.record_notification()
+
+
+_subscribed = False
+_subscribe_lock = threading.Lock()
+
+
+def ensure_invalidation_listener(channel=None):
+    """Invalidate this process's cache from other processes' writes
+
+    With the change feed enabled (CHANGE_FEED), the cache follows the data
+    changes its triggers publish, which also covers writes made outside the
+    applications; with a PROJECT_CACHE_CHANNEL it also applies the tags
+    other processes publish. Both share the change feed's one listener
+    connection, started here once per process. Safe to call on every
+    request; returns the listener, or None when neither is enabled.
+    """
+    global _subscribed
+    channel = channel or CACHE_CHANNEL
+    if not change_feed.ENABLED and not channel:
+        return None
+    with _subscribe_lock:
+        if not _subscribed:
+            if change_feed.ENABLED:
+                change_feed.subscribe_changes(_apply_data_change)
+            if channel:
+                change_feed.subscribe(_apply_notification, channel)
+            _subscribed = True
+    return change_feed.ensure_change_feed()
@@ -2,10 +2,99 @@
 Project Management Application
 Handles project creation, team assignments, milestone tracking, and reporting
 """
-from database_config import get_db_cursor
+from database_config import get_db_cursor, get_read_cursor, get_stream_cursor
+from project_cache import (
+    project_cache, invalidate_after_write, publish_invalidation, assignment_tag,
+    employee_projects_tag, employee_tag, project_list_tag, project_tag, team_tag
+)
+from reporting import PROJECT_REPORTING_VIEWS, refresh_after_write
 from datetime import datetime, date
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+import csv
+import io
 import sys
+import uuid
+
+# Query shared by the list and streaming variants of the productivity report
+EMPLOYEE_PRODUCTIVITY_QUERY = """
+    SELECT 
+        e.employee_number,
+        e.employee_name,
+        e.title,
+        d.department_name,
+        COUNT(DISTINCT ep.project_number) AS projects_count,
+        SUM(ep.hours_worked) AS total_hours,
+        COUNT(CASE WHEN ep.is_current = TRUE THEN 1 END) AS current_projects
+    FROM Employee e
+    JOIN EmployeeProject ep ON e.employee_number = ep.employee_number
+    LEFT JOIN Department d ON e.department_id = d.department_id
+    GROUP BY e.employee_number, e.employee_name, e.title, d.department_name
+    ORDER BY total_hours DESC
+"""
+
+# Columns accepted by the timesheet ingest API, in staging table order
+TIMESHEET_COLUMNS = ('employee_number', 'project_number', 'work_date', 'hours', 'source_ref')
+
+# Hours an employee can record for one day across all projects
+MAX_DAILY_HOURS = 24
+
+# Queries shared by the sync and async (async_app) read paths
+PROJECT_INFO_QUERY = """
+    SELECT 
+        p.project_number,
+        p.project_name,
+        p.budget,
+        p.date_started,
+        p.date_ended,
+        m.employee_name AS manager_name,
+        m.employee_number AS manager_id,
+        d.department_name,
+        d.department_id
+    FROM Project p
+    JOIN Employee m ON p.manager_emp_id = m.employee_number
+    JOIN Department d ON p.department_id = d.department_id
+    WHERE p.project_number = %s
+"""
+
+PROJECT_MILESTONES_QUERY = """
+    SELECT 
+        milestone_id,
+        milestone_name,
+        description,
+        due_date,
+        completion_date,
+        status,
+        details_done,
+        details_remaining
+    FROM ProjectMilestone
+    WHERE project_number = %s
+    ORDER BY due_date
+"""
+
+PROJECT_STATISTICS_QUERY = """
+    SELECT 
+        p.project_number,
+        p.project_name,
+        p.budget,
+        p.date_started,
+        p.date_ended,
+        m.employee_name AS manager_name,
+        m.employee_number AS manager_id,
+        d.department_name,
+        d.department_id,
+        s.team_size,
+        s.current_team_size,
+        s.total_person_hours,
+        s.total_milestones,
+        s.completed_milestones,
+        s.in_progress_milestones,
+        s.pending_milestones
+    FROM ProjectStatistics s
+    JOIN Project p ON s.project_number = p.project_number
+    JOIN Employee m ON p.manager_emp_id = m.employee_number
+    JOIN Department d ON p.department_id = d.department_id
+    WHERE s.project_number = %s
+"""
 
 class ProjectManagementApp:
     """Project Management Application"""
@@ -30,10 +119,13 @@ class ProjectManagementApp:
                       date_ended, manager_emp_id, department_id))
                 
                 proj_num = cursor.fetchone()[0]
+                publish_invalidation(cursor, [project_list_tag()])
                 print(f"✓ Project {proj_num} ({project_name}) created successfully")
                 print(f"  Manager: Employee #{manager_emp_id}")
                 print(f"  Budget: ${budget:,.2f}")
-                return proj_num
+            invalidate_after_write([project_list_tag()])
+            refresh_after_write(PROJECT_REPORTING_VIEWS)
+            return proj_num
         except Exception as e:
             print(f"✗ Error creating project: {e}")
             return None
@@ -41,42 +133,29 @@ class ProjectManagementApp:
     def get_project_info(self, project_number):
         """Get detailed project information"""
         try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    SELECT 
-                        p.project_number,
-                        p.project_name,
-                        p.budget,
-                        p.date_started,
-                        p.date_ended,
-                        m.employee_name AS manager_name,
-                        m.employee_number AS manager_id,
-                        d.department_name,
-                        d.department_id
-                    FROM Project p
-                    JOIN Employee m ON p.manager_emp_id = m.employee_number
-                    JOIN Department d ON p.department_id = d.department_id
-                    WHERE p.project_number = %s
-                """, (project_number,))
-                
-                result = cursor.fetchone()
-                if result:
-                    return {
-                        'project_number': result[0],
-                        'project_name': result[1],
-                        'budget': result[2],
-                        'date_started': result[3],
-                        'date_ended': result[4],
-                        'manager_name': result[5],
-                        'manager_id': result[6],
-                        'department_name': result[7],
-                        'department_id': result[8]
-                    }
-                return None
+            with get_read_cursor() as cursor:
+                cursor.execute(PROJECT_INFO_QUERY, (project_number,))
+                return self._project_info_from_row(cursor.fetchone())
         except Exception as e:
             print(f"✗ Error getting project info: {e}")
             return None
     
+    def _project_info_from_row(self, result):
+        """Shape the PROJECT_INFO_QUERY columns of a row as a dict (None if not found)"""
+        if result:
+            return {
+                'project_number': result[0],
+                'project_name': result[1],
+                'budget': result[2],
+                'date_started': result[3],
+                'date_ended': result[4],
+                'manager_name': result[5],
+                'manager_id': result[6],
+                'department_name': result[7],
+                'department_id': result[8]
+            }
+        return None
+    
     def update_project(self, project_number, **kwargs):
         """Update project information"""
         try:
@@ -94,56 +173,85 @@ class ProjectManagementApp:
                 return False
             
             values.append(project_number)
+            tags = [project_list_tag(), project_tag(project_number)]
             
             with get_db_cursor() as cursor:
                 query = f"UPDATE Project SET {', '.join(updates)} WHERE project_number = %s"
                 cursor.execute(query, values)
+                publish_invalidation(cursor, tags)
                 print(f"✓ Project {project_number} updated successfully")
-                return True
+            invalidate_after_write(tags)
+            refresh_after_write(PROJECT_REPORTING_VIEWS)
+            return True
         except Exception as e:
             print(f"✗ Error updating project: {e}")
             return False
     
-    def list_all_projects(self, include_completed=True):
-        """List all projects"""
+    def _project_list_query(self, include_completed=True, limit=None, after=None,
+                            department_id=None, status=None):
+        """Build the project list query and its parameters
+
+        Raises ValueError for an unknown `status` filter.
+        """
+        conditions = []
+        params = []
+        if not include_completed:
+            status = 'active'
+        if status == 'active':
+            conditions.append("p.date_ended IS NULL")
+        elif status == 'completed':
+            conditions.append("p.date_ended IS NOT NULL")
+        elif status is not None:
+            raise ValueError(f"Unknown project status filter: {status}")
+        if after is not None:
+            conditions.append("p.project_number > %s")
+            params.append(after)
+        if department_id is not None:
+            conditions.append("p.department_id = %s")
+            params.append(department_id)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT %s"
+            params.append(limit)
+
+        query = f"""
+            SELECT 
+                p.project_number,
+                p.project_name,
+                p.budget,
+                p.date_started,
+                p.date_ended,
+                m.employee_name AS manager_name,
+                d.department_name,
+                CASE WHEN p.date_ended IS NULL THEN 'Active' ELSE 'Completed' END AS status
+            FROM Project p
+            JOIN Employee m ON p.manager_emp_id = m.employee_number
+            JOIN Department d ON p.department_id = d.department_id
+            {where}
+            ORDER BY p.project_number
+            {limit_clause}
+        """
+        return query, params
+    
+    def list_all_projects(self, include_completed=True, limit=None, after=None,
+                          department_id=None, status=None):
+        """List projects
+
+        With `limit`, returns one keyset page of projects whose
+        project_number is greater than `after`. `status` filters to
+        'active' or 'completed' projects.
+        """
         try:
-            with get_db_cursor() as cursor:
-                if include_completed:
-                    cursor.execute("""
-                        SELECT 
-                            p.project_number,
-                            p.project_name,
-                            p.budget,
-                            p.date_started,
-                            p.date_ended,
-                            m.employee_name AS manager_name,
-                            d.department_name,
-                            CASE WHEN p.date_ended IS NULL THEN 'Active' ELSE 'Completed' END AS status
-                        FROM Project p
-                        JOIN Employee m ON p.manager_emp_id = m.employee_number
-                        JOIN Department d ON p.department_id = d.department_id
-                        ORDER BY p.project_number
-                    """)
-                else:
-                    cursor.execute("""
-                        SELECT 
-                            p.project_number,
-                            p.project_name,
-                            p.budget,
-                            p.date_started,
-                            p.date_ended,
-                            m.employee_name AS manager_name,
-                            d.department_name,
-                            'Active' AS status
-                        FROM Project p
-                        JOIN Employee m ON p.manager_emp_id = m.employee_number
-                        JOIN Department d ON p.department_id = d.department_id
-                        WHERE p.date_ended IS NULL
-                        ORDER BY p.project_number
-                    """)
-                
-                results = cursor.fetchall()
-                return results
+            query, params = self._project_list_query(include_completed, limit, after,
+                                                     department_id, status)
+        except ValueError as e:
+            print(f"✗ {e}")
+            return []
+        try:
+            key = ('list', include_completed, limit, after, department_id, status)
+            return self._read_through(key, query, params, lambda rows: [project_list_tag()])
         except Exception as e:
             print(f"✗ Error listing projects: {e}")
             return []
@@ -153,6 +261,11 @@ class ProjectManagementApp:
     def assign_employee_to_project(self, employee_number, project_number, role,
                                    start_date, hours_worked=0, is_current=True):
         """Assign an employee to a project"""
+        # A current assignment ends the employee's previous current one,
+        # which shows in that project's team
+        tags = [team_tag(project_number), employee_projects_tag(employee_number)]
+        if is_current:
+            tags.append(employee_tag(employee_number))
         try:
             with get_db_cursor() as cursor:
                 cursor.execute("""
@@ -165,36 +278,47 @@ class ProjectManagementApp:
                       start_date, is_current))
                 
                 result = cursor.fetchone()
+                publish_invalidation(cursor, tags)
                 print(f"✓ Employee {employee_number} assigned to project {project_number}")
                 print(f"  Role: {role}")
-                return result
+            invalidate_after_write(tags)
+            refresh_after_write(PROJECT_REPORTING_VIEWS)
+            return result
         except Exception as e:
             print(f"✗ Error assigning employee to project: {e}")
             return None
     
-    def update_employee_project_hours(self, employee_number, project_number, additional_hours):
-        """Update hours worked by an employee on a project"""
-        try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    UPDATE EmployeeProject 
-                    SET hours_worked = hours_worked + %s
-                    WHERE employee_number = %s AND project_number = %s
-                    RETURNING hours_worked
-                """, (additional_hours, employee_number, project_number))
-                
-                result = cursor.fetchone()
-                if result:
-                    print(f"✓ Hours updated for employee {employee_number} on project {project_number}")
-                    print(f"  Total hours: {result[0]}")
-                    return result[0]
-                return None
-        except Exception as e:
-            print(f"✗ Error updating hours: {e}")
+    def update_employee_project_hours(self, employee_number, project_number, additional_hours,
+                                      work_date=None, source_ref=None):
+        """Log hours worked by an employee on a project
+        
+        Records one TimesheetEntry dated work_date (today by default), so
+        the hours are paid by the next pay run covering that date and reach
+        EmployeeProject.hours_worked at the next rollup_timesheet_hours().
+        The entry is validated like any other: the date must fall within
+        the assignment and the employee's day stays within MAX_DAILY_HOURS.
+        Pass the same source_ref again (e.g. a form submission id) and the
+        entry is recorded once; without one every call records a new entry.
+        
+        Returns the record_timesheet_entries() result, or None if the entry
+        was rejected.
+        """
+        row = {
+            'employee_number': employee_number,
+            'project_number': project_number,
+            'work_date': work_date or date.today(),
+            'hours': additional_hours,
+            'source_ref': source_ref or f"manual {uuid.uuid4().hex}",
+        }
+        result = self.record_timesheet_entries([row], strict=True)
+        if result['errors']:
+            print(f"✗ Error updating hours: {result['errors'][0][1]}")
             return None
+        return result
     
     def remove_employee_from_project(self, employee_number, project_number, end_date):
         """Remove employee from project (set end_date and is_current to False)"""
+        tags = [team_tag(project_number), employee_projects_tag(employee_number)]
         try:
             with get_db_cursor() as cursor:
                 cursor.execute("""
@@ -206,95 +330,367 @@ class ProjectManagementApp:
                 
                 result = cursor.fetchone()
                 if result:
-                    print(f"✓ Employee {employee_number} removed from project {project_number}")
-                    return True
-                return False
+                    publish_invalidation(cursor, tags)
+            if result:
+                invalidate_after_write(tags)
+                print(f"✓ Employee {employee_number} removed from project {project_number}")
+                refresh_after_write(PROJECT_REPORTING_VIEWS)
+                return True
+            return False
         except Exception as e:
             print(f"✗ Error removing employee from project: {e}")
             return False
     
+    def _project_team_query(self, project_number, current_only=True):
+        """Build the project team query and its parameters"""
+        current = "AND ep.is_current = TRUE" if current_only else ""
+        query = f"""
+            SELECT 
+                e.employee_number,
+                e.employee_name,
+                e.title,
+                ep.role,
+                ep.hours_worked,
+                ep.start_date,
+                ep.end_date
+            FROM EmployeeProject ep
+            JOIN Employee e ON ep.employee_number = e.employee_number
+            WHERE ep.project_number = %s {current}
+            ORDER BY e.employee_name
+        """
+        return query, (project_number,)
+    
     def get_project_team(self, project_number, current_only=True):
         """Get list of employees assigned to a project"""
+        def tags(rows):
+            return [team_tag(project_number)] + [
+                tag for row in rows
+                for tag in (assignment_tag(row[0], project_number), employee_tag(row[0]))
+            ]
         try:
-            with get_db_cursor() as cursor:
-                if current_only:
-                    cursor.execute("""
-                        SELECT 
-                            e.employee_number,
-                            e.employee_name,
-                            e.title,
-                            ep.role,
-                            ep.hours_worked,
-                            ep.start_date,
-                            ep.end_date
-                        FROM EmployeeProject ep
-                        JOIN Employee e ON ep.employee_number = e.employee_number
-                        WHERE ep.project_number = %s AND ep.is_current = TRUE
-                        ORDER BY e.employee_name
-                    """, (project_number,))
-                else:
-                    cursor.execute("""
-                        SELECT 
-                            e.employee_number,
-                            e.employee_name,
-                            e.title,
-                            ep.role,
-                            ep.hours_worked,
-                            ep.start_date,
-                            ep.end_date
-                        FROM EmployeeProject ep
-                        JOIN Employee e ON ep.employee_number = e.employee_number
-                        WHERE ep.project_number = %s
-                        ORDER BY e.employee_name
-                    """, (project_number,))
-                
-                results = cursor.fetchall()
-                return results
+            return self._read_through(('team', project_number, current_only),
+                                      *self._project_team_query(project_number, current_only),
+                                      tags)
         except Exception as e:
             print(f"✗ Error getting project team: {e}")
             return []
     
+    def _employee_projects_query(self, employee_number, current_only=True):
+        """Build the employee project assignments query and its parameters"""
+        current = "AND ep.is_current = TRUE" if current_only else ""
+        query = f"""
+            SELECT 
+                p.project_number,
+                p.project_name,
+                ep.role,
+                ep.hours_worked,
+                ep.start_date,
+                ep.end_date,
+                m.employee_name AS manager_name
+            FROM EmployeeProject ep
+            JOIN Project p ON ep.project_number = p.project_number
+            JOIN Employee m ON p.manager_emp_id = m.employee_number
+            WHERE ep.employee_number = %s {current}
+            ORDER BY ep.start_date DESC
+        """
+        return query, (employee_number,)
+    
     def get_employee_projects(self, employee_number, current_only=True):
         """Get list of projects an employee is/was assigned to"""
+        def tags(rows):
+            return [employee_projects_tag(employee_number)] + [
+                tag for row in rows
+                for tag in (assignment_tag(employee_number, row[0]), project_tag(row[0]))
+            ]
+        try:
+            return self._read_through(('employee-projects', employee_number, current_only),
+                                      *self._employee_projects_query(employee_number, current_only),
+                                      tags)
+        except Exception as e:
+            print(f"✗ Error getting employee projects: {e}")
+            return []
+    
+    def _read_through(self, key, query, params, tags):
+        """Rows of a roster query from the project cache, loading them on a miss
+
+        tags(rows) gives the invalidation tags of a loaded result. Callers
+        get their own list, so the cached rows cannot be changed.
+        """
+        hit, rows = project_cache.get(key)
+        if hit:
+            return list(rows)
+        generation = project_cache.generation()
+        with get_read_cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        project_cache.put(key, tuple(rows), tags(rows), generation)
+        return rows
+    
+    def get_project_cache_stats(self):
+        """Project cache size and hit/miss counters"""
+        return project_cache.stats()
+    
+    # ==================== TIMESHEETS ====================
+    
+    def record_timesheet_entries(self, rows, strict=False):
+        """Bulk record dated project hours as TimesheetEntry rows
+        
+        rows is an iterable of dicts keyed by TIMESHEET_COLUMNS (source_ref
+        is optional). Entries are validated in Python, COPYed into a staging
+        table and appended in one transaction, so thousands of clock-ins
+        cost one round trip each way and never contend on the
+        EmployeeProject row. Entries for unknown assignments, dated outside
+        the assignment, repeated within the batch or taking an employee
+        past MAX_DAILY_HOURS on a day (counting entries already recorded)
+        are reported and skipped; with strict=True any error aborts the
+        whole batch. Entries already recorded with the same assignment,
+        work_date and source_ref are skipped as duplicates, so submitting
+        the same batch again records nothing. Hours reach
+        EmployeeProject.hours_worked at the next rollup_timesheet_hours().
+        
+        Returns {'recorded': count, 'duplicates': count, 'errors': [(row,
+        message)]} with rows numbered from 1.
+        """
+        return self._record_numbered_entries(enumerate(rows, start=1), strict)
+    
+    def record_timesheet_csv(self, stream, strict=False):
+        """Bulk record timesheet entries from a CSV stream with a header row
+        
+        Errors are reported against the CSV line number.
+        """
+        reader = csv.DictReader(stream)
+        rows = ((reader.line_num, row) for row in reader)
+        return self._record_numbered_entries(rows, strict)
+    
+    def _record_numbered_entries(self, rows, strict):
+        """Validate, stage and append (row_number, row) timesheet pairs"""
+        errors = []
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        staged = 0
+        
+        for row_number, row in rows:
+            try:
+                record = self._validate_timesheet_row(row)
+            except ValueError as e:
+                errors.append((row_number, str(e)))
+                continue
+            writer.writerow((row_number,) + record)
+            staged += 1
+        
+        if strict and errors:
+            print(f"✗ Timesheet import aborted: {len(errors)} invalid row(s)")
+            return {'recorded': 0, 'duplicates': 0, 'errors': errors}
+        if not staged:
+            return {'recorded': 0, 'duplicates': 0, 'errors': errors}
+        
         try:
             with get_db_cursor() as cursor:
-                if current_only:
-                    cursor.execute("""
-                        SELECT 
-                            p.project_number,
-                            p.project_name,
-                            ep.role,
-                            ep.hours_worked,
-                            ep.start_date,
-                            ep.end_date,
-                            m.employee_name AS manager_name
-                        FROM EmployeeProject ep
-                        JOIN Project p ON ep.project_number = p.project_number
-                        JOIN Employee m ON p.manager_emp_id = m.employee_number
-                        WHERE ep.employee_number = %s AND ep.is_current = TRUE
-                        ORDER BY ep.start_date DESC
-                    """, (employee_number,))
-                else:
-                    cursor.execute("""
-                        SELECT 
-                            p.project_number,
-                            p.project_name,
-                            ep.role,
-                            ep.hours_worked,
-                            ep.start_date,
-                            ep.end_date,
-                            m.employee_name AS manager_name
-                        FROM EmployeeProject ep
-                        JOIN Project p ON ep.project_number = p.project_number
-                        JOIN Employee m ON p.manager_emp_id = m.employee_number
-                        WHERE ep.employee_number = %s
-                        ORDER BY ep.start_date DESC
-                    """, (employee_number,))
+                cursor.execute("""
+                    CREATE TEMP TABLE timesheet_stage (
+                        row_number INTEGER PRIMARY KEY,
+                        employee_number INTEGER NOT NULL,
+                        project_number INTEGER NOT NULL,
+                        work_date DATE NOT NULL,
+                        hours DECIMAL(5, 2) NOT NULL,
+                        source_ref VARCHAR(100) NOT NULL
+                    ) ON COMMIT DROP
+                """)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    "COPY timesheet_stage FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (source_ref))",
+                    buffer)
+                
+                # Entries that do not match an assignment
+                cursor.execute("""
+                    SELECT s.row_number,
+                           CASE
+                               WHEN ep.employee_number IS NULL
+                                   THEN 'employee ' || s.employee_number
+                                        || ' is not assigned to project ' || s.project_number
+                               ELSE 'work_date ' || s.work_date
+                                    || ' is outside the assignment'
+                           END
+                    FROM timesheet_stage s
+                    LEFT JOIN EmployeeProject ep ON s.employee_number = ep.employee_number
+                        AND s.project_number = ep.project_number
+                    WHERE ep.employee_number IS NULL
+                       OR s.work_date < ep.start_date
+                       OR s.work_date > ep.end_date
+                    ORDER BY s.row_number
+                """)
+                conflicts = cursor.fetchall()
+                self._reject_staged_entries(cursor, conflicts, errors, strict)
+                
+                # Entries already recorded (e.g. the same file submitted
+                # again) are skipped; repeats within the batch are errors
+                cursor.execute("""
+                    DELETE FROM timesheet_stage s
+                    USING TimesheetEntry t
+                    WHERE t.employee_number = s.employee_number
+                      AND t.project_number = s.project_number
+                      AND t.work_date = s.work_date
+                      AND t.source_ref = s.source_ref
+                """)
+                duplicates = cursor.rowcount
+                cursor.execute("""
+                    SELECT s.row_number, 'repeats row ' || MIN(d.row_number)
+                    FROM timesheet_stage s
+                    JOIN timesheet_stage d ON d.employee_number = s.employee_number
+                        AND d.project_number = s.project_number
+                        AND d.work_date = s.work_date
+                        AND d.source_ref = s.source_ref
+                        AND d.row_number < s.row_number
+                    GROUP BY s.row_number
+                """)
+                self._reject_staged_entries(cursor, cursor.fetchall(), errors, strict)
+                
+                # Daily cap per employee across projects, counting the
+                # entries already recorded for those days
+                cursor.execute("""
+                    WITH days AS (
+                        SELECT s.employee_number, s.work_date,
+                               SUM(s.hours) + COALESCE((
+                                   SELECT SUM(t.hours)
+                                   FROM TimesheetEntry t
+                                   WHERE t.employee_number = s.employee_number
+                                     AND t.work_date = s.work_date
+                               ), 0) AS hours
+                        FROM timesheet_stage s
+                        GROUP BY s.employee_number, s.work_date
+                    )
+                    SELECT s.row_number,
+                           'employee ' || s.employee_number || ' would have '
+                           || d.hours || ' hours on ' || s.work_date
+                           || ' (at most ' || %s || ')'
+                    FROM timesheet_stage s
+                    JOIN days d ON d.employee_number = s.employee_number
+                        AND d.work_date = s.work_date
+                    WHERE d.hours > %s
+                """, (MAX_DAILY_HOURS, MAX_DAILY_HOURS))
+                self._reject_staged_entries(cursor, cursor.fetchall(), errors, strict)
+                
+                # A concurrent submission of the same entries is skipped too
+                cursor.execute("""
+                    INSERT INTO TimesheetEntry
+                    (employee_number, project_number, work_date, hours, source_ref)
+                    SELECT employee_number, project_number, work_date, hours, source_ref
+                    FROM timesheet_stage
+                    ORDER BY row_number
+                    ON CONFLICT (employee_number, project_number, work_date, source_ref)
+                    DO NOTHING
+                """)
+                recorded = cursor.rowcount
+                cursor.execute("SELECT COUNT(*) FROM timesheet_stage")
+                duplicates += cursor.fetchone()[0] - recorded
+            
+            errors.sort()
+            print(f"✓ Recorded {recorded} timesheet entries "
+                  f"({duplicates} already recorded, {len(errors)} rejected)")
+            return {'recorded': recorded, 'duplicates': duplicates, 'errors': errors}
+        except Exception as e:
+            print(f"✗ Error recording timesheet entries: {e}")
+            errors.sort()
+            return {'recorded': 0, 'duplicates': 0, 'errors': errors or [(None, str(e))]}
+    
+    def _reject_staged_entries(self, cursor, rejected, errors, strict):
+        """Report (row_number, message) pairs and drop them from the staging table"""
+        errors.extend(rejected)
+        if strict and errors:
+            raise ValueError(f"{len(errors)} invalid row(s)")
+        if rejected:
+            cursor.execute("""
+                DELETE FROM timesheet_stage
+                WHERE row_number = ANY(%s)
+            """, ([r[0] for r in rejected],))
+    
+    def _validate_timesheet_row(self, row):
+        """Validate one timesheet row and return it as a staging tuple"""
+        def integer(name):
+            value = row.get(name)
+            if value is None or str(value).strip() == '':
+                raise ValueError(f"{name} is required")
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be an integer, got {value!r}")
+        
+        employee_number = integer('employee_number')
+        project_number = integer('project_number')
+        
+        work_date = row.get('work_date')
+        if not hasattr(work_date, 'isoformat'):
+            try:
+                work_date = datetime.strptime(str(work_date or '').strip(), '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f"work_date must be YYYY-MM-DD, got {row.get('work_date')!r}")
+        
+        value = row.get('hours')
+        try:
+            hours = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f"hours must be a number, got {value!r}")
+        if not hours.is_finite() or hours <= 0 or hours > 24:
+            raise ValueError(f"hours must be greater than 0 and at most 24, got {value!r}")
+        
+        source_ref = str(row.get('source_ref') or '').strip()
+        if len(source_ref) > 100:
+            raise ValueError("source_ref must be at most 100 characters")
+        
+        return (employee_number, project_number, work_date, hours.quantize(Decimal('0.01')),
+                source_ref)
+    
+    def rollup_timesheet_hours(self):
+        """Add timesheet hours recorded since the last roll-up to EmployeeProject.hours_worked
+        
+        Runs the rollup_timesheet_hours() database function, which can also
+        be scheduled on its own (e.g. from cron). Returns {'entries',
+        'assignments'} rolled up, zeros if another roll-up was running, or
+        None on error.
+        """
+        try:
+            with get_db_cursor() as cursor:
+                cursor.execute("SELECT entries, assignments FROM rollup_timesheet_hours()")
+                entries, assignments = cursor.fetchone()
+                if entries:
+                    publish_invalidation(cursor, None)
+            if entries:
+                # Hours of any number of assignments changed
+                invalidate_after_write(None)
+                print(f"✓ Rolled up {entries} timesheet entries into {assignments} assignments")
+                refresh_after_write(PROJECT_REPORTING_VIEWS)
+            return {'entries': entries, 'assignments': assignments}
+        except Exception as e:
+            print(f"✗ Error rolling up timesheet hours: {e}")
+            return None
+    
+    def get_timesheet_entries(self, employee_number, start_date, end_date, project_number=None):
+        """Get an employee's timesheet entries worked between two dates (inclusive)"""
+        conditions = ["t.employee_number = %s", "t.work_date BETWEEN %s AND %s"]
+        params = [employee_number, start_date, end_date]
+        if project_number is not None:
+            conditions.append("t.project_number = %s")
+            params.append(project_number)
+        try:
+            with get_read_cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT 
+                        t.entry_id,
+                        t.project_number,
+                        t.work_date,
+                        t.hours,
+                        t.recorded_at,
+                        t.entry_id <= r.last_entry_id AS rolled_up
+                    FROM TimesheetEntry t
+                    CROSS JOIN TimesheetRollup r
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY t.work_date, t.entry_id
+                """, params)
                 
                 results = cursor.fetchall()
                 return results
         except Exception as e:
-            print(f"✗ Error getting employee projects: {e}")
+            print(f"✗ Error getting timesheet entries: {e}")
             return []
     
     # ==================== MILESTONE MANAGEMENT ====================
@@ -362,21 +758,8 @@ class ProjectManagementApp:
     def get_project_milestones(self, project_number):
         """Get all milestones for a project"""
         try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    SELECT 
-                        milestone_id,
-                        milestone_name,
-                        description,
-                        due_date,
-                        completion_date,
-                        status,
-                        details_done,
-                        details_remaining
-                    FROM ProjectMilestone
-                    WHERE project_number = %s
-                    ORDER BY due_date
-                """, (project_number,))
+            with get_read_cursor() as cursor:
+                cursor.execute(PROJECT_MILESTONES_QUERY, (project_number,))
                 
                 results = cursor.fetchall()
                 return results
@@ -387,130 +770,114 @@ class ProjectManagementApp:
     # ==================== REPORTING AND STATISTICS ====================
     
     def get_project_statistics(self, project_number):
-        """Get comprehensive statistics for a project"""
+        """Get comprehensive statistics for a project
+        
+        Counters are kept current by triggers on EmployeeProject and
+        ProjectMilestone, so this is a single primary-key lookup.
+        """
         try:
-            with get_db_cursor() as cursor:
-                # Basic project info
-                project_info = self.get_project_info(project_number)
-                
-                # Team statistics
-                cursor.execute("""
-                    SELECT 
-                        COUNT(DISTINCT employee_number) AS team_size,
-                        SUM(hours_worked) AS total_hours
-                    FROM EmployeeProject
-                    WHERE project_number = %s
-                """, (project_number,))
-                team_stats = cursor.fetchone()
-                
-                # Current team size
-                cursor.execute("""
-                    SELECT COUNT(DISTINCT employee_number)
-                    FROM EmployeeProject
-                    WHERE project_number = %s AND is_current = TRUE
-                """, (project_number,))
-                current_team_size = cursor.fetchone()[0]
-                
-                # Milestone statistics
-                cursor.execute("""
-                    SELECT 
-                        COUNT(*) AS total_milestones,
-                        COUNT(CASE WHEN status = 'completed' THEN 1 END) AS completed,
-                        COUNT(CASE WHEN status = 'in_progress' THEN 1 END) AS in_progress,
-                        COUNT(CASE WHEN status = 'pending' THEN 1 END) AS pending
-                    FROM ProjectMilestone
-                    WHERE project_number = %s
-                """, (project_number,))
-                milestone_stats = cursor.fetchone()
-                
-                return {
-                    'project_info': project_info,
-                    'team_size': team_stats[0] or 0,
-                    'current_team_size': current_team_size or 0,
-                    'total_person_hours': team_stats[1] or 0,
-                    'total_milestones': milestone_stats[0] or 0,
-                    'completed_milestones': milestone_stats[1] or 0,
-                    'in_progress_milestones': milestone_stats[2] or 0,
-                    'pending_milestones': milestone_stats[3] or 0
-                }
+            with get_read_cursor() as cursor:
+                cursor.execute(PROJECT_STATISTICS_QUERY, (project_number,))
+                return self._project_statistics_from_row(cursor.fetchone())
         except Exception as e:
             print(f"✗ Error getting project statistics: {e}")
             return None
     
-    def get_department_projects_summary(self, department_id=None):
-        """Get summary of projects by department"""
+    def _project_statistics_from_row(self, result):
+        """Shape a PROJECT_STATISTICS_QUERY row as a dict (None if not found)"""
+        if not result:
+            return None
+        return {
+            'project_info': self._project_info_from_row(result[:9]),
+            'team_size': result[9],
+            'current_team_size': result[10],
+            'total_person_hours': result[11],
+            'total_milestones': result[12],
+            'completed_milestones': result[13],
+            'in_progress_milestones': result[14],
+            'pending_milestones': result[15]
+        }
+    
+    def _department_projects_summary_query(self, department_id=None, from_summary=False):
+        """Build the department projects summary query and its parameters"""
+        if department_id:
+            where = "WHERE d.department_id = %s"
+            params = (department_id,)
+        else:
+            where = ""
+            params = ()
+        if from_summary:
+            query = f"""
+                SELECT 
+                    d.department_name,
+                    d.total_projects,
+                    d.active_projects,
+                    d.total_budget,
+                    d.avg_team_size,
+                    d.total_person_hours
+                FROM mv_department_projects_summary d
+                {where}
+                ORDER BY d.department_name
+            """
+            return query, params
+        query = f"""
+            SELECT 
+                d.department_name,
+                COUNT(p.project_number) AS total_projects,
+                COUNT(CASE WHEN p.date_ended IS NULL THEN 1 END) AS active_projects,
+                SUM(p.budget) AS total_budget,
+                AVG(team_stats.team_size) AS avg_team_size,
+                SUM(team_stats.total_hours) AS total_person_hours
+            FROM Department d
+            LEFT JOIN Project p ON d.department_id = p.department_id
+            LEFT JOIN (
+                SELECT 
+                    project_number,
+                    COUNT(DISTINCT employee_number) AS team_size,
+                    SUM(hours_worked) AS total_hours
+                FROM EmployeeProject
+                GROUP BY project_number
+            ) team_stats ON p.project_number = team_stats.project_number
+            {where}
+            GROUP BY d.department_name
+            ORDER BY d.department_name
+        """
+        return query, params
+
+    def get_department_projects_summary(self, department_id=None, from_summary=False):
+        """Get summary of projects by department
+
+        With from_summary=True the totals are read from the
+        mv_department_projects_summary materialized view instead of being
+        re-aggregated, reflecting data as of its last refresh.
+        """
         try:
-            with get_db_cursor() as cursor:
-                if department_id:
-                    cursor.execute("""
-                        SELECT 
-                            d.department_name,
-                            COUNT(p.project_number) AS total_projects,
-                            COUNT(CASE WHEN p.date_ended IS NULL THEN 1 END) AS active_projects,
-                            SUM(p.budget) AS total_budget,
-                            AVG(team_stats.team_size) AS avg_team_size,
-                            SUM(team_stats.total_hours) AS total_person_hours
-                        FROM Department d
-                        LEFT JOIN Project p ON d.department_id = p.department_id
-                        LEFT JOIN (
-                            SELECT 
-                                project_number,
-                                COUNT(DISTINCT employee_number) AS team_size,
-                                SUM(hours_worked) AS total_hours
-                            FROM EmployeeProject
-                            GROUP BY project_number
-                        ) team_stats ON p.project_number = team_stats.project_number
-                        WHERE d.department_id = %s
-                        GROUP BY d.department_name
-                    """, (department_id,))
-                else:
-                    cursor.execute("""
-                        SELECT 
-                            d.department_name,
-                            COUNT(p.project_number) AS total_projects,
-                            COUNT(CASE WHEN p.date_ended IS NULL THEN 1 END) AS active_projects,
-                            SUM(p.budget) AS total_budget,
-                            AVG(team_stats.team_size) AS avg_team_size,
-                            SUM(team_stats.total_hours) AS total_person_hours
-                        FROM Department d
-                        LEFT JOIN Project p ON d.department_id = p.department_id
-                        LEFT JOIN (
-                            SELECT 
-                                project_number,
-                                COUNT(DISTINCT employee_number) AS team_size,
-                                SUM(hours_worked) AS total_hours
-                            FROM EmployeeProject
-                            GROUP BY project_number
-                        ) team_stats ON p.project_number = team_stats.project_number
-                        GROUP BY d.department_name
-                        ORDER BY d.department_name
-                    """)
+            with get_read_cursor() as cursor:
+                cursor.execute(*self._department_projects_summary_query(
+                    department_id, from_summary))
                 
                 results = cursor.fetchall()
                 return results
         except Exception as e:
             print(f"✗ Error getting department projects summary: {e}")
             return []
+
+    def stream_department_projects_summary(self, department_id=None, itersize=None,
+                                           from_summary=False):
+        """Yield the department projects summary from a server-side cursor"""
+        try:
+            with get_stream_cursor(itersize) as cursor:
+                cursor.execute(*self._department_projects_summary_query(
+                    department_id, from_summary))
+                yield from cursor
+        except Exception as e:
+            print(f"✗ Error streaming department projects summary: {e}")
     
     def get_employee_productivity_report(self):
         """Get productivity report for all employees with project assignments"""
         try:
-            with get_db_cursor() as cursor:
-                cursor.execute("""
-                    SELECT 
-                        e.employee_number,
-                        e.employee_name,
-                        e.title,
-                        d.department_name,
-                        COUNT(DISTINCT ep.project_number) AS projects_count,
-                        SUM(ep.hours_worked) AS total_hours,
-                        COUNT(CASE WHEN ep.is_current = TRUE THEN 1 END) AS current_projects
-                    FROM Employee e
-                    JOIN EmployeeProject ep ON e.employee_number = ep.employee_number
-                    LEFT JOIN Department d ON e.department_id = d.department_id
-                    GROUP BY e.employee_number, e.employee_name, e.title, d.department_name
-                    ORDER BY total_hours DESC
-                """)
+            with get_read_cursor() as cursor:
+                cursor.execute(EMPLOYEE_PRODUCTIVITY_QUERY)
                 
                 results = cursor.fetchall()
                 return results
@@ -518,6 +885,15 @@ class ProjectManagementApp:
             print(f"✗ Error getting employee productivity report: {e}")
             return []
 
+    def stream_employee_productivity_report(self, itersize=None):
+        """Yield the employee productivity report from a server-side cursor"""
+        try:
+            with get_stream_cursor(itersize) as cursor:
+                cursor.execute(EMPLOYEE_PRODUCTIVITY_QUERY)
+                yield from cursor
+        except Exception as e:
+            print(f"✗ Error streaming employee productivity report: {e}")
+
 
 # ==================== DISPLAY FUNCTIONS ====================
 
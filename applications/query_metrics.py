@@ -0,0 +1,318 @@
+"""
+Query Instrumentation
+Records latency, rows and pool wait for every statement run through
+database_config cursors, keeps in-process histograms and logs slow queries
+"""
+from psycopg2 import extensions
+from collections import deque
+from functools import lru_cache
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+# Record statement metrics for every cursor handed out by database_config
+ENABLED = os.getenv('DB_QUERY_METRICS', 'true').lower() in ('1', 'true', 'yes')
+
+# Statements slower than this many milliseconds go to the slow-query log
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 250))
+
+# Slow queries kept in memory for get_slow_queries()
+SLOW_QUERY_HISTORY = int(os.getenv('DB_SLOW_QUERY_HISTORY', 100))
+
+# Histogram bucket upper bounds in seconds (Prometheus defaults)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_logger = logging.getLogger('cs631.slow_queries')
+if os.getenv('DB_SLOW_QUERY_LOG'):
+    _handler = logging.FileHandler(os.getenv('DB_SLOW_QUERY_LOG'))
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_query_logger.addHandler(_handler)
+    slow_query_logger.setLevel(logging.WARNING)
+
+# Modules whose frames are skipped when looking for the calling method
+_INTERNAL_FILES = ('query_metrics.py', 'database_config.py', 'async_database.py', 'contextlib.py')
+
+_lock = threading.Lock()
+_statements = {}        # (method, normalized sql) -> statement stats
+_pool_waits = {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+_slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+_checkout_waits = {}    # id(connection) -> pool wait of its current checkout
+
+_LITERAL_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|%s'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def _normalize(query):
+    """Collapse whitespace and replace literals and placeholders with ?"""
+    for pattern, replacement in _LITERAL_PATTERNS:
+        query = pattern.sub(replacement, query)
+    return query.strip()
+
+
+_normalize_cached = lru_cache(maxsize=2048)(_normalize)
+
+
+def normalize_sql(query):
+    """Normalized form of a statement, cached for the application's static SQL
+
+    Statements built with inline values (execute_values, COPY payloads) are
+    normalized without caching so they cannot grow the cache.
+    """
+    if isinstance(query, bytes):
+        return _normalize(query.decode('utf-8', 'replace'))
+    if len(query) > 4096:
+        return _normalize(query)
+    return _normalize_cached(query)
+
+
+def calling_method():
+    """Name the application method that issued the current statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        owner = frame.f_locals.get('self')
+        internal = (filename.endswith(_INTERNAL_FILES)
+                    or f"{os.sep}psycopg2{os.sep}" in filename
+                    or isinstance(owner, extensions.cursor))
+        if not internal:
+            if owner is not None:
+                return f"{type(owner).__name__}.{frame.f_code.co_name}"
+            module = os.path.splitext(os.path.basename(filename))[0]
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def _bucket_index(seconds):
+    """Index of the first histogram bucket holding `seconds`"""
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return index
+    return len(LATENCY_BUCKETS)
+
+
+def record_checkout(connection, wait_time):
+    """Record the pool wait of a connection checkout"""
+    if not ENABLED:
+        return
+    _checkout_waits[id(connection)] = wait_time
+    with _lock:
+        _pool_waits['buckets'][_bucket_index(wait_time)] += 1
+        _pool_waits['sum'] += wait_time
+        _pool_waits['count'] += 1
+
+
+def record_release(connection):
+    """Forget the pool wait of a connection returned to the pool"""
+    _checkout_waits.pop(id(connection), None)
+
+
+def checkout_wait(connection):
+    """Pool wait of a connection's current checkout, in seconds"""
+    return _checkout_waits.get(id(connection), 0.0)
+
+
+def record_statement(method, query, param_count, latency, rows, pool_wait):
+    """Add one executed statement to the histograms and the slow-query log"""
+    sql = normalize_sql(query)
+    with _lock:
+        stats = _statements.get((method, sql))
+        if stats is None:
+            stats = _statements[(method, sql)] = {
+                'method': method,
+                'sql': sql,
+                'calls': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+                'rows': 0,
+                'params': 0,
+                'pool_wait': 0.0,
+                'slow_calls': 0,
+                'buckets': [0] * (len(LATENCY_BUCKETS) + 1)
+            }
+        stats['calls'] += 1
+        stats['total_time'] += latency
+        stats['max_time'] = max(stats['max_time'], latency)
+        stats['rows'] += rows
+        stats['params'] += param_count
+        stats['pool_wait'] += pool_wait
+        stats['buckets'][_bucket_index(latency)] += 1
+        slow = latency * 1000 >= SLOW_QUERY_MS
+        if slow:
+            stats['slow_calls'] += 1
+
+    if slow:
+        entry = {
+            'timestamp': time.time(),
+            'method': method,
+            'sql': sql,
+            'params': param_count,
+            'latency': latency,
+            'rows': rows,
+            'pool_wait': pool_wait
+        }
+        _slow_queries.append(entry)
+        slow_query_logger.warning(
+            "slow query %.1fms method=%s rows=%d params=%d pool_wait=%.1fms sql=%s",
+            latency * 1000, method, rows, param_count, pool_wait * 1000, sql)
+
+
+def _param_count(vars):
+    """Number of bound parameters in an execute() argument"""
+    if vars is None:
+        return 0
+    try:
+        return len(vars)
+    except TypeError:
+        return 0
+
+
+class InstrumentedCursor(extensions.cursor):
+    """Cursor that records every execute(), executemany() and COPY"""
+
+    def _record(self, query, param_count, started):
+        latency = time.perf_counter() - started
+        rows = self.rowcount if self.rowcount > 0 else 0
+        pool_wait = checkout_wait(self.connection)
+        record_statement(calling_method(), query, param_count, latency, rows, pool_wait)
+
+    def execute(self, query, vars=None):
+        if not ENABLED:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(query, _param_count(vars), started)
+
+    def executemany(self, query, vars_list):
+        if not ENABLED:
+            return super().executemany(query, vars_list)
+        vars_list = list(vars_list)
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, sum(_param_count(v) for v in vars_list), started)
+
+    def copy_expert(self, sql, file, size=8192):
+        if not ENABLED:
+            return super().copy_expert(sql, file, size)
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self._record(sql, 0, started)
+
+
+def get_query_stats():
+    """Per-statement metrics, slowest total time first
+
+    Each entry holds method, normalized sql, calls, total/max/avg time in
+    seconds, rows, params, pool_wait, slow_calls and latency buckets.
+    """
+    with _lock:
+        statements = [dict(stats, buckets=list(stats['buckets']))
+                      for stats in _statements.values()]
+    for stats in statements:
+        stats['avg_time'] = stats['total_time'] / stats['calls']
+    return sorted(statements, key=lambda s: s['total_time'], reverse=True)
+
+
+def get_slow_queries():
+    """Most recent statements slower than SLOW_QUERY_MS, oldest first"""
+    return list(_slow_queries)
+
+
+def reset_query_stats():
+    """Clear all recorded statement and pool wait metrics"""
+    with _lock:
+        _statements.clear()
+        _pool_waits['buckets'] = [0] * (len(LATENCY_BUCKETS) + 1)
+        _pool_waits['sum'] = 0.0
+        _pool_waits['count'] = 0
+        _slow_queries.clear()
+
+
+def _label(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name, labels, buckets, total, count):
+    """Prometheus text lines for one histogram series"""
+    prefix = f"{labels}," if labels else ""
+    lines = []
+    cumulative = 0
+    for bound, observed in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+        cumulative += observed
+        lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {total}")
+    lines.append(f"{name}_count{suffix} {count}")
+    return lines
+
+
+def render_prometheus(pool_stats=None):
+    """Render query, pool wait and pool occupancy metrics in Prometheus text format"""
+    methods = {}
+    for stats in get_query_stats():
+        method = methods.setdefault(stats['method'], {
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            'total_time': 0.0, 'calls': 0, 'rows': 0, 'slow_calls': 0
+        })
+        method['buckets'] = [a + b for a, b in zip(method['buckets'], stats['buckets'])]
+        for key in ('total_time', 'calls', 'rows', 'slow_calls'):
+            method[key] += stats[key]
+
+    lines = [
+        "# HELP db_query_duration_seconds Statement latency by calling method",
+        "# TYPE db_query_duration_seconds histogram"
+    ]
+    for name, method in sorted(methods.items()):
+        lines += _histogram_lines('db_query_duration_seconds', f'method="{_label(name)}"',
+                                  method['buckets'], method['total_time'], method['calls'])
+
+    lines += [
+        "# HELP db_query_rows_total Rows returned or affected by calling method",
+        "# TYPE db_query_rows_total counter"
+    ]
+    lines += [f'db_query_rows_total{{method="{_label(name)}"}} {method["rows"]}'
+              for name, method in sorted(methods.items())]
+
+    lines += [
+        f"# HELP db_slow_queries_total Statements slower than {SLOW_QUERY_MS:g}ms by calling method",
+        "# TYPE db_slow_queries_total counter"
+    ]
+    lines += [f'db_slow_queries_total{{method="{_label(name)}"}} {method["slow_calls"]}'
+              for name, method in sorted(methods.items())]
+
+    with _lock:
+        waits = dict(_pool_waits, buckets=list(_pool_waits['buckets']))
+    lines += [
+        "# HELP db_pool_wait_seconds Time spent waiting for a pooled connection",
+        "# TYPE db_pool_wait_seconds histogram"
+    ]
+    lines += _histogram_lines('db_pool_wait_seconds', '', waits['buckets'],
+                              waits['sum'], waits['count'])
+
+    if pool_stats:
+        lines += [
+            "# HELP db_pool_connections Pooled connections by state",
+            "# TYPE db_pool_connections gauge",
+            f'db_pool_connections{{state="in_use"}} {pool_stats["in_use"]}',
+            f'db_pool_connections{{state="idle"}} {pool_stats["idle"]}',
+            f'db_pool_connections{{state="max"}} {pool_stats["maxconn"]}',
+            "# HELP db_pool_timeouts_total Checkouts that timed out waiting for a connection",
+            "# TYPE db_pool_timeouts_total counter",
+            f"db_pool_timeouts_total {pool_stats['timeouts']}"
+        ]
+    return "\n".join(lines) + "\n"
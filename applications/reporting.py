@@ -0,0 +1,140 @@
+"""
+Reporting Layer
+Refreshes the materialized views that back the fast report paths
+"""
+from database_config import current_scope, get_db_cursor
+import os
+import threading
+
+# Materialized views grouped by the data that invalidates them
+PAYROLL_REPORTING_VIEWS = ('mv_department_payroll_summary',)
+PROJECT_REPORTING_VIEWS = ('mv_department_projects_summary',)
+REPORTING_VIEWS = PAYROLL_REPORTING_VIEWS + PROJECT_REPORTING_VIEWS
+
+# Refresh views in the background after writes. Off by default: a refresh
+# recomputes the whole view, far more work than the single-row writes that
+# trigger it, so views are normally refreshed by cron (python reporting.py)
+AUTO_REFRESH = os.getenv('REPORTING_AUTO_REFRESH', 'false').lower() in ('1', 'true', 'yes')
+
+# Seconds between background refreshes, so a burst of writes costs at most
+# one refresh of each view they touched per interval
+REFRESH_INTERVAL = float(os.getenv('REPORTING_REFRESH_INTERVAL', 30))
+
+
+def refresh_reporting_views(views=REPORTING_VIEWS):
+    """Refresh materialized views without blocking concurrent readers
+
+    Runs in its own transaction even inside a ConnectionScope, so the
+    refresh lock is not held until the enclosing request commits.
+    """
+    try:
+        with get_db_cursor(own_transaction=True) as cursor:
+            for view in views:
+                cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+        return True
+    except Exception as e:
+        print(f"✗ Error refreshing reporting views: {e}")
+        return False
+
+
+# ==================== DEFERRED REFRESH ====================
+
+_stale = set()
+_stale_lock = threading.Lock()
+
+
+def mark_stale(views):
+    """Queue views for the next background refresh"""
+    with _stale_lock:
+        _stale.update(views)
+    ensure_refresher()
+
+
+def refresh_stale_views():
+    """Refresh the views marked stale since the last refresh; returns them"""
+    with _stale_lock:
+        views = tuple(sorted(_stale))
+        _stale.clear()
+    if not views:
+        return ()
+    if not refresh_reporting_views(views):
+        # Try again next interval
+        with _stale_lock:
+            _stale.update(views)
+        return ()
+    return views
+
+
+class ReportingRefresher(threading.Thread):
+    """Background thread refreshing stale views every REFRESH_INTERVAL seconds"""
+
+    def __init__(self, interval=REFRESH_INTERVAL):
+        super().__init__(name="reporting-refresher", daemon=True)
+        self.interval = interval
+        self.pid = os.getpid()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            refresh_stale_views()
+
+    def stop(self, timeout=None):
+        """Ask the thread to exit and wait for it"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def ensure_refresher():
+    """Start this process's refresher on first use (one per process, after fork)"""
+    global _refresher
+    if _refresher is not None and _refresher.pid == os.getpid():
+        return _refresher
+    with _refresher_lock:
+        if _refresher is None or _refresher.pid != os.getpid():
+            _refresher = ReportingRefresher()
+            _refresher.start()
+    return _refresher
+
+
+def stop_refresher(flush=True):
+    """Stop this process's refresher, refreshing any views still stale when flush=True"""
+    global _refresher
+    with _refresher_lock:
+        refresher, _refresher = _refresher, None
+    if refresher is not None and refresher.pid == os.getpid():
+        refresher.stop(timeout=5)
+    if flush:
+        refresh_stale_views()
+
+
+def refresh_after_write(views):
+    """Refresh hook called by the applications after writes affecting `views`
+
+    Only marks the views stale for the background refresher; inside a
+    ConnectionScope they are marked once the scope has closed. Returns
+    True if a refresh was scheduled.
+    """
+    if not AUTO_REFRESH:
+        return False
+    scope = current_scope()
+    if scope is None:
+        mark_stale(views)
+    else:
+        scope.call_on_close(lambda: mark_stale(views))
+    return True
+
+
+if __name__ == '__main__':
+    # Cron entry point: refresh every reporting view once
+    from database_config import initialize_connection_pool, close_connection_pool
+    initialize_connection_pool()
+    try:
+        if refresh_reporting_views():
+            print("✓ Reporting views refreshed")
+    finally:
+        close_connection_pool()
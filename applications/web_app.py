@@ -2,33 +2,138 @@
 Flask Web Application for HR/Payroll and Project Management
 Minimal web interface demonstrating CRUD operations
 """
-from flask import Flask, render_template, request, redirect, url_for, flash
-from database_config import initialize_connection_pool, close_connection_pool
-from hr_payroll_app import HRPayrollApp
+from flask import (
+    Blueprint, Flask, Response, render_template, request, redirect, url_for, flash,
+    stream_template, stream_with_context, g, has_app_context, current_app, session
+)
+from database_config import (
+    ensure_connection_pool, close_connection_pool, get_pool_stats,
+    worker_pool_config, ConnectionScope, set_scope_lookup
+)
+from query_metrics import render_prometheus
+from project_cache import ensure_invalidation_listener
+from compensation_cache import ensure_invalidation_listener as ensure_compensation_listener
+import change_feed
+from hr_payroll_app import HRPayrollApp, ONBOARDING_COLUMNS
 from project_management_app import ProjectManagementApp
 from datetime import date, datetime
 from decimal import Decimal
 import atexit
+import io
+import json
+import os
+import time
+import uuid
 
-app = Flask(__name__)
-app.secret_key = 'cs631_demo_key_change_in_production'
-
-# Initialize database connection pool on startup
-initialize_connection_pool()
-
-# Close connection pool on shutdown
-atexit.register(close_connection_pool)
+# Routes are registered on the application built by create_app()
+bp = Blueprint('company', __name__)
 
 # Initialize app instances
 hr_app = HRPayrollApp()
 pm_app = ProjectManagementApp()
 
+# Close this process's pool on shutdown, once however many apps are built
+# (gunicorn workers also close it in worker_exit)
+atexit.register(close_connection_pool)
+
+
+# ============================================================================
+# APPLICATION FACTORY
+# ============================================================================
+
+def create_app(workers=None, connection_budget=None):
+    """Build the Flask application for the development or a WSGI server
+
+    The connection pool is not opened here. Each process opens its own pool
+    on its first request, after a pre-forking server has forked, so no
+    psycopg2 socket is ever shared between workers. The connection budget
+    (DB_CONNECTION_BUDGET) is split evenly across `workers` processes,
+    which defaults to WEB_CONCURRENCY as set by gunicorn.
+    """
+    workers = workers or int(os.getenv('WEB_CONCURRENCY', 1))
+    app = Flask(__name__)
+    app.secret_key = os.getenv('FLASK_SECRET_KEY', 'cs631_demo_key_change_in_production')
+    app.config['DB_POOL_OPTIONS'] = worker_pool_config(workers, connection_budget)
+    app.register_blueprint(bp)
+    return app
+
+
+# ============================================================================
+# REQUEST-SCOPED DATABASE CONNECTION
+# ============================================================================
+
+def request_scope():
+    """Connection scope bound to the current request, if any"""
+    return g.get('db_scope') if has_app_context() else None
+
+set_scope_lookup(request_scope)
+
+
+@bp.before_app_request
+def open_request_scope():
+    """Share one connection and transaction across all app calls in a request"""
+    ensure_connection_pool(**current_app.config['DB_POOL_OPTIONS'])
+    ensure_invalidation_listener()
+    ensure_compensation_listener()
+    g.db_scope = ConnectionScope()
+
+
+@bp.after_app_request
+def commit_request_scope(response):
+    """Commit the request's transaction before the response is sent
+
+    Runs before a streamed body is generated, so the stream reads on its
+    own connections rather than inside the request's transaction, and a
+    failed commit replaces the response instead of going unreported.
+    """
+    scope = g.pop('db_scope', None)
+    if scope is None:
+        return response
+    # Error pages (after_request runs for them too) and scopes that already
+    # failed roll back; the view or error handler has reported the error
+    error = response.status if response.status_code >= 500 else None
+    failed = scope.failed or error is not None
+    if scope.close(error) or failed:
+        return response
+    session.pop('_flashes', None)
+    return Response('Error saving changes: the transaction could not be committed\n',
+                    status=500, mimetype='text/plain')
+
+
+@bp.teardown_app_request
+def close_request_scope(error):
+    """Roll back the request's transaction if the request failed before committing"""
+    scope = g.pop('db_scope', None)
+    if scope is not None:
+        scope.close(error)
+
+
+# Keyset pagination defaults for list pages
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def get_page_args():
+    """Read page_size and the `after` keyset cursor from the query string"""
+    page_size = request.args.get('page_size', DEFAULT_PAGE_SIZE, type=int)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    after = request.args.get('after', type=int)
+    return page_size, after
+
+
+def split_page(rows, page_size):
+    """Trim a page fetched with one extra row and return (rows, next cursor)"""
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, rows[-1][0]
+    return rows, None
+
 
 # ============================================================================
 # HOME PAGE
 # ============================================================================
 
-@app.route('/')
+@bp.route('/')
 def home():
     """Home page with links to HR and Project Management"""
     return render_template('home.html')
@@ -38,13 +143,13 @@ def home():
 # HUMAN RESOURCE MANAGEMENT ROUTES
 # ============================================================================
 
-@app.route('/hr')
+@bp.route('/hr')
 def hr_dashboard():
     """HR Dashboard with links to all HR functions"""
     return render_template('hr_dashboard.html')
 
 
-@app.route('/hr/add_employee', methods=['GET', 'POST'])
+@bp.route('/hr/add_employee', methods=['GET', 'POST'])
 def add_employee():
     """Add a new employee (CREATE)"""
     if request.method == 'POST':
@@ -66,34 +171,80 @@ def add_employee():
             
             start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
             
-            # Add employee
-            hr_app.add_employee(emp_number, name, title, employment_type, dept_id)
-            
-            # Add job history
-            hr_app.add_job_history(emp_number, title, start_date, salary, is_current=True)
+            # Add employee and job history in the request's single transaction
+            hourly_rate = salary if employment_type == 'hourly' else None
+            if hr_app.add_employee(emp_number, name, title, employment_type, dept_id,
+                                   hourly_rate=hourly_rate) is None:
+                raise ValueError('employee could not be added')
+            if hr_app.add_job_history(emp_number, title, start_date, salary, is_current=True) is None:
+                raise ValueError('job history could not be added')
             
             flash(f'Successfully added employee {name} (ID: {emp_number})', 'success')
-            return redirect(url_for('view_employees'))
+            return redirect(url_for('.view_employees'))
             
         except Exception as e:
             flash(f'Error adding employee: {str(e)}', 'error')
-            return redirect(url_for('add_employee'))
+            return redirect(url_for('.add_employee'))
     
     return render_template('add_employee.html')
 
 
-@app.route('/hr/employees')
+@bp.route('/hr/import', methods=['GET', 'POST'])
+def import_employees():
+    """Bulk onboard employees from an uploaded CSV file (CREATE)"""
+    result = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a CSV file to import', 'error')
+            return redirect(url_for('.import_employees'))
+        try:
+            stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+            result = hr_app.onboard_employees_csv(stream, strict=bool(request.form.get('strict')))
+            if result['imported']:
+                flash(f"Successfully imported {len(result['imported'])} employees", 'success')
+            if result['errors']:
+                flash(f"{len(result['errors'])} rows were rejected", 'error')
+        except Exception as e:
+            flash(f'Error importing employees: {str(e)}', 'error')
+    
+    return render_template('import_employees.html', columns=ONBOARDING_COLUMNS, result=result)
+
+
+@bp.route('/hr/employees')
 def view_employees():
-    """View all employees (READ)"""
+    """View employees one keyset page at a time (READ)"""
+    filters = {
+        'department_id': request.args.get('department_id', type=int),
+        'employment_type': request.args.get('employment_type') or None
+    }
+    page_size, after = get_page_args()
     try:
-        employees = hr_app.list_all_employees()
-        return render_template('view_employees.html', employees=employees)
+        employees = hr_app.list_all_employees(limit=page_size + 1, after=after, **filters)
+        employees, next_after = split_page(employees, page_size)
+        return render_template('view_employees.html', employees=employees,
+                               next_after=next_after, page_size=page_size,
+                               after=after, filters=filters, live_tables=page_live_tables('employee', 'jobhistory'))
     except Exception as e:
         flash(f'Error loading employees: {str(e)}', 'error')
-        return render_template('view_employees.html', employees=[])
+        return render_template('view_employees.html', employees=[], next_after=None,
+                               page_size=page_size, after=after, filters=filters)
+
+
+@bp.route('/hr/employee/<int:employee_number>')
+def employee_profile(employee_number):
+    """View an employee's full profile, built with one query (READ)"""
+    year = request.args.get('year', type=int)
+    profile = hr_app.employee_360(employee_number, year=year)
+    if profile is None:
+        flash(f'Employee {employee_number} not found', 'error')
+        return redirect(url_for('.view_employees'))
+    return render_template('employee_360.html', profile=profile, year=year,
+                           live_tables=page_live_tables('employee', 'jobhistory', 'employeeproject'),
+                           live_key=employee_number)
 
 
-@app.route('/hr/promote', methods=['GET', 'POST'])
+@bp.route('/hr/promote', methods=['GET', 'POST'])
 def promote_employee():
     """Promote an employee (UPDATE)"""
     if request.method == 'POST':
@@ -106,16 +257,16 @@ def promote_employee():
             hr_app.update_employee_title(emp_number, new_title, new_salary, effective_date)
             
             flash(f'Successfully promoted employee {emp_number}', 'success')
-            return redirect(url_for('view_employees'))
+            return redirect(url_for('.view_employees'))
             
         except Exception as e:
             flash(f'Error promoting employee: {str(e)}', 'error')
-            return redirect(url_for('promote_employee'))
+            return redirect(url_for('.promote_employee'))
     
     return render_template('promote_employee.html')
 
 
-@app.route('/hr/payroll', methods=['GET', 'POST'])
+@bp.route('/hr/payroll', methods=['GET', 'POST'])
 def payroll_report():
     """View and process payroll (READ)"""
     if request.method == 'POST':
@@ -133,18 +284,22 @@ def payroll_report():
                 from datetime import timedelta
                 pay_end = pay_end - timedelta(days=1)
             
-            # Process payroll
+            # Process payroll; chunks commit on their own connections, outside
+            # the request's transaction, so a failed run can be resumed
             payment_date = pay_end
-            hr_app.process_payroll(pay_start, pay_end, payment_date)
+            hr_app.process_payroll_batch(pay_start, pay_end, payment_date)
             
-            # Get payroll report
-            payroll_data = hr_app.get_payroll_report(pay_start, pay_end)
+            # Stream the payroll report so large periods render in constant memory;
+            # commit_request_scope commits the request's transaction before the
+            # body streams, so the report reads on its own read-only connection
+            payroll_data = hr_app.stream_payroll_report(pay_start, pay_end)
             
-            return render_template('payroll_report.html', 
-                                 payroll_data=payroll_data,
-                                 month=month,
-                                 year=year,
-                                 processed=True)
+            return Response(stream_with_context(stream_template(
+                'payroll_report.html',
+                payroll_data=payroll_data,
+                month=month,
+                year=year,
+                processed=True)))
         except Exception as e:
             flash(f'Error processing payroll: {str(e)}', 'error')
             return render_template('payroll_report.html', payroll_data=[], processed=False)
@@ -156,13 +311,13 @@ def payroll_report():
 # PROJECT MANAGEMENT ROUTES
 # ============================================================================
 
-@app.route('/projects')
+@bp.route('/projects')
 def project_dashboard():
     """Project Management Dashboard"""
     return render_template('project_dashboard.html')
 
 
-@app.route('/projects/create', methods=['GET', 'POST'])
+@bp.route('/projects/create', methods=['GET', 'POST'])
 def create_project():
     """Create a new project (CREATE)"""
     if request.method == 'POST':
@@ -177,27 +332,36 @@ def create_project():
             pm_app.create_project(proj_number, proj_name, budget, start_date, manager_id, dept_id)
             
             flash(f'Successfully created project: {proj_name}', 'success')
-            return redirect(url_for('view_projects'))
+            return redirect(url_for('.view_projects'))
             
         except Exception as e:
             flash(f'Error creating project: {str(e)}', 'error')
-            return redirect(url_for('create_project'))
+            return redirect(url_for('.create_project'))
     
     return render_template('create_project.html')
 
 
-@app.route('/projects/list')
+@bp.route('/projects/list')
 def view_projects():
-    """View all projects (READ)"""
+    """View projects one keyset page at a time (READ)"""
+    filters = {
+        'department_id': request.args.get('department_id', type=int),
+        'status': request.args.get('status') or None
+    }
+    page_size, after = get_page_args()
     try:
-        projects = pm_app.list_all_projects()
-        return render_template('view_projects.html', projects=projects)
+        projects = pm_app.list_all_projects(limit=page_size + 1, after=after, **filters)
+        projects, next_after = split_page(projects, page_size)
+        return render_template('view_projects.html', projects=projects,
+                               next_after=next_after, page_size=page_size,
+                               after=after, filters=filters, live_tables=page_live_tables('project'))
     except Exception as e:
         flash(f'Error loading projects: {str(e)}', 'error')
-        return render_template('view_projects.html', projects=[])
+        return render_template('view_projects.html', projects=[], next_after=None,
+                               page_size=page_size, after=after, filters=filters)
 
 
-@app.route('/projects/assign', methods=['GET', 'POST'])
+@bp.route('/projects/assign', methods=['GET', 'POST'])
 def assign_employee():
     """Assign employee to project (CREATE)"""
     if request.method == 'POST':
@@ -210,37 +374,49 @@ def assign_employee():
             pm_app.assign_employee_to_project(emp_id, proj_number, role, start_date, 0, True)
             
             flash(f'Successfully assigned employee {emp_id} to project {proj_number}', 'success')
-            return redirect(url_for('view_projects'))
+            return redirect(url_for('.view_projects'))
             
         except Exception as e:
             flash(f'Error assigning employee: {str(e)}', 'error')
-            return redirect(url_for('assign_employee'))
+            return redirect(url_for('.assign_employee'))
     
     return render_template('assign_employee.html')
 
 
-@app.route('/projects/hours', methods=['GET', 'POST'])
+@bp.route('/projects/hours', methods=['GET', 'POST'])
 def update_hours():
-    """Update project hours (UPDATE)"""
+    """Log project hours as a timesheet entry (CREATE)"""
     if request.method == 'POST':
         try:
             emp_id = int(request.form['employee_id'])
             proj_number = int(request.form['project_number'])
             hours = Decimal(request.form['hours'])
+            work_date = datetime.strptime(request.form['work_date'], '%Y-%m-%d').date()
             
-            pm_app.update_employee_project_hours(emp_id, proj_number, hours)
+            # The form's submission id makes a resubmitted form a duplicate
+            result = pm_app.update_employee_project_hours(
+                emp_id, proj_number, hours, work_date,
+                source_ref=f"form {request.form['submission_id']}")
             
-            flash(f'Successfully updated hours for employee {emp_id}', 'success')
-            return redirect(url_for('view_projects'))
+            if result is None:
+                flash(f'Hours not recorded: employee {emp_id} must be assigned to project '
+                      f'{proj_number} on {work_date} and work at most 24 hours that day', 'error')
+                return redirect(url_for('.update_hours'))
+            if result['duplicates']:
+                flash(f'These hours for employee {emp_id} were already recorded', 'success')
+            else:
+                flash(f'Successfully recorded {hours} hours for employee {emp_id}', 'success')
+            return redirect(url_for('.view_projects'))
             
         except Exception as e:
             flash(f'Error updating hours: {str(e)}', 'error')
-            return redirect(url_for('update_hours'))
+            return redirect(url_for('.update_hours'))
     
-    return render_template('update_hours.html')
+    return render_template('update_hours.html', today=date.today(),
+                           submission_id=uuid.uuid4().hex)
 
 
-@app.route('/projects/complete_milestone', methods=['GET', 'POST'])
+@bp.route('/projects/complete_milestone', methods=['GET', 'POST'])
 def complete_milestone():
     """Complete a milestone (UPDATE/DEACTIVATE)"""
     if request.method == 'POST':
@@ -251,16 +427,16 @@ def complete_milestone():
             pm_app.complete_milestone(milestone_id, completion_date)
             
             flash(f'Successfully completed milestone {milestone_id}', 'success')
-            return redirect(url_for('view_projects'))
+            return redirect(url_for('.view_projects'))
             
         except Exception as e:
             flash(f'Error completing milestone: {str(e)}', 'error')
-            return redirect(url_for('complete_milestone'))
+            return redirect(url_for('.complete_milestone'))
     
     # Get list of pending milestones
     try:
-        from database_config import get_db_cursor
-        with get_db_cursor() as cursor:
+        from database_config import get_read_cursor
+        with get_read_cursor() as cursor:
             cursor.execute("""
                 SELECT milestone_id, project_number, milestone_name, status
                 FROM ProjectMilestone
@@ -274,6 +450,82 @@ def complete_milestone():
     return render_template('complete_milestone.html', milestones=milestones)
 
 
+# ============================================================================
+# LIVE UPDATES
+# ============================================================================
+
+# Seconds between keep-alive comments on an idle event stream
+EVENT_STREAM_HEARTBEAT = 15
+
+# Seconds before an event stream ends and the browser reconnects, so a
+# stream never holds a worker thread indefinitely (gunicorn.conf.py keeps
+# it below the worker timeout)
+EVENT_STREAM_MAX_SECONDS = int(os.getenv('EVENT_STREAM_MAX_SECONDS', 300))
+
+# Pages subscribe to /events only when the server can spare a thread per
+# open page; gunicorn.conf.py turns this off for single-threaded sync workers
+LIVE_UPDATES = os.getenv('LIVE_UPDATES', 'true').lower() in ('1', 'true', 'yes')
+
+
+def page_live_tables(*tables):
+    """Tables a page re-renders on when they change, or None without live updates"""
+    return list(tables) if LIVE_UPDATES and change_feed.ENABLED else None
+
+
+def format_event(event, data):
+    """One server-sent event with a JSON data line"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@bp.route('/events')
+def change_events():
+    """Server-sent events stream of committed data changes for live dashboards
+
+    ?tables=employee,project limits the stream to those tables. Each
+    "change" event carries {'table', 'op', 'rows', 'keys'} (keys is null
+    when the whole table should be treated as changed); a "reset" event
+    means changes may have been missed and the page should reload its data.
+    """
+    if not change_feed.ENABLED:
+        return Response('Change feed disabled (CHANGE_FEED=false)\n', status=404,
+                        mimetype='text/plain')
+    tables = {table.strip().lower() for table in request.args.get('tables', '').split(',')
+              if table.strip()} or None
+    change_feed.ensure_change_feed()
+    changes = change_feed.ChangeQueue(tables)
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                # Never wait past the deadline
+                change = changes.get(timeout=min(EVENT_STREAM_HEARTBEAT,
+                                                 max(deadline - time.monotonic(), 0)))
+                if change is None:
+                    yield ": keep-alive\n\n"
+                elif change is change_feed.RESET:
+                    yield format_event('reset', {})
+                else:
+                    yield format_event('change', change)
+        finally:
+            changes.close()
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# ============================================================================
+# MONITORING
+# ============================================================================
+
+@bp.route('/metrics')
+def metrics():
+    """Query latency, slow query and pool metrics in Prometheus text format"""
+    return Response(render_prometheus(get_pool_stats()),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
 # ============================================================================
 # RUN APPLICATION
 # ============================================================================
@@ -287,4 +539,4 @@ if __name__ == '__main__':
     print("\nPress CTRL+C to stop the server")
     print("="*70 + "\n")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
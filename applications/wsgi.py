@@ -0,0 +1,8 @@
+"""
+WSGI Entry Point
+Production entry point for pre-forking WSGI servers, e.g.:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from web_app import create_app
+
+app = create_app()
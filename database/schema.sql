@@ -5,9 +5,14 @@
 
 -- Drop existing tables (in reverse order of dependencies)
 DROP TABLE IF EXISTS EmployeeOffice CASCADE;
+DROP TABLE IF EXISTS ProjectStatistics CASCADE;
 DROP TABLE IF EXISTS ProjectMilestone CASCADE;
+DROP TABLE IF EXISTS PayrollRun CASCADE;
+DROP TABLE IF EXISTS YearEndTaxSummary CASCADE;
 DROP TABLE IF EXISTS PayrollHistory CASCADE;
 DROP TABLE IF EXISTS JobHistory CASCADE;
+DROP TABLE IF EXISTS TimesheetRollup CASCADE;
+DROP TABLE IF EXISTS TimesheetEntry CASCADE;
 DROP TABLE IF EXISTS EmployeeProject CASCADE;
 DROP TABLE IF EXISTS Project CASCADE;
 DROP TABLE IF EXISTS Phone CASCADE;
@@ -140,6 +145,37 @@ CREATE TABLE EmployeeProject (
     CHECK (end_date IS NULL OR end_date >= start_date)
 );
 
+-- TimesheetEntry Table (append-only dated hours per project assignment,
+-- rolled up into EmployeeProject.hours_worked by rollup_timesheet_hours).
+-- Entries are payable history: an assignment with entries cannot be
+-- deleted, only ended (remove_employee_from_project). source_ref tells
+-- apart several entries for the same assignment and day (e.g. shifts), so
+-- re-submitting an entry is detected rather than paid twice
+CREATE TABLE TimesheetEntry (
+    entry_id BIGSERIAL PRIMARY KEY,
+    employee_number INTEGER NOT NULL,
+    project_number INTEGER NOT NULL,
+    work_date DATE NOT NULL,
+    hours DECIMAL(5, 2) NOT NULL CHECK (hours > 0 AND hours <= 24),
+    source_ref VARCHAR(100) NOT NULL DEFAULT '',
+    recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (employee_number, project_number, work_date, source_ref),
+    FOREIGN KEY (employee_number, project_number)
+        REFERENCES EmployeeProject(employee_number, project_number)
+        ON UPDATE CASCADE
+        ON DELETE RESTRICT
+);
+
+-- TimesheetRollup Table (single row: entries up to last_entry_id have been
+-- added to EmployeeProject.hours_worked)
+CREATE TABLE TimesheetRollup (
+    singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    last_entry_id BIGINT NOT NULL DEFAULT 0,
+    rolled_up_at TIMESTAMP
+);
+
+INSERT INTO TimesheetRollup DEFAULT VALUES;
+
 -- JobHistory Table
 CREATE TABLE JobHistory (
     job_history_id SERIAL PRIMARY KEY,
@@ -155,9 +191,10 @@ CREATE TABLE JobHistory (
     CHECK (end_date IS NULL OR end_date >= start_date)
 );
 
--- PayrollHistory Table
+-- PayrollHistory Table (range-partitioned by pay period year; see
+-- create_payroll_partition below)
 CREATE TABLE PayrollHistory (
-    payroll_id SERIAL PRIMARY KEY,
+    payroll_id SERIAL,
     employee_number INTEGER NOT NULL,
     pay_period_start DATE NOT NULL,
     pay_period_end DATE NOT NULL,
@@ -174,7 +211,45 @@ CREATE TABLE PayrollHistory (
     CHECK (federal_tax = ROUND(gross_pay * 0.10, 2)),
     CHECK (state_tax = ROUND(gross_pay * 0.05, 2)),
     CHECK (other_tax = ROUND(gross_pay * 0.03, 2)),
-    CHECK (net_pay = gross_pay - federal_tax - state_tax - other_tax)
+    CHECK (net_pay = gross_pay - federal_tax - state_tax - other_tax),
+    PRIMARY KEY (payroll_id, pay_period_start),
+    UNIQUE (employee_number, pay_period_start, pay_period_end)
+) PARTITION BY RANGE (pay_period_start);
+
+-- Catches pay periods whose year has no partition yet
+CREATE TABLE PayrollHistory_default PARTITION OF PayrollHistory DEFAULT;
+
+-- PayrollRun Table (ledger of payroll runs, one per pay period)
+CREATE TABLE PayrollRun (
+    run_id SERIAL PRIMARY KEY,
+    pay_period_start DATE NOT NULL,
+    pay_period_end DATE NOT NULL,
+    payment_date DATE NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'completed', 'failed')),
+    last_employee_number INTEGER,
+    employees_processed INTEGER NOT NULL DEFAULT 0 CHECK (employees_processed >= 0),
+    started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP,
+    UNIQUE (pay_period_start, pay_period_end),
+    CHECK (pay_period_end >= pay_period_start)
+);
+
+-- YearEndTaxSummary Table (stored W-2 totals, one row per employee and tax year)
+CREATE TABLE YearEndTaxSummary (
+    tax_year INTEGER NOT NULL,
+    employee_number INTEGER NOT NULL,
+    department_id INTEGER,
+    total_gross DECIMAL(14, 2) NOT NULL,
+    total_federal DECIMAL(14, 2) NOT NULL,
+    total_state DECIMAL(14, 2) NOT NULL,
+    total_other DECIMAL(14, 2) NOT NULL,
+    total_net DECIMAL(14, 2) NOT NULL,
+    pay_periods INTEGER NOT NULL CHECK (pay_periods > 0),
+    generated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tax_year, employee_number),
+    FOREIGN KEY (employee_number) REFERENCES Employee(employee_number)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
 );
 
 -- ProjectMilestone Table
@@ -193,6 +268,21 @@ CREATE TABLE ProjectMilestone (
         ON DELETE CASCADE
 );
 
+-- ProjectStatistics Table (per-project counters maintained by triggers)
+CREATE TABLE ProjectStatistics (
+    project_number INTEGER PRIMARY KEY,
+    team_size INTEGER NOT NULL DEFAULT 0 CHECK (team_size >= 0),
+    current_team_size INTEGER NOT NULL DEFAULT 0 CHECK (current_team_size >= 0),
+    total_person_hours DECIMAL(14, 2) NOT NULL DEFAULT 0 CHECK (total_person_hours >= 0),
+    total_milestones INTEGER NOT NULL DEFAULT 0 CHECK (total_milestones >= 0),
+    completed_milestones INTEGER NOT NULL DEFAULT 0 CHECK (completed_milestones >= 0),
+    in_progress_milestones INTEGER NOT NULL DEFAULT 0 CHECK (in_progress_milestones >= 0),
+    pending_milestones INTEGER NOT NULL DEFAULT 0 CHECK (pending_milestones >= 0),
+    FOREIGN KEY (project_number) REFERENCES Project(project_number)
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+);
+
 -- EmployeeOffice Table (Many-to-Many relationship)
 CREATE TABLE EmployeeOffice (
     employee_number INTEGER,
@@ -223,16 +313,27 @@ CREATE INDEX idx_project_dept ON Project(department_id);
 CREATE INDEX idx_emppro_employee ON EmployeeProject(employee_number);
 CREATE INDEX idx_emppro_project ON EmployeeProject(project_number);
 CREATE INDEX idx_jobhist_employee ON JobHistory(employee_number);
-CREATE INDEX idx_payroll_employee ON PayrollHistory(employee_number);
+-- Period hours per employee for hourly payroll (index-only), entry look-ups
+-- and the EmployeeProject cascade
+CREATE INDEX idx_timesheet_employee_date ON TimesheetEntry(employee_number, work_date)
+    INCLUDE (project_number, hours);
+-- PayrollHistory(employee_number) is served by its UNIQUE (employee_number, ...) index
 CREATE INDEX idx_milestone_project ON ProjectMilestone(project_number);
 
 -- Additional Indexes for Common Queries
 CREATE INDEX idx_emp_name ON Employee(employee_name);
 CREATE INDEX idx_dept_name ON Department(department_name);
 CREATE INDEX idx_emppro_current ON EmployeeProject(is_current) WHERE is_current = TRUE;
-CREATE INDEX idx_jobhist_current ON JobHistory(is_current) WHERE is_current = TRUE;
+-- At most one current project per employee (see check_current_project)
+CREATE UNIQUE INDEX idx_emppro_one_current ON EmployeeProject(employee_number)
+    WHERE is_current = TRUE;
+-- One entry per employee: finds (and covers) the current salary for the
+-- current-compensation joins and compensation cache misses
+CREATE INDEX idx_jobhist_current_employee ON JobHistory(employee_number)
+    INCLUDE (salary, start_date) WHERE is_current = TRUE;
 CREATE INDEX idx_payroll_period ON PayrollHistory(pay_period_start, pay_period_end);
 CREATE INDEX idx_milestone_status ON ProjectMilestone(status);
+CREATE INDEX idx_yearend_department ON YearEndTaxSummary(tax_year, department_id);
 CREATE INDEX idx_project_dates ON Project(date_started, date_ended);
 
 -- ================================================================
@@ -271,6 +372,8 @@ JOIN Project p ON ep.project_number = p.project_number
 WHERE ep.is_current = TRUE;
 
 -- View: Project Statistics
+-- Team and milestone rows are aggregated separately before joining so that
+-- neither one-to-many relationship multiplies the other's totals
 CREATE OR REPLACE VIEW v_project_statistics AS
 SELECT 
     p.project_number,
@@ -280,17 +383,29 @@ SELECT
     p.date_ended,
     m.employee_name AS manager_name,
     d.department_name,
-    COUNT(DISTINCT ep.employee_number) AS team_size,
-    SUM(ep.hours_worked) AS total_person_hours,
-    COUNT(pm.milestone_id) AS total_milestones,
-    COUNT(CASE WHEN pm.status = 'completed' THEN 1 END) AS completed_milestones
+    COALESCE(team.team_size, 0) AS team_size,
+    team.total_person_hours,
+    COALESCE(ms.total_milestones, 0) AS total_milestones,
+    COALESCE(ms.completed_milestones, 0) AS completed_milestones
 FROM Project p
 JOIN Employee m ON p.manager_emp_id = m.employee_number
 JOIN Department d ON p.department_id = d.department_id
-LEFT JOIN EmployeeProject ep ON p.project_number = ep.project_number
-LEFT JOIN ProjectMilestone pm ON p.project_number = pm.project_number
-GROUP BY p.project_number, p.project_name, p.budget, p.date_started, 
-         p.date_ended, m.employee_name, d.department_name;
+LEFT JOIN (
+    SELECT 
+        project_number,
+        COUNT(DISTINCT employee_number) AS team_size,
+        SUM(hours_worked) AS total_person_hours
+    FROM EmployeeProject
+    GROUP BY project_number
+) team ON p.project_number = team.project_number
+LEFT JOIN (
+    SELECT 
+        project_number,
+        COUNT(*) AS total_milestones,
+        COUNT(CASE WHEN status = 'completed' THEN 1 END) AS completed_milestones
+    FROM ProjectMilestone
+    GROUP BY project_number
+) ms ON p.project_number = ms.project_number;
 
 -- View: Office Assignments
 CREATE OR REPLACE VIEW v_office_assignments AS
@@ -309,6 +424,54 @@ LEFT JOIN EmployeeOffice eo ON o.office_number = eo.office_number
 LEFT JOIN Employee e ON eo.employee_number = e.employee_number
 LEFT JOIN Phone p ON o.office_number = p.office_number AND p.assigned_to_emp_id = e.employee_number;
 
+-- ================================================================
+-- MATERIALIZED VIEWS (reporting layer)
+-- ================================================================
+-- Pre-aggregated report data read by the fast report paths. Refreshed by
+-- the applications (reporting.refresh_reporting_views) after payroll runs,
+-- salary changes and project assignment changes. The unique indexes allow
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY, which does not block readers.
+
+-- Department payroll summary (current salaries)
+CREATE MATERIALIZED VIEW mv_department_payroll_summary AS
+SELECT 
+    d.department_id,
+    d.department_name,
+    COUNT(DISTINCT e.employee_number) AS employee_count,
+    AVG(jh.salary) AS avg_salary,
+    SUM(jh.salary) AS total_salary
+FROM Department d
+LEFT JOIN Employee e ON d.department_id = e.department_id
+LEFT JOIN JobHistory jh ON e.employee_number = jh.employee_number 
+    AND jh.is_current = TRUE
+GROUP BY d.department_id, d.department_name;
+
+CREATE UNIQUE INDEX idx_mv_dept_payroll ON mv_department_payroll_summary(department_id);
+
+-- Department project portfolio summary
+CREATE MATERIALIZED VIEW mv_department_projects_summary AS
+SELECT 
+    d.department_id,
+    d.department_name,
+    COUNT(p.project_number) AS total_projects,
+    COUNT(CASE WHEN p.date_ended IS NULL THEN 1 END) AS active_projects,
+    SUM(p.budget) AS total_budget,
+    AVG(team_stats.team_size) AS avg_team_size,
+    SUM(team_stats.total_hours) AS total_person_hours
+FROM Department d
+LEFT JOIN Project p ON d.department_id = p.department_id
+LEFT JOIN (
+    SELECT 
+        project_number,
+        COUNT(DISTINCT employee_number) AS team_size,
+        SUM(hours_worked) AS total_hours
+    FROM EmployeeProject
+    GROUP BY project_number
+) team_stats ON p.project_number = team_stats.project_number
+GROUP BY d.department_id, d.department_name;
+
+CREATE UNIQUE INDEX idx_mv_dept_projects ON mv_department_projects_summary(department_id);
+
 -- ================================================================
 -- FUNCTIONS AND TRIGGERS
 -- ================================================================
@@ -334,23 +497,35 @@ FOR EACH ROW
 EXECUTE FUNCTION check_current_job();
 
 -- Function: Ensure only one current project per employee
+-- Policy: an employee works on one current project at a time. Making an
+-- assignment current hands the employee off: their previous current
+-- assignment stops being current and is ended on the new assignment's
+-- start date (unless it already has an end date). The triggers only fire
+-- when is_current becomes TRUE, so hours updates and other edits of an
+-- assignment do no extra work; idx_emppro_one_current backs the rule up.
 CREATE OR REPLACE FUNCTION check_current_project()
 RETURNS TRIGGER AS $$
 BEGIN
-    IF NEW.is_current = TRUE THEN
-        UPDATE EmployeeProject 
-        SET is_current = FALSE 
-        WHERE employee_number = NEW.employee_number 
-          AND (employee_number != NEW.employee_number OR project_number != NEW.project_number)
-          AND is_current = TRUE;
-    END IF;
+    UPDATE EmployeeProject 
+    SET is_current = FALSE,
+        end_date = COALESCE(end_date, GREATEST(start_date, NEW.start_date))
+    WHERE employee_number = NEW.employee_number 
+      AND project_number != NEW.project_number
+      AND is_current = TRUE;
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
 CREATE TRIGGER trg_check_current_project
-BEFORE INSERT OR UPDATE ON EmployeeProject
+BEFORE INSERT ON EmployeeProject
+FOR EACH ROW
+WHEN (NEW.is_current)
+EXECUTE FUNCTION check_current_project();
+
+CREATE TRIGGER trg_check_current_project_update
+BEFORE UPDATE OF is_current ON EmployeeProject
 FOR EACH ROW
+WHEN (NEW.is_current AND OLD.is_current IS DISTINCT FROM TRUE)
 EXECUTE FUNCTION check_current_project();
 
 -- Function: Auto-update milestone status to completed when completion_date is set
@@ -369,6 +544,382 @@ BEFORE UPDATE ON ProjectMilestone
 FOR EACH ROW
 EXECUTE FUNCTION update_milestone_status();
 
+-- Function: Create the statistics row for a new project
+CREATE OR REPLACE FUNCTION create_project_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO ProjectStatistics (project_number)
+    VALUES (NEW.project_number)
+    ON CONFLICT (project_number) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_create_project_statistics
+AFTER INSERT ON Project
+FOR EACH ROW
+EXECUTE FUNCTION create_project_statistics();
+
+-- Function: Apply team size and person-hour deltas to ProjectStatistics
+CREATE OR REPLACE FUNCTION maintain_project_team_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.project_number = NEW.project_number THEN
+        IF OLD.is_current IS DISTINCT FROM NEW.is_current
+           OR OLD.hours_worked IS DISTINCT FROM NEW.hours_worked THEN
+            UPDATE ProjectStatistics
+            SET current_team_size = current_team_size
+                    + (CASE WHEN NEW.is_current THEN 1 ELSE 0 END)
+                    - (CASE WHEN OLD.is_current THEN 1 ELSE 0 END),
+                total_person_hours = total_person_hours
+                    + COALESCE(NEW.hours_worked, 0) - COALESCE(OLD.hours_worked, 0)
+            WHERE project_number = NEW.project_number;
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE ProjectStatistics
+        SET team_size = team_size - 1,
+            current_team_size = current_team_size - (CASE WHEN OLD.is_current THEN 1 ELSE 0 END),
+            total_person_hours = total_person_hours - COALESCE(OLD.hours_worked, 0)
+        WHERE project_number = OLD.project_number;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE ProjectStatistics
+        SET team_size = team_size + 1,
+            current_team_size = current_team_size + (CASE WHEN NEW.is_current THEN 1 ELSE 0 END),
+            total_person_hours = total_person_hours + COALESCE(NEW.hours_worked, 0)
+        WHERE project_number = NEW.project_number;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintain_project_team_statistics
+AFTER INSERT OR UPDATE OR DELETE ON EmployeeProject
+FOR EACH ROW
+EXECUTE FUNCTION maintain_project_team_statistics();
+
+-- Function: Apply milestone count deltas to ProjectStatistics
+CREATE OR REPLACE FUNCTION maintain_project_milestone_statistics()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.project_number = NEW.project_number
+       AND OLD.status = NEW.status THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE ProjectStatistics
+        SET total_milestones = total_milestones - 1,
+            completed_milestones = completed_milestones - (CASE WHEN OLD.status = 'completed' THEN 1 ELSE 0 END),
+            in_progress_milestones = in_progress_milestones - (CASE WHEN OLD.status = 'in_progress' THEN 1 ELSE 0 END),
+            pending_milestones = pending_milestones - (CASE WHEN OLD.status = 'pending' THEN 1 ELSE 0 END)
+        WHERE project_number = OLD.project_number;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE ProjectStatistics
+        SET total_milestones = total_milestones + 1,
+            completed_milestones = completed_milestones + (CASE WHEN NEW.status = 'completed' THEN 1 ELSE 0 END),
+            in_progress_milestones = in_progress_milestones + (CASE WHEN NEW.status = 'in_progress' THEN 1 ELSE 0 END),
+            pending_milestones = pending_milestones + (CASE WHEN NEW.status = 'pending' THEN 1 ELSE 0 END)
+        WHERE project_number = NEW.project_number;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_maintain_project_milestone_statistics
+AFTER INSERT OR UPDATE OR DELETE ON ProjectMilestone
+FOR EACH ROW
+EXECUTE FUNCTION maintain_project_milestone_statistics();
+
+-- Function: Recompute ProjectStatistics from the base tables
+-- (use after bulk loads with triggers disabled or to repair drift)
+CREATE OR REPLACE FUNCTION rebuild_project_statistics()
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM ProjectStatistics;
+    INSERT INTO ProjectStatistics
+    (project_number, team_size, current_team_size, total_person_hours,
+     total_milestones, completed_milestones, in_progress_milestones, pending_milestones)
+    SELECT 
+        p.project_number,
+        COALESCE(team.team_size, 0),
+        COALESCE(team.current_team_size, 0),
+        COALESCE(team.total_person_hours, 0),
+        COALESCE(ms.total_milestones, 0),
+        COALESCE(ms.completed_milestones, 0),
+        COALESCE(ms.in_progress_milestones, 0),
+        COALESCE(ms.pending_milestones, 0)
+    FROM Project p
+    LEFT JOIN (
+        SELECT 
+            project_number,
+            COUNT(*) AS team_size,
+            COUNT(CASE WHEN is_current = TRUE THEN 1 END) AS current_team_size,
+            SUM(hours_worked) AS total_person_hours
+        FROM EmployeeProject
+        GROUP BY project_number
+    ) team ON p.project_number = team.project_number
+    LEFT JOIN (
+        SELECT 
+            project_number,
+            COUNT(*) AS total_milestones,
+            COUNT(CASE WHEN status = 'completed' THEN 1 END) AS completed_milestones,
+            COUNT(CASE WHEN status = 'in_progress' THEN 1 END) AS in_progress_milestones,
+            COUNT(CASE WHEN status = 'pending' THEN 1 END) AS pending_milestones
+        FROM ProjectMilestone
+        GROUP BY project_number
+    ) ms ON p.project_number = ms.project_number;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function: Create the PayrollHistory partition for one calendar year
+-- Rows for that year already in the default partition are moved into the
+-- new partition. Returns FALSE if the partition already exists.
+CREATE OR REPLACE FUNCTION create_payroll_partition(p_year INTEGER)
+RETURNS BOOLEAN AS $$
+DECLARE
+    partition_name TEXT := format('payrollhistory_%s', p_year);
+    range_start DATE := make_date(p_year, 1, 1);
+    range_end DATE := make_date(p_year + 1, 1, 1);
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+    -- Serialize concurrent creators, then re-check
+    PERFORM pg_advisory_xact_lock(hashtext('create_payroll_partition'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE PayrollHistory INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        partition_name);
+    EXECUTE format(
+        'WITH moved AS (
+             DELETE FROM PayrollHistory_default
+             WHERE pay_period_start >= %L AND pay_period_start < %L
+             RETURNING *
+         )
+         INSERT INTO %I SELECT * FROM moved',
+        range_start, range_end, partition_name);
+    EXECUTE format(
+        'ALTER TABLE PayrollHistory ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, range_start, range_end);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function: Create next year's PayrollHistory partition ahead of time
+-- (called by the payroll runs; safe to schedule, e.g. yearly from cron)
+CREATE OR REPLACE FUNCTION create_next_payroll_partition()
+RETURNS BOOLEAN AS $$
+BEGIN
+    RETURN create_payroll_partition(EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER + 1);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger: Hold a shared ingest lock while inserting timesheet entries
+-- Concurrent inserts commit their entry_ids out of order; the roll-up takes
+-- this lock exclusively for a moment so every id below the watermark it
+-- reads belongs to a finished transaction
+CREATE OR REPLACE FUNCTION lock_timesheet_ingest()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock_shared(hashtext('timesheet_ingest'));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_timesheet_ingest_lock
+BEFORE INSERT ON TimesheetEntry
+FOR EACH STATEMENT
+EXECUTE FUNCTION lock_timesheet_ingest();
+
+-- Trigger: Restart the roll-up watermark when the entries are truncated
+CREATE OR REPLACE FUNCTION reset_timesheet_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE TimesheetRollup SET last_entry_id = 0, rolled_up_at = NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_timesheet_truncate
+AFTER TRUNCATE ON TimesheetEntry
+FOR EACH STATEMENT
+EXECUTE FUNCTION reset_timesheet_rollup();
+
+-- Function: Add timesheet hours recorded since the last roll-up to EmployeeProject.hours_worked
+-- Progress is an entry_id watermark in TimesheetRollup, so entries are never
+-- updated. The upper bound is read after in-flight inserts have committed
+-- (see lock_timesheet_ingest); entries inserted later get higher ids and
+-- are left for the next roll-up. Call it in a READ COMMITTED transaction.
+-- Returns the number of entries and assignments rolled up, or zeros
+-- without waiting if another roll-up is running. Safe to schedule, e.g.
+-- every few minutes from cron.
+CREATE OR REPLACE FUNCTION rollup_timesheet_hours(OUT entries BIGINT, OUT assignments BIGINT)
+AS $$
+DECLARE
+    watermark BIGINT;
+    horizon BIGINT;
+BEGIN
+    entries := 0;
+    assignments := 0;
+    IF NOT pg_try_advisory_xact_lock(hashtext('rollup_timesheet_hours')) THEN
+        RETURN;
+    END IF;
+
+    SELECT last_entry_id INTO watermark FROM TimesheetRollup FOR UPDATE;
+
+    -- Wait for inserts in flight, then take the highest committed id
+    PERFORM pg_advisory_lock(hashtext('timesheet_ingest'));
+    BEGIN
+        SELECT GREATEST(COALESCE(MAX(entry_id), 0), watermark) INTO horizon
+        FROM TimesheetEntry;
+    EXCEPTION WHEN OTHERS THEN
+        PERFORM pg_advisory_unlock(hashtext('timesheet_ingest'));
+        RAISE;
+    END;
+    PERFORM pg_advisory_unlock(hashtext('timesheet_ingest'));
+
+    IF horizon = watermark THEN
+        RETURN;
+    END IF;
+
+    WITH totals AS (
+        SELECT employee_number, project_number, SUM(hours) AS hours, COUNT(*) AS entries
+        FROM TimesheetEntry
+        WHERE entry_id > watermark AND entry_id <= horizon
+        GROUP BY employee_number, project_number
+    ), updated AS (
+        UPDATE EmployeeProject ep
+        SET hours_worked = ep.hours_worked + t.hours
+        FROM totals t
+        WHERE ep.employee_number = t.employee_number
+          AND ep.project_number = t.project_number
+        RETURNING t.entries
+    )
+    SELECT COALESCE(SUM(updated.entries), 0), COUNT(*)
+    INTO entries, assignments
+    FROM updated;
+
+    UPDATE TimesheetRollup
+    SET last_entry_id = horizon, rolled_up_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Initial partitions: 2020 through next year
+DO $$
+BEGIN
+    PERFORM create_payroll_partition(year)
+    FROM generate_series(2020, EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER + 1) AS year;
+END;
+$$;
+
+-- ================================================================
+-- CHANGE FEED
+-- ================================================================
+
+-- Key of a changed row as JSON: the value of its single key column, or an
+-- array of the values of several
+CREATE OR REPLACE FUNCTION data_change_key(row_data JSONB, key_columns TEXT[])
+RETURNS JSONB AS $$
+    SELECT CASE
+        WHEN cardinality(key_columns) = 1 THEN row_data -> key_columns[array_lower(key_columns, 1)]
+        ELSE (SELECT jsonb_agg(row_data -> k.column_name ORDER BY k.position)
+              FROM unnest(key_columns) WITH ORDINALITY AS k(column_name, position))
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Function: Publish each statement's changes on the data_changes channel
+-- (see applications/change_feed.py). Statement-level, so a bulk write sends
+-- one notification: {"table", "op", "rows"} plus the distinct "keys" of the
+-- changed rows (trigger arguments name the key columns) when there are at
+-- most 100 of them. Without "keys" listeners treat the whole table as
+-- changed. Delivered only if the transaction commits.
+CREATE OR REPLACE FUNCTION notify_data_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    payload JSONB := jsonb_build_object('table', lower(TG_TABLE_NAME), 'op', TG_OP);
+    changed BIGINT;
+    keys JSONB;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('data_changes', payload::TEXT);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT COUNT(*) INTO changed FROM new_rows;
+    ELSE
+        SELECT COUNT(*) INTO changed FROM old_rows;
+    END IF;
+    IF changed = 0 THEN
+        RETURN NULL;
+    END IF;
+    payload := payload || jsonb_build_object('rows', changed);
+
+    IF changed <= 100 THEN
+        IF TG_OP = 'INSERT' THEN
+            SELECT jsonb_agg(DISTINCT data_change_key(to_jsonb(r), TG_ARGV)) INTO keys
+            FROM new_rows r;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT jsonb_agg(DISTINCT data_change_key(to_jsonb(r), TG_ARGV)) INTO keys
+            FROM old_rows r;
+        ELSE
+            -- Old and new keys, in case an update changed a key column
+            SELECT jsonb_agg(DISTINCT data_change_key(r.row_data, TG_ARGV)) INTO keys
+            FROM (SELECT to_jsonb(o) AS row_data FROM old_rows o
+                  UNION ALL
+                  SELECT to_jsonb(n) FROM new_rows n) r;
+        END IF;
+        payload := payload || jsonb_build_object('keys', keys);
+    END IF;
+
+    PERFORM pg_notify('data_changes', payload::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Change feed triggers: transition tables need one trigger per event, so
+-- each table gets trg_<table>_changes_insert/_update/_delete/_truncate
+DO $$
+DECLARE
+    feed RECORD;
+    key_args TEXT;
+BEGIN
+    FOR feed IN
+        SELECT * FROM (VALUES
+            ('employee', ARRAY['employee_number']),
+            ('jobhistory', ARRAY['employee_number']),
+            ('employeeproject', ARRAY['employee_number', 'project_number']),
+            ('project', ARRAY['project_number']),
+            ('projectmilestone', ARRAY['project_number', 'milestone_id'])
+        ) AS t(table_name, key_columns)
+    LOOP
+        SELECT string_agg(quote_literal(k), ', ') INTO key_args FROM unnest(feed.key_columns) AS k;
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notify_data_change(%s)',
+                       'trg_' || feed.table_name || '_changes_insert', feed.table_name, key_args);
+        EXECUTE format('CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING OLD TABLE AS old_rows '
+                       'NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION notify_data_change(%s)',
+                       'trg_' || feed.table_name || '_changes_update', feed.table_name, key_args);
+        EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notify_data_change(%s)',
+                       'trg_' || feed.table_name || '_changes_delete', feed.table_name, key_args);
+        EXECUTE format('CREATE TRIGGER %I AFTER TRUNCATE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION notify_data_change()',
+                       'trg_' || feed.table_name || '_changes_truncate', feed.table_name);
+    END LOOP;
+END;
+$$;
+
 -- ================================================================
 -- GRANT PERMISSIONS (adjust as needed for your environment)
 -- ================================================================
@@ -393,10 +944,17 @@ COMMENT ON TABLE Office IS 'Office spaces within buildings';
 COMMENT ON TABLE Phone IS 'Phone numbers assigned to offices and employees';
 COMMENT ON TABLE Project IS 'Company projects managed by departments';
 COMMENT ON TABLE EmployeeProject IS 'Employee assignments to projects with role and hours';
+COMMENT ON TABLE TimesheetEntry IS 'Append-only dated hours entries, rolled up into EmployeeProject.hours_worked';
+COMMENT ON TABLE TimesheetRollup IS 'Roll-up watermark: last TimesheetEntry added to EmployeeProject.hours_worked';
 COMMENT ON TABLE JobHistory IS 'Historical record of employee job titles and salaries';
 COMMENT ON TABLE PayrollHistory IS 'Historical payroll records for tax reporting';
+COMMENT ON TABLE PayrollRun IS 'Payroll run ledger used to make runs idempotent and resumable';
+COMMENT ON TABLE YearEndTaxSummary IS 'Stored year-end (W-2) payroll totals per employee, as of generated_at';
 COMMENT ON TABLE ProjectMilestone IS 'Project milestones and deliverables';
 COMMENT ON TABLE EmployeeOffice IS 'Office assignments for employees (many-to-many)';
+COMMENT ON TABLE ProjectStatistics IS 'Per-project team and milestone counters maintained by triggers';
+COMMENT ON MATERIALIZED VIEW mv_department_payroll_summary IS 'Pre-aggregated department salary totals for reporting';
+COMMENT ON MATERIALIZED VIEW mv_department_projects_summary IS 'Pre-aggregated department project totals for reporting';
 
 -- ================================================================
 -- END OF SCHEMA
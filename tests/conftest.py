@@ -0,0 +1,26 @@
+"""
+Shared test fixtures
+Puts the applications directory on the path and provides a connection pool
+for the tests that need the configured database (skipped without one)
+"""
+import os
+import sys
+
+import pytest
+
+# Add applications directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'applications'))
+
+
+@pytest.fixture(scope='session')
+def db():
+    """Connection pool for the configured database; skips the test if it is unreachable"""
+    import database_config
+    try:
+        database_config.initialize_connection_pool()
+        with database_config.get_read_cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Exception as e:
+        pytest.skip(f"database not available: {e}")
+    yield
+    database_config.close_connection_pool()
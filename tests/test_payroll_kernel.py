@@ -0,0 +1,128 @@
+"""
+Equivalence tests for the integer-cents payroll kernel
+Every paycheck computed by payroll_kernel.calculate_pay_columns must match
+HRPayrollApp's Decimal calculate_* methods to the cent. Runs without a
+database: cases are seeded random amounts concentrated on the
+ROUND_HALF_UP boundaries.
+"""
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+from hr_payroll_app import HRPayrollApp
+from payroll_kernel import CENT, calculate_pay_columns, from_cents
+
+SEED = 631
+CASES = 20000
+
+app = HRPayrollApp()
+
+
+def decimal_paycheck(salary_cents, rate_cents, hours_hundredths, tax_rates=None):
+    """Reference paycheck from the Decimal methods: (gross, federal, state, other, net)"""
+    if salary_cents is not None:
+        gross = app.calculate_salaried_pay(Decimal(salary_cents).scaleb(-2))
+    else:
+        gross = app.calculate_hourly_pay(Decimal(rate_cents).scaleb(-2),
+                                         Decimal(hours_hundredths).scaleb(-2))
+    if tax_rates is None:
+        taxes = app.calculate_taxes(gross)
+        return (gross, taxes['federal_tax'], taxes['state_tax'],
+                taxes['other_tax'], taxes['net_pay'])
+    federal, state, other = (
+        (gross * tax_rates[name]).quantize(CENT, rounding=ROUND_HALF_UP)
+        for name in ('federal', 'state', 'other'))
+    return gross, federal, state, other, gross - federal - state - other
+
+
+def kernel_paychecks(rows, tax_rates=None):
+    """Kernel paychecks for (salary_cents, rate_cents, hours_hundredths) rows as Decimal rows"""
+    salary_cents, rate_cents, hours = zip(*rows) if rows else ((), (), ())
+    columns = calculate_pay_columns(salary_cents, rate_cents, hours,
+                                    tax_rates or app.TAX_RATES)
+    return list(zip(*(from_cents(column) for column in columns)))
+
+
+def assert_equivalent(rows, tax_rates=None):
+    for row, paycheck in zip(rows, kernel_paychecks(rows, tax_rates)):
+        expected = decimal_paycheck(*row, tax_rates=tax_rates)
+        assert paycheck == expected, f"{row}: kernel {paycheck} != Decimal {expected}"
+        assert all(amount.as_tuple().exponent == -2 for amount in paycheck), paycheck
+
+
+def salaried_rows(rng):
+    """Annual salaries, half of them a twelfth that ends in exactly half a cent"""
+    rows = []
+    for _ in range(CASES):
+        salary = rng.randrange(0, 100_000_000)
+        if rng.random() < 0.5:
+            salary += 6 - salary % 12
+        rows.append((salary, None, None))
+    return rows
+
+
+def hourly_rows(rng):
+    """Rates and hours, half of them with a product ending in exactly half a cent"""
+    rows = []
+    for _ in range(CASES):
+        rate = rng.randrange(1, 50_000)
+        hours = rng.randrange(1, 40_000)
+        if rng.random() < 0.5:
+            # rate * hours ≡ 50 (mod 100): make both multiples of 5 and 10 apart
+            rate = rate // 10 * 10 + 5
+            hours = hours // 20 * 20 + 10
+        rows.append((None, rate, hours))
+    return rows
+
+
+def tax_boundary_rows(rng):
+    """Gross pay (rate x 1.00 hour) where a tax lands on exactly half a cent
+
+    10% of g is half a cent when g ≡ 5 (mod 10), 5% when g ≡ 10 (mod 20)
+    and 3% when g ≡ 50 (mod 100).
+    """
+    rows = []
+    for _ in range(CASES):
+        base = rng.randrange(0, 2_000_000)
+        gross = rng.choice((base * 10 + 5, base * 20 + 10, base * 100 + 50))
+        rows.append((None, gross, 100))
+    return rows
+
+
+def test_salaried_pay_matches_decimal():
+    assert_equivalent(salaried_rows(random.Random(SEED)))
+
+
+def test_hourly_pay_matches_decimal():
+    assert_equivalent(hourly_rows(random.Random(SEED + 1)))
+
+
+def test_taxes_at_half_cent_boundaries_match_decimal():
+    assert_equivalent(tax_boundary_rows(random.Random(SEED + 2)))
+
+
+def test_mixed_batch_matches_decimal():
+    rng = random.Random(SEED + 3)
+    rows = salaried_rows(rng) + hourly_rows(rng) + tax_boundary_rows(rng)
+    rng.shuffle(rows)
+    assert_equivalent(rows)
+
+
+def test_other_tax_rates_match_decimal():
+    rng = random.Random(SEED + 4)
+    rows = hourly_rows(rng)[:5000] + tax_boundary_rows(rng)[:5000]
+    for tax_rates in (
+        {'federal': Decimal('0.12'), 'state': Decimal('0.0725'), 'other': Decimal('0.0145')},
+        {'federal': Decimal('0.22'), 'state': Decimal('0.0495'), 'other': Decimal('0.062')},
+        {'federal': Decimal('0'), 'state': Decimal('0'), 'other': Decimal('0')},
+    ):
+        assert_equivalent(rows, tax_rates)
+
+
+def test_zero_and_extreme_amounts():
+    rows = [(0, None, None), (1, None, None), (6, None, None), (99_999_999_999, None, None),
+            (None, 1, 1), (None, 1, 50), (None, 1, 49), (None, 999_999, 99_999)]
+    assert_equivalent(rows)
+
+
+def test_empty_batch():
+    assert calculate_pay_columns((), (), (), app.TAX_RATES) == ([], [], [], [], [])
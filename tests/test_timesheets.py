@@ -0,0 +1,140 @@
+"""
+Timesheet ingest tests against the configured database
+Entries are dated in 2099, on a current assignment of an hourly employee,
+and deleted afterwards (before any roll-up can count them), as are the
+2099 pay runs.
+"""
+import io
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from database_config import get_db_cursor, get_read_cursor
+from hr_payroll_app import HRPayrollApp
+from payroll_kernel import CENT
+from project_management_app import ProjectManagementApp
+
+WORK_DATE = date(2099, 3, 2)
+PAY_PERIOD = (date(2099, 2, 1), date(2099, 2, 28))
+
+hr_app = HRPayrollApp()
+pm_app = ProjectManagementApp()
+
+
+@pytest.fixture
+def assignment(db):
+    """(employee_number, project_number) of a current hourly assignment"""
+    with get_read_cursor() as cursor:
+        cursor.execute("""
+            SELECT ep.employee_number, ep.project_number
+            FROM EmployeeProject ep
+            JOIN Employee e ON e.employee_number = ep.employee_number
+            WHERE ep.is_current = TRUE AND ep.end_date IS NULL
+            AND e.employment_type = 'hourly'
+            ORDER BY ep.employee_number
+            LIMIT 1
+        """)
+        row = cursor.fetchone()
+    if row is None:
+        pytest.skip("no current hourly assignment; load sample data first")
+    yield row
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM TimesheetEntry
+            WHERE employee_number = %s AND work_date >= %s
+        """, (row[0], date(2099, 1, 1)))
+
+
+def entry_hours(employee_number):
+    with get_read_cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(hours), 0)
+            FROM TimesheetEntry
+            WHERE employee_number = %s AND work_date >= %s
+        """, (employee_number, date(2099, 1, 1)))
+        return cursor.fetchone()
+
+
+def timesheet_csv(employee_number, project_number, days):
+    lines = ["employee_number,project_number,work_date,hours"]
+    lines += [f"{employee_number},{project_number},2099-03-{day:02d},7.5" for day in days]
+    return "\n".join(lines) + "\n"
+
+
+def test_same_file_ingested_twice_is_recorded_once(assignment):
+    employee_number, project_number = assignment
+    csv_text = timesheet_csv(employee_number, project_number, range(2, 7))
+
+    first = pm_app.record_timesheet_csv(io.StringIO(csv_text))
+    second = pm_app.record_timesheet_csv(io.StringIO(csv_text), strict=True)
+
+    assert (first['recorded'], first['duplicates'], first['errors']) == (5, 0, [])
+    assert (second['recorded'], second['duplicates'], second['errors']) == (0, 5, [])
+    count, hours = entry_hours(employee_number)
+    assert (count, hours) == (5, 5 * 7.5)
+
+
+def test_repeated_row_in_one_batch_is_rejected(assignment):
+    employee_number, project_number = assignment
+    row = {'employee_number': employee_number, 'project_number': project_number,
+           'work_date': WORK_DATE, 'hours': '4'}
+
+    result = pm_app.record_timesheet_entries([row, dict(row)])
+
+    assert result['recorded'] == 1
+    assert [number for number, _ in result['errors']] == [2]
+    assert entry_hours(employee_number)[0] == 1
+
+
+def test_source_ref_tells_entries_on_the_same_day_apart(assignment):
+    employee_number, project_number = assignment
+    rows = [{'employee_number': employee_number, 'project_number': project_number,
+             'work_date': WORK_DATE, 'hours': '4', 'source_ref': shift}
+            for shift in ('morning', 'evening')]
+
+    assert pm_app.record_timesheet_entries(rows)['recorded'] == 2
+    assert pm_app.record_timesheet_entries(rows)['duplicates'] == 2
+
+
+def test_daily_cap_counts_entries_already_recorded(assignment):
+    employee_number, project_number = assignment
+    row = {'employee_number': employee_number, 'project_number': project_number,
+           'work_date': WORK_DATE, 'hours': '20', 'source_ref': 'first'}
+    assert pm_app.record_timesheet_entries([row])['recorded'] == 1
+
+    result = pm_app.record_timesheet_entries([dict(row, hours='8', source_ref='second')])
+
+    assert result['recorded'] == 0
+    assert 'at most 24' in result['errors'][0][1]
+    assert entry_hours(employee_number)[1] == 20
+
+
+@pytest.fixture
+def pay_period(db):
+    yield PAY_PERIOD
+    with get_db_cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM PayrollHistory WHERE pay_period_start = %s AND pay_period_end = %s
+        """, PAY_PERIOD)
+        cursor.execute("""
+            DELETE FROM PayrollRun WHERE pay_period_start = %s AND pay_period_end = %s
+        """, PAY_PERIOD)
+        # The runs created partitions for 2099 and 2100
+        cursor.execute("DROP TABLE IF EXISTS PayrollHistory_2099, PayrollHistory_2100")
+
+
+@pytest.mark.parametrize('process', ['process_payroll', 'process_payroll_batch'])
+def test_hours_logged_through_the_app_are_paid_by_the_next_run(assignment, pay_period, process):
+    employee_number, project_number = assignment
+    assert pm_app.update_employee_project_hours(
+        employee_number, project_number, Decimal('6.5'), date(2099, 2, 3)) is not None
+
+    records = getattr(hr_app, process)(*pay_period)
+
+    with get_read_cursor() as cursor:
+        cursor.execute("SELECT hourly_rate FROM Employee WHERE employee_number = %s",
+                       (employee_number,))
+        hourly_rate = cursor.fetchone()[0]
+    paid = [r['gross_pay'] for r in records if r['employee_number'] == employee_number]
+    assert paid == [(hourly_rate * Decimal('6.5')).quantize(CENT, rounding=ROUND_HALF_UP)]